@@ -202,6 +202,43 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Carga masiva: filas que se validan e insertan por lote (bulk_create)
+BULK_UPLOAD_CHUNK_SIZE = int(os.getenv('BULK_UPLOAD_CHUNK_SIZE', '1000'))
+# Lotes que pueden esperar entre las etapas parseo -> validación -> escritura (backpressure)
+BULK_UPLOAD_PIPELINE_QUEUE_SIZE = int(os.getenv('BULK_UPLOAD_PIPELINE_QUEUE_SIZE', '4'))
+# Tamaño máximo de archivo aceptado en bytes (10 MB por defecto)
+BULK_UPLOAD_MAX_FILE_SIZE = int(os.getenv('BULK_UPLOAD_MAX_FILE_SIZE', str(10 * 1024 * 1024)))
+# Tamaño máximo del contenido descomprimido de archivos .gz/.zst (500 MB por defecto)
+BULK_UPLOAD_MAX_UNCOMPRESSED_SIZE = int(os.getenv('BULK_UPLOAD_MAX_UNCOMPRESSED_SIZE', str(500 * 1024 * 1024)))
+# Tamaño de parte por defecto de la subida por partes (bulk-upload-sessions), 5 MB
+BULK_UPLOAD_PART_SIZE = int(os.getenv('BULK_UPLOAD_PART_SIZE', str(5 * 1024 * 1024)))
+# Insertar con COPY + INSERT ... ON CONFLICT en PostgreSQL (para archivos muy grandes)
+BULK_UPLOAD_USE_COPY = os.getenv('BULK_UPLOAD_USE_COPY', 'False') == 'True'
+# Guardar los datos de cada BulkUploadItem como lista (headers una sola vez en BulkUpload.columnas)
+BULK_UPLOAD_COMPACT_ITEMS = os.getenv('BULK_UPLOAD_COMPACT_ITEMS', 'True') == 'True'
+# Cola de cargas masivas: segundos sin heartbeat para reencolar y máximo de intentos
+BULK_UPLOAD_HEARTBEAT_TIMEOUT = int(os.getenv('BULK_UPLOAD_HEARTBEAT_TIMEOUT', '300'))
+BULK_UPLOAD_MAX_ATTEMPTS = int(os.getenv('BULK_UPLOAD_MAX_ATTEMPTS', '3'))
+# Cada cuántas filas se publica el avance de una carga en proceso (endpoint progreso)
+BULK_UPLOAD_PROGRESS_EVERY = int(os.getenv('BULK_UPLOAD_PROGRESS_EVERY', '1000'))
+# Logging de la ingesta: detalle DEBUG de 1 de cada N filas y máximo de advertencias de filas por segundo
+BULK_UPLOAD_LOG_SAMPLE_EVERY = int(os.getenv('BULK_UPLOAD_LOG_SAMPLE_EVERY', '1000'))
+BULK_UPLOAD_LOG_MAX_WARNINGS = int(os.getenv('BULK_UPLOAD_LOG_MAX_WARNINGS', '20'))
+
+# Cachés: 'bulk_uploads' guarda los planes validados (dry-run) y debe ser compartida
+# entre la API y los workers de carga masiva
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'bulk_uploads': {
+        'BACKEND': os.getenv('BULK_UPLOAD_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('BULK_UPLOAD_CACHE_LOCATION', str(BASE_DIR / 'cache' / 'bulk_uploads')),
+    },
+}
+# Segundos que se conserva el plan validado de una carga
+BULK_UPLOAD_PLAN_TTL = int(os.getenv('BULK_UPLOAD_PLAN_TTL', '3600'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Contribuyente, CalificacionTributaria, TaxRating, BulkUpload, BulkUploadItem
+from .models import Contribuyente, CalificacionTributaria, TaxRating, BulkUpload, BulkUploadItem, BulkUploadSession
 
 @admin.register(Contribuyente)
 class ContribuyenteAdmin(admin.ModelAdmin):
@@ -44,21 +44,30 @@ class TaxRatingAdmin(admin.ModelAdmin):
 @admin.register(BulkUpload)
 class BulkUploadAdmin(admin.ModelAdmin):
     list_display = ('id', 'tipo', 'usuario', 'estado', 'total_filas', 'filas_ok', 'filas_error', 'porcentaje_exito', 'creado_en')
-    list_filter = ('estado', 'tipo', 'creado_en')
+    list_filter = ('estado', 'tipo', 'modo', 'creado_en')
     search_fields = ('usuario__username',)
-    readonly_fields = ('usuario', 'tipo', 'total_filas', 'filas_ok', 'filas_error', 'resumen_errores', 
-                       'fecha_inicio', 'fecha_fin', 'creado_en', 'actualizado_en', 'porcentaje_exito')
+    readonly_fields = ('usuario', 'tipo', 'modo', 'total_filas', 'filas_ok', 'filas_error', 'filas_actualizadas',
+                       'filas_sin_cambios', 'resumen_errores', 
+                       'fecha_inicio', 'fecha_fin', 'encolado_en', 'heartbeat_en', 'intentos', 'worker',
+                       'filas_por_segundo', 'progreso_en', 'ultima_fila_confirmada', 'tiempos_etapas',
+                       'creado_en', 'actualizado_en', 'porcentaje_exito')
     date_hierarchy = 'creado_en'
     
     fieldsets = (
         ('Información del Archivo', {
-            'fields': ('archivo', 'tipo')
+            'fields': ('archivo', 'tipo', 'modo')
         }),
         ('Estado del Proceso', {
             'fields': ('usuario', 'estado', 'fecha_inicio', 'fecha_fin')
         }),
+        ('Cola de Procesamiento', {
+            'fields': ('encolado_en', 'heartbeat_en', 'intentos', 'worker', 'filas_por_segundo', 'progreso_en',
+                       'ultima_fila_confirmada', 'tiempos_etapas'),
+            'classes': ('collapse',)
+        }),
         ('Resultados', {
-            'fields': ('total_filas', 'filas_ok', 'filas_error', 'porcentaje_exito', 'resumen_errores')
+            'fields': ('total_filas', 'filas_ok', 'filas_error', 'filas_actualizadas', 'filas_sin_cambios',
+                       'porcentaje_exito', 'resumen_errores')
         }),
         ('Auditoría', {
             'fields': ('creado_en', 'actualizado_en'),
@@ -78,14 +87,14 @@ class BulkUploadItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'bulk_upload', 'numero_fila', 'estado', 'mensaje_error_truncado', 'creado_en')
     list_filter = ('estado', 'creado_en')
     search_fields = ('bulk_upload__id', 'mensaje_error')
-    readonly_fields = ('bulk_upload', 'numero_fila', 'estado', 'mensaje_error', 'datos', 'creado_en')
+    readonly_fields = ('bulk_upload', 'numero_fila', 'estado', 'mensaje_error', 'datos_fila', 'creado_en')
     
     fieldsets = (
         ('Información de la Fila', {
             'fields': ('bulk_upload', 'numero_fila', 'estado')
         }),
         ('Detalles', {
-            'fields': ('mensaje_error', 'datos')
+            'fields': ('mensaje_error', 'datos_fila')
         }),
         ('Auditoría', {
             'fields': ('creado_en',),
@@ -99,8 +108,24 @@ class BulkUploadItemAdmin(admin.ModelAdmin):
         return '-'
     mensaje_error_truncado.short_description = 'Error'
     
+    def datos_fila(self, obj):
+        return obj.get_datos()
+    datos_fila.short_description = 'Datos'
+    
     def has_add_permission(self, request):
         return False
     
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(BulkUploadSession)
+class BulkUploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_archivo', 'usuario', 'estado', 'tamano_total', 'partes_totales', 'bulk_upload', 'creado_en')
+    list_filter = ('estado', 'creado_en')
+    search_fields = ('nombre_archivo', 'usuario__username')
+    readonly_fields = ('usuario', 'nombre_archivo', 'modo', 'tamano_total', 'tamano_parte', 'sha256', 'partes',
+                       'columnas', 'error_encabezado', 'bulk_upload', 'creado_en', 'actualizado_en')
+    
+    def has_add_permission(self, request):
+        return False
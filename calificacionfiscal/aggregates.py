@@ -0,0 +1,121 @@
+"""
+Conteos agrupados de varios campos en una pasada.
+
+Las estadísticas cuentan las mismas filas agrupadas por varios campos (rating,
+status, emisor...) más el total. En vez de un `count()` y un
+`values().annotate()` por campo, count_groups las obtiene:
+- En PostgreSQL con una sola consulta `GROUP BY GROUPING SETS`, que agrupa
+  por cada campo y calcula el total en el mismo recorrido de la tabla.
+- En otros motores (SQLite en los tests) con un único `aggregate()` de
+  `Count(filter=Q(...))` por cada valor de los campos con choices, más una
+  consulta agrupada por cada campo sin choices (o con límite).
+"""
+from django.db import connections
+from django.db.models import Count, F, Q
+
+
+def count_groups(queryset, grupos, limites=None):
+    """
+    Cuenta las filas de `queryset` y las agrupa por cada entrada de `grupos`.
+
+    Args:
+        queryset: QuerySet a contar
+        grupos: Diccionario {nombre: campo o tupla de campos}
+        limites: Diccionario {nombre: n} con los grupos que solo retornan los n mayores
+
+    Returns:
+        dict: {'total': n, nombre: [{campo: valor, ..., 'count': n}, ...]} con
+            cada lista ordenada de mayor a menor cantidad
+    """
+    limites = limites or {}
+    grupos = {
+        nombre: (campos,) if isinstance(campos, str) else tuple(campos)
+        for nombre, campos in grupos.items()
+    }
+    queryset = queryset.order_by()
+
+    if connections[queryset.db].vendor == 'postgresql':
+        resultado = _grouping_sets(queryset, grupos)
+    else:
+        resultado = _conditional_counts(queryset, grupos, limites)
+
+    for nombre in grupos:
+        filas = sorted(resultado[nombre], key=lambda fila: -fila['count'])
+        resultado[nombre] = filas[:limites[nombre]] if nombre in limites else filas
+    return resultado
+
+
+def _grouping_sets(queryset, grupos):
+    """Todos los grupos y el total con una consulta GROUP BY GROUPING SETS."""
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+
+    campos = list(dict.fromkeys(campo for campos_grupo in grupos.values() for campo in campos_grupo))
+    alias = {campo: quote(f'g{indice}') for indice, campo in enumerate(campos)}
+    filas_sql, params = queryset.values(
+        **{f'g{indice}': F(campo) for indice, campo in enumerate(campos)}
+    ).query.sql_with_params()
+
+    conjuntos = list(dict.fromkeys(grupos.values()))
+    sql = (
+        f'SELECT {", ".join(alias.values())}, '
+        f'{", ".join(f"GROUPING({columna})" for columna in alias.values())}, COUNT(*) '
+        f'FROM ({filas_sql}) AS filas '
+        f'GROUP BY GROUPING SETS ('
+        f'{", ".join("(" + ", ".join(alias[campo] for campo in conjunto) + ")" for conjunto in conjuntos)}, ())'
+    )
+
+    nombres_por_conjunto = {}
+    for nombre, campos_grupo in grupos.items():
+        nombres_por_conjunto.setdefault(frozenset(campos_grupo), []).append(nombre)
+
+    resultado = {'total': 0, **{nombre: [] for nombre in grupos}}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for fila in cursor.fetchall():
+            valores, agrupados, cantidad = fila[:len(campos)], fila[len(campos):-1], fila[-1]
+            # GROUPING() es 0 para las columnas que forman el grupo de la fila
+            conjunto = frozenset(campo for campo, bit in zip(campos, agrupados) if not bit)
+            if not conjunto:
+                resultado['total'] = cantidad
+                continue
+            for nombre in nombres_por_conjunto[conjunto]:
+                fila_grupo = {campo: valores[campos.index(campo)] for campo in grupos[nombre]}
+                fila_grupo['count'] = cantidad
+                resultado[nombre].append(fila_grupo)
+    return resultado
+
+
+def _conditional_counts(queryset, grupos, limites):
+    """Total y grupos de campos con choices en un aggregate; el resto con una consulta agrupada cada uno."""
+    opciones = {}
+    agregados = {'total': Count('pk')}
+    for nombre, campos in grupos.items():
+        if len(campos) != 1 or '__' in campos[0] or nombre in limites:
+            continue
+        choices = queryset.model._meta.get_field(campos[0]).flatchoices
+        if not choices:
+            continue
+        opciones[nombre] = []
+        for valor, _ in choices:
+            alias = f'c{len(agregados)}'
+            agregados[alias] = Count('pk', filter=Q(**{campos[0]: valor}))
+            opciones[nombre].append((valor, alias))
+
+    conteos = queryset.aggregate(**agregados)
+    resultado = {'total': conteos['total']}
+    for nombre, campos in grupos.items():
+        if nombre in opciones:
+            filas = [
+                {campos[0]: valor, 'count': conteos[alias]}
+                for valor, alias in opciones[nombre] if conteos[alias]
+            ]
+            # Si hay valores fuera de choices los conteos no suman el total: se agrupa la tabla
+            if sum(fila['count'] for fila in filas) == resultado['total']:
+                resultado[nombre] = filas
+                continue
+        filas = queryset.values(*campos).annotate(count=Count('pk')).order_by('-count')
+        if nombre in limites:
+            filas = filas[:limites[nombre]]
+        resultado[nombre] = list(filas)
+    return resultado
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CalificacionfiscalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calificacionfiscal'
+
+    def ready(self):
+        """Carga los signals que mantienen el documento de búsqueda y las estadísticas de TaxRating."""
+        import calificacionfiscal.signals
@@ -0,0 +1,204 @@
+"""
+Subida por partes (reanudable) de archivos de carga masiva.
+
+Protocolo (ver BulkUploadSessionViewSet):
+1. POST /bulk-upload-sessions/ abre una sesión con el nombre, tamaño total y
+   tamaño de parte; se crea en disco un archivo parcial de ese tamaño.
+2. PUT /bulk-upload-sessions/{id}/partes/{n}/ envía los bytes de la parte `n`
+   como cuerpo crudo. Se escriben directo en su posición del archivo parcial,
+   leyendo el request por bloques, y se verifica su SHA-256 (cabecera
+   X-Content-SHA256). Reenviar una parte la sobrescribe, de modo que tras un
+   corte basta con consultar la sesión y enviar las partes que faltan.
+3. POST /bulk-upload-sessions/{id}/finalizar/ verifica que estén todas las
+   partes y, si la sesión se abrió con `sha256`, el SHA-256 del archivo
+   completo; lo valida igual que una subida normal y crea la BulkUpload
+   moviendo el archivo parcial (sin copiarlo).
+
+Apenas llega la primera parte de un archivo sin comprimir se validan sus
+headers, para que el cliente pueda abortar antes de enviar el resto. Es la
+única revisión anticipada: las filas se parsean y validan al finalizar.
+"""
+import hashlib
+import logging
+import os
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from .models import BulkUploadSession
+from .utils import (
+    CHUNK_SIZE, UPLOAD_EXTENSIONS, _read_chunks, detect_delimiter, get_compression,
+    parse_header_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de parte por defecto en bytes (configurable con BULK_UPLOAD_PART_SIZE)
+DEFAULT_PART_SIZE = 5 * 1024 * 1024
+
+# Tamaño mínimo de parte aceptado al abrir una sesión
+MIN_PART_SIZE = 1024
+
+# Carpeta de MEDIA_ROOT donde quedan los archivos parciales
+PARTIAL_DIR = os.path.join('bulk_uploads', 'parciales')
+
+
+class AssembledUpload(File):
+    """
+    Archivo parcial ya completo.
+    FileSystemStorage mueve los archivos con `temporary_file_path` en vez de copiarlos.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def get_part_size(part_size=None):
+    """Tamaño de parte: el indicado o el de settings (BULK_UPLOAD_PART_SIZE)."""
+    return part_size or getattr(settings, 'BULK_UPLOAD_PART_SIZE', DEFAULT_PART_SIZE)
+
+
+def get_partial_path(sesion):
+    """Ruta del archivo parcial de una sesión; conserva la extensión para detectar la compresión."""
+    nombre = sesion.nombre_archivo.lower()
+    extension = max((ext for ext in UPLOAD_EXTENSIONS if nombre.endswith(ext)), key=len, default='')
+    return os.path.join(settings.MEDIA_ROOT, PARTIAL_DIR, f'{sesion.pk}{extension}')
+
+
+def create_partial_file(sesion):
+    """Crea el archivo parcial con el tamaño total (disperso: no ocupa disco hasta escribirse)."""
+    ruta = get_partial_path(sesion)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.truncate(sesion.tamano_total)
+    return ruta
+
+
+def remove_partial_file(sesion):
+    """Elimina el archivo parcial de una sesión si todavía existe."""
+    try:
+        os.remove(get_partial_path(sesion))
+    except FileNotFoundError:
+        pass
+
+
+def write_session_part(sesion, numero, stream, sha256_esperado=''):
+    """
+    Escribe una parte en su posición del archivo parcial y la registra en la sesión.
+
+    El cuerpo se lee por bloques de CHUNK_SIZE: la parte nunca está completa en memoria.
+    Una parte reenviada sobrescribe los bytes de la anterior, así que primero deja
+    de figurar como recibida: si el reenvío falla (o se corta) la parte falta y
+    `finalizar` no arma el archivo con bytes sin verificar.
+
+    Args:
+        sesion: BulkUploadSession abierta
+        numero: Número de la parte (desde 0)
+        stream: Objeto con read(n) del que se lee el contenido de la parte
+        sha256_esperado: SHA-256 de la parte enviado por el cliente (opcional)
+
+    Returns:
+        str: SHA-256 de la parte recibida
+
+    Raises:
+        ValidationError: Si el número, el largo o el checksum de la parte no corresponden
+    """
+    if not 0 <= numero < sesion.partes_totales:
+        raise ValidationError(f"La parte {numero} no existe (la sesión tiene {sesion.partes_totales} partes)")
+
+    if str(numero) in sesion.partes:
+        _record_part(sesion, numero, None)
+
+    esperado = sesion.tamano_de_parte(numero)
+    digest = hashlib.sha256()
+    recibidos = 0
+    with open(get_partial_path(sesion), 'r+b') as f:
+        f.seek(numero * sesion.tamano_parte)
+        for chunk in _read_chunks(stream, CHUNK_SIZE):
+            recibidos += len(chunk)
+            if recibidos > esperado:
+                raise ValidationError(f"La parte {numero} debe tener {esperado} bytes")
+            digest.update(chunk)
+            f.write(chunk)
+
+    if recibidos != esperado:
+        raise ValidationError(f"La parte {numero} debe tener {esperado} bytes y se recibieron {recibidos}")
+
+    sha256 = digest.hexdigest()
+    if sha256_esperado and sha256_esperado.lower() != sha256:
+        raise ValidationError(f"El SHA-256 de la parte {numero} no coincide")
+
+    _record_part(sesion, numero, sha256)
+    return sha256
+
+
+def _record_part(sesion, numero, sha256):
+    """Registra la parte como recibida con su SHA-256, o la quita si `sha256` es None."""
+    # Varias partes pueden llegar en paralelo: se registra con la fila bloqueada
+    with transaction.atomic():
+        bloqueada = BulkUploadSession.objects.select_for_update().get(pk=sesion.pk)
+        campos = ['partes', 'actualizado_en']
+        if sha256 is None:
+            bloqueada.partes.pop(str(numero), None)
+        else:
+            bloqueada.partes[str(numero)] = sha256
+            if numero == 0:
+                check_session_header(bloqueada)
+                campos += ['columnas', 'error_encabezado']
+        bloqueada.save(update_fields=campos)
+
+    sesion.refresh_from_db()
+
+
+def check_session_header(sesion):
+    """
+    Valida los headers con la primera parte, sin esperar el archivo completo.
+
+    Los archivos comprimidos y los headers más largos que la primera parte se
+    validan recién al finalizar.
+    """
+    if get_compression(sesion.nombre_archivo):
+        return
+
+    with open(get_partial_path(sesion), 'rb') as f:
+        first_line = f.readline(sesion.tamano_de_parte(0))
+    if not first_line.endswith(b'\n'):
+        return
+
+    try:
+        first_line = first_line.decode('utf-8')
+        sesion.columnas = parse_header_columns(first_line, detect_delimiter(first_line.strip()))
+        sesion.error_encabezado = ''
+    except UnicodeDecodeError:
+        sesion.error_encabezado = "El archivo no está en formato UTF-8 válido"
+    except ValidationError as e:
+        sesion.error_encabezado = ' '.join(e.messages)
+
+
+def assemble_session_file(sesion):
+    """
+    Verifica que la sesión tenga todas sus partes y, si se entregó, el checksum del archivo completo.
+
+    Sin `sesion.sha256` el archivo armado no se verifica: solo las partes que llegaron con su SHA-256.
+
+    Returns:
+        AssembledUpload: Archivo completo, con el nombre original
+
+    Raises:
+        ValidationError: Si faltan partes o el SHA-256 no coincide
+    """
+    faltantes = [numero for numero in range(sesion.partes_totales) if str(numero) not in sesion.partes]
+    if faltantes:
+        muestra = ', '.join(str(numero) for numero in faltantes[:10])
+        raise ValidationError(f"Faltan {len(faltantes)} partes: {muestra}")
+
+    ruta = get_partial_path(sesion)
+    if sesion.sha256:
+        digest = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for chunk in _read_chunks(f, CHUNK_SIZE):
+                digest.update(chunk)
+        if digest.hexdigest() != sesion.sha256.lower():
+            raise ValidationError("El SHA-256 del archivo completo no coincide")
+
+    return AssembledUpload(open(ruta, 'rb'), name=sesion.nombre_archivo)
@@ -0,0 +1,126 @@
+"""
+Respuestas condicionales (ETag / Last-Modified) para los endpoints de lectura.
+
+El frontend consulta periódicamente los listados y las estadísticas aunque
+los datos no hayan cambiado. Las acciones decoradas con `conditional` calculan
+primero una versión barata de los datos que muestran y, si coincide con el
+`If-None-Match` del request, responden 304 sin consultar ni serializar las filas.
+- La versión de una tabla es su cantidad de filas y su mayor `actualizado_en`
+  (una consulta de agregación): las altas y modificaciones mueven el máximo y
+  las bajas cambian la cantidad. Las escrituras que no pasan por save()
+  (bulk_update) deben actualizar `actualizado_en`, como la carga masiva.
+- El ETag combina esa versión con la URL completa (filtros, página, orden)
+  y el formato de la respuesta.
+- Last-Modified solo se usa para validar recursos individuales: en un
+  listado una baja no mueve el mayor `actualizado_en`.
+"""
+from functools import wraps
+from hashlib import sha1
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def table_version(*querysets):
+    """
+    Versión de los datos de `querysets`: cantidad de filas y mayor actualizado_en de cada uno.
+
+    Los conteos de todos los querysets se leen con una sola consulta (UNION ALL).
+
+    Returns:
+        str: Versión que cambia con cada alta, modificación o baja
+    """
+    consultas = [
+        queryset.order_by()
+        .annotate(consulta=Value(indice, output_field=IntegerField()))
+        .values('consulta')
+        .annotate(total=Count('pk'), ultimo=Max('actualizado_en'))
+        .values_list('consulta', 'total', 'ultimo')
+        for indice, queryset in enumerate(querysets)
+    ]
+    filas = consultas[0].union(*consultas[1:], all=True) if len(consultas) > 1 else consultas[0]
+    return '|'.join(f'{total}@{ultimo or ""}' for _, total, ultimo in sorted(filas))
+
+
+def tax_ratings_version(view, request, *args, **kwargs):
+    """
+    Versión de los listados de calificaciones, que también muestran datos de Issuer e Instrument.
+
+    Con `sin_total=true` (paginación por cursor) no se valida: la versión cuenta
+    toda la tabla, justo lo que ese modo evita.
+    """
+    from parametros.models import Instrument, Issuer
+    from .models import TaxRating
+    from .pagination import VERDADEROS
+
+    if request.query_params.get('sin_total', '').lower() in VERDADEROS:
+        return None
+    return table_version(TaxRating.objects.all(), Issuer.objects.all(), Instrument.objects.all())
+
+
+def tax_rating_stats_version(view, request, *args, **kwargs):
+    """Versión de las estadísticas de calificaciones (solo dependen de la tabla de calificaciones)."""
+    from .models import TaxRating
+
+    return table_version(TaxRating.objects.all())
+
+
+def tax_rating_version(view, request, pk=None, **kwargs):
+    """
+    Versión de una calificación y de su Issuer e Instrument.
+
+    Returns:
+        tuple: (version, last_modified), o None si la calificación no existe
+    """
+    from .models import TaxRating
+
+    fechas = TaxRating.objects.filter(pk=pk).values_list(
+        'actualizado_en', 'issuer__actualizado_en', 'instrument__actualizado_en'
+    ).first()
+    if fechas is None:
+        return None
+    return '|'.join(fecha.isoformat() for fecha in fechas), max(fechas)
+
+
+def active_rows_version(view, request, *args, **kwargs):
+    """Versión de las filas activas del queryset de la vista (acciones `activos` de parametros)."""
+    return table_version(view.get_queryset().filter(activo=True))
+
+
+def conditional(get_version):
+    """
+    Decorador para acciones GET de un viewset que responde 304 si el cliente tiene la versión vigente.
+
+    `get_version(view, request, *args, **kwargs)` retorna la versión como string,
+    una tupla (version, last_modified) o None para responder sin validar.
+    Se ejecuta después de la autenticación y los permisos de la vista.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_version(self, request, *args, **kwargs)
+            if version is None:
+                return method(self, request, *args, **kwargs)
+
+            last_modified = None
+            if isinstance(version, tuple):
+                version, last_modified = version
+            clave = f'{request.get_full_path()}|{getattr(request, "accepted_media_type", "")}|{version}'
+            etag = quote_etag(sha1(clave.encode('utf-8')).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            no_modificada = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if no_modificada is not None:
+                no_modificada['ETag'] = etag
+                return no_modificada
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                # El navegador guarda la respuesta pero la revalida en cada consulta
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
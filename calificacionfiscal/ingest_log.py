@@ -0,0 +1,78 @@
+"""
+Logging de la ingesta de cargas masivas sin costo por fila.
+
+En archivos de 100k filas un `logger.info` por fila (con la fila formateada)
+consume una parte medible de la CPU y llena el pipeline de logs. IngestLogger
+reemplaza esos llamados:
+- Resumen agregado por lote a nivel INFO.
+- Detalle por fila a nivel DEBUG, solo para una muestra de 1 de cada
+  BULK_UPLOAD_LOG_SAMPLE_EVERY filas y solo si DEBUG está habilitado.
+- Advertencias de filas con error limitadas a BULK_UPLOAD_LOG_MAX_WARNINGS por
+  segundo; las omitidas se cuentan en el resumen del lote.
+- Los mensajes se formatean de forma perezosa (argumentos de logging, no f-strings).
+- El tiempo gastado emitiendo logs se acumula en `segundos`, para compararlo
+  con el tiempo de trabajo en BulkUpload.tiempos_etapas.
+"""
+import logging
+import time
+from django.conf import settings
+
+# Una de cada cuántas filas se registra con detalle a nivel DEBUG
+DEFAULT_SAMPLE_EVERY = 1000
+
+# Advertencias de filas con error que se registran por segundo como máximo
+DEFAULT_MAX_WARNINGS = 20
+
+
+class IngestLogger:
+    """Logger de la ingesta: resúmenes por lote, detalle muestreado y advertencias limitadas."""
+
+    def __init__(self, logger, sample_every=None, max_warnings=None, interval=1.0):
+        self.logger = logger
+        self.sample_every = sample_every or getattr(settings, 'BULK_UPLOAD_LOG_SAMPLE_EVERY', DEFAULT_SAMPLE_EVERY)
+        if max_warnings is None:
+            max_warnings = getattr(settings, 'BULK_UPLOAD_LOG_MAX_WARNINGS', DEFAULT_MAX_WARNINGS)
+        self.max_warnings = max_warnings
+        self.interval = interval
+        self.segundos = 0.0
+        self.filas = 0
+        self.omitidas = 0
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+        self._ventana = time.monotonic()
+        self._en_ventana = 0
+
+    def row(self, numero_fila, row_data):
+        """Registra el detalle de una fila a nivel DEBUG si le toca en la muestra."""
+        self.filas += 1
+        if not self._debug or self.filas % self.sample_every:
+            return
+        inicio = time.perf_counter()
+        self.logger.debug("Procesando fila %d (muestra 1 de %d): %s", numero_fila, self.sample_every, row_data)
+        self.segundos += time.perf_counter() - inicio
+
+    def row_error(self, numero_fila, errores):
+        """Registra una fila con error a nivel WARNING, respetando el límite por segundo."""
+        ahora = time.monotonic()
+        if ahora - self._ventana >= self.interval:
+            self._ventana = ahora
+            self._en_ventana = 0
+        if self._en_ventana >= self.max_warnings:
+            self.omitidas += 1
+            return
+        self._en_ventana += 1
+        inicio = time.perf_counter()
+        self.logger.warning("Fila %d falló validación: %s", numero_fila, errores)
+        self.segundos += time.perf_counter() - inicio
+
+    def batch(self, total_filas, filas_ok, filas_error):
+        """Registra el resumen de un lote procesado e informa las advertencias omitidas."""
+        inicio = time.perf_counter()
+        if self.omitidas:
+            self.logger.info(
+                "Lote procesado: %d filas leídas (%d OK, %d ERROR); %d advertencias de filas omitidas",
+                total_filas, filas_ok, filas_error, self.omitidas,
+            )
+            self.omitidas = 0
+        else:
+            self.logger.info("Lote procesado: %d filas leídas (%d OK, %d ERROR)", total_filas, filas_ok, filas_error)
+        self.segundos += time.perf_counter() - inicio
@@ -0,0 +1,200 @@
+"""
+Índice de vigencias de una carga masiva.
+
+Antes de escribir cada lote, las filas se revisan contra un índice en memoria
+que se mantiene durante toda la carga:
+- Claves (issuer, instrument, valid_from) ya vistas en el archivo: una fila
+  que repite la clave de otra anterior es error de duplicado, aunque estén en
+  lotes distintos (antes solo se detectaba cuando fallaba el INSERT).
+- Por cada par issuer/instrument, los rangos VIGENTE ordenados por valid_from:
+  las calificaciones de la base de datos y las filas VIGENTE ya aceptadas del
+  archivo. Una fila se solapa si su rango [valid_from, valid_to] toca alguno
+  de esos rangos, con la misma regla de TaxRatingSerializer.validate
+  (valid_to nulo es un rango abierto).
+
+Los rangos de cada par se cargan con una consulta la primera vez que el par
+aparece. Se guardan en un treap (árbol binario de búsqueda con prioridades
+aleatorias) por valid_from en el que cada nodo conoce el mayor fin de su
+subárbol: revisar, agregar o quitar un rango toma O(log n) esperado, por lo
+que una carga de n filas de un mismo par se revisa en O(n log n) aunque los
+rangos lleguen en cualquier orden.
+
+Se cargan todas las calificaciones VIGENTE, también las creadas después de
+subir el archivo. Al reanudar una carga interrumpida, sus filas hasta el
+checkpoint ya están en la base de datos y cuentan como calificaciones
+existentes, igual que si estuvieran en el índice; las filas siguientes no
+se insertaron (cada lote se confirma junto con el checkpoint).
+"""
+import random
+from datetime import date
+
+
+class _Nodo:
+    """Rango de un treap de vigencias; `max_fin` es el mayor fin de su subárbol."""
+
+    __slots__ = ('inicio', 'fin', 'prioridad', 'izquierdo', 'derecho', 'max_fin')
+
+    def __init__(self, inicio, fin):
+        self.inicio = inicio
+        self.fin = fin
+        self.prioridad = random.random()
+        self.izquierdo = None
+        self.derecho = None
+        self.max_fin = fin
+
+
+def _max_fin(nodo):
+    return nodo.max_fin if nodo is not None else date.min
+
+
+def _actualizar(nodo):
+    nodo.max_fin = max(nodo.fin, _max_fin(nodo.izquierdo), _max_fin(nodo.derecho))
+    return nodo
+
+
+def _dividir(nodo, inicio, incluir=False):
+    """Divide un treap en (inicios < inicio, inicios >= inicio); con `incluir`, en (<=, >)."""
+    if nodo is None:
+        return None, None
+    if nodo.inicio < inicio or (incluir and nodo.inicio == inicio):
+        nodo.derecho, derecho = _dividir(nodo.derecho, inicio, incluir)
+        return _actualizar(nodo), derecho
+    izquierdo, nodo.izquierdo = _dividir(nodo.izquierdo, inicio, incluir)
+    return izquierdo, _actualizar(nodo)
+
+
+def _unir(izquierdo, derecho):
+    """Une dos treaps donde todos los inicios de `izquierdo` son menores que los de `derecho`."""
+    if izquierdo is None:
+        return derecho
+    if derecho is None:
+        return izquierdo
+    if izquierdo.prioridad > derecho.prioridad:
+        izquierdo.derecho = _unir(izquierdo.derecho, derecho)
+        return _actualizar(izquierdo)
+    derecho.izquierdo = _unir(izquierdo, derecho.izquierdo)
+    return _actualizar(derecho)
+
+
+class ValidityIntervals:
+    """Rangos de vigencia de un par issuer/instrument ordenados por valid_from."""
+
+    def __init__(self, rangos):
+        self.raiz = None
+        for desde, hasta in rangos:
+            self.add(desde, hasta)
+
+    def add(self, valid_from, valid_to=None):
+        """Agrega el rango [valid_from, valid_to] (valid_to None es abierto)."""
+        izquierdo, derecho = _dividir(self.raiz, valid_from)
+        self.raiz = _unir(_unir(izquierdo, _Nodo(valid_from, valid_to or date.max)), derecho)
+
+    def discard(self, valid_from):
+        """Quita el rango que empieza en `valid_from`, si existe."""
+        izquierdo, resto = _dividir(self.raiz, valid_from)
+        mismo_inicio, derecho = _dividir(resto, valid_from, incluir=True)
+        if mismo_inicio is not None:
+            mismo_inicio = _unir(mismo_inicio.izquierdo, mismo_inicio.derecho)
+        self.raiz = _unir(_unir(izquierdo, mismo_inicio), derecho)
+
+    def _max_fin_antes(self, valid_from):
+        """Mayor fin entre los rangos que empiezan antes de `valid_from`."""
+        max_fin = date.min
+        nodo = self.raiz
+        while nodo is not None:
+            if nodo.inicio < valid_from:
+                max_fin = max(max_fin, nodo.fin, _max_fin(nodo.izquierdo))
+                nodo = nodo.derecho
+            else:
+                nodo = nodo.izquierdo
+        return max_fin
+
+    def _siguiente_inicio(self, valid_from, excluir_inicio=False):
+        """Menor inicio mayor o igual a `valid_from` (estrictamente mayor con `excluir_inicio`)."""
+        siguiente = None
+        nodo = self.raiz
+        while nodo is not None:
+            if nodo.inicio > valid_from or (nodo.inicio == valid_from and not excluir_inicio):
+                siguiente = nodo.inicio
+                nodo = nodo.izquierdo
+            else:
+                nodo = nodo.derecho
+        return siguiente
+
+    def overlaps(self, valid_from, valid_to=None, excluir_inicio=False):
+        """
+        Indica si [valid_from, valid_to] se solapa con algún rango (valid_to None es abierto).
+
+        Args:
+            excluir_inicio: Ignorar el rango que empieza en `valid_from` (la misma
+                calificación, cuando la fila la actualiza)
+        """
+        # Rangos que empiezan antes: se solapan si alguno termina en valid_from o después
+        if self._max_fin_antes(valid_from) >= valid_from:
+            return True
+
+        # Rangos que empiezan entre valid_from y valid_to: siempre se solapan
+        siguiente = self._siguiente_inicio(valid_from, excluir_inicio)
+        return siguiente is not None and (valid_to is None or siguiente <= valid_to)
+
+
+class ValidityIndex:
+    """Índice de claves y rangos de vigencia de una carga masiva."""
+
+    def __init__(self):
+        self.claves = set()
+        self.pares = {}
+
+    def load(self, pares):
+        """Carga con una consulta los rangos VIGENTE de los pares (issuer_id, instrument_id) aún no cargados."""
+        from .models import TaxRating
+
+        nuevos = set(pares) - self.pares.keys()
+        if not nuevos:
+            return
+
+        vigentes = TaxRating.objects.filter(
+            status='VIGENTE',
+            issuer_id__in={par[0] for par in nuevos},
+            instrument_id__in={par[1] for par in nuevos},
+        )
+        rangos = {par: [] for par in nuevos}
+        for issuer_id, instrument_id, valid_from, valid_to in vigentes.values_list(
+            'issuer_id', 'instrument_id', 'valid_from', 'valid_to'
+        ):
+            # El filtro por componentes entrega un superconjunto de los pares
+            if (issuer_id, instrument_id) in rangos:
+                rangos[(issuer_id, instrument_id)].append((valid_from, valid_to))
+        for par, lista in rangos.items():
+            self.pares[par] = ValidityIntervals(lista)
+
+    def add_key(self, clave):
+        """
+        Registra una clave (issuer_id, instrument_id, valid_from) del archivo.
+
+        Returns:
+            bool: False si la clave ya estaba en una fila anterior del archivo
+        """
+        if clave in self.claves:
+            return False
+        self.claves.add(clave)
+        return True
+
+    def overlaps(self, tax_rating, excluir_existente=False):
+        """Indica si el rango de un TaxRating (de un par ya cargado) se solapa con uno vigente."""
+        intervalos = self.pares[(tax_rating.issuer_id, tax_rating.instrument_id)]
+        return intervalos.overlaps(tax_rating.valid_from, tax_rating.valid_to, excluir_existente)
+
+    def accept(self, tax_rating, reemplaza_existente=False):
+        """
+        Registra el rango de una fila aceptada, para revisar contra ella las filas siguientes.
+
+        Args:
+            reemplaza_existente: La fila actualiza la calificación existente con la
+                misma clave; su rango anterior deja de contar
+        """
+        intervalos = self.pares[(tax_rating.issuer_id, tax_rating.instrument_id)]
+        if reemplaza_existente:
+            intervalos.discard(tax_rating.valid_from)
+        if tax_rating.status == 'VIGENTE':
+            intervalos.add(tax_rating.valid_from, tax_rating.valid_to)
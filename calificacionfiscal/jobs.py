@@ -0,0 +1,289 @@
+"""
+Cola de trabajos para procesar cargas masivas fuera del request HTTP.
+
+La cola vive en la propia tabla de BulkUpload:
+- `procesar` deja la carga en estado EN_COLA.
+- Los workers (comando bulk_upload_worker) toman cargas con
+  SELECT ... FOR UPDATE SKIP LOCKED, de modo que dos workers nunca toman la misma.
+- Mientras procesa, el worker actualiza `heartbeat_en` después de cada lote.
+  El checkpoint de cada lote se guarda en la transacción del lote solo si la
+  carga sigue en PROCESANDO con ese worker; si no, el lote se revierte.
+- El comando process_uploads toma sus cargas igual (claim_bulk_upload), con
+  su propio worker y heartbeat.
+- Las cargas en PROCESANDO con worker y sin heartbeat reciente (worker caído
+  o matado por timeout) se vuelven a encolar, hasta BULK_UPLOAD_MAX_ATTEMPTS intentos.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import BulkUpload
+from .utils import process_bulk_upload_file
+
+logger = logging.getLogger(__name__)
+
+# Segundos sin heartbeat tras los cuales una carga en PROCESANDO se considera abandonada
+DEFAULT_HEARTBEAT_TIMEOUT = 300
+
+# Intentos máximos antes de marcar una carga abandonada como ERROR
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Cada cuántas filas procesadas se publica el avance de una carga
+DEFAULT_PROGRESS_EVERY = 1000
+
+
+class BulkUploadJobLost(Exception):
+    """La carga fue reencolada o tomada por otro worker mientras se procesaba."""
+
+
+def get_worker_id():
+    """Identificador del proceso worker actual (host:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_bulk_upload(bulk_upload):
+    """Deja una carga PENDIENTE en la cola para que la procese un worker."""
+    bulk_upload.estado = 'EN_COLA'
+    bulk_upload.encolado_en = timezone.now()
+    bulk_upload.save(update_fields=['estado', 'encolado_en', 'actualizado_en'])
+    return bulk_upload
+
+
+def claim_next_bulk_upload(worker_id):
+    """
+    Toma la carga en cola más antigua y la marca como PROCESANDO.
+
+    El bloqueo con SKIP LOCKED permite que varios workers consulten la cola
+    a la vez sin esperarse ni tomar la misma carga.
+
+    Returns:
+        BulkUpload o None si la cola está vacía
+    """
+    with transaction.atomic():
+        bulk_upload = (
+            BulkUpload.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(estado='EN_COLA')
+            .order_by('encolado_en', 'id')
+            .first()
+        )
+        if bulk_upload is None:
+            return None
+
+        ahora = timezone.now()
+        bulk_upload.estado = 'PROCESANDO'
+        bulk_upload.fecha_inicio = ahora
+        bulk_upload.heartbeat_en = ahora
+        bulk_upload.worker = worker_id
+        bulk_upload.intentos += 1
+        bulk_upload.save(update_fields=[
+            'estado', 'fecha_inicio', 'heartbeat_en', 'worker', 'intentos', 'actualizado_en'
+        ])
+    return bulk_upload
+
+
+def claim_bulk_upload(upload_id, worker_id, estados=('PENDIENTE', 'EN_COLA')):
+    """
+    Toma una carga específica (comando process_uploads) y la marca como PROCESANDO.
+
+    Igual que claim_next_bulk_upload deja el worker y el heartbeat, de modo que
+    requeue_stale_bulk_uploads no la reencole mientras siga enviando heartbeats.
+    El UPDATE condicional evita que dos procesos tomen la misma carga.
+
+    Returns:
+        BulkUpload o None si la carga no existe o no está en uno de `estados`
+    """
+    ahora = timezone.now()
+    tomada = BulkUpload.objects.filter(pk=upload_id, estado__in=estados).update(
+        estado='PROCESANDO',
+        fecha_inicio=ahora,
+        heartbeat_en=ahora,
+        worker=worker_id,
+        intentos=F('intentos') + 1,
+        actualizado_en=ahora,
+    )
+    if not tomada:
+        return None
+    return BulkUpload.objects.select_related('usuario').get(pk=upload_id)
+
+
+def send_heartbeat(bulk_upload, worker_id):
+    """
+    Actualiza el heartbeat de una carga en proceso.
+
+    Returns:
+        bool: False si la carga ya no pertenece a este worker
+    """
+    actualizadas = BulkUpload.objects.filter(
+        pk=bulk_upload.pk, estado='PROCESANDO', worker=worker_id
+    ).update(heartbeat_en=timezone.now())
+    return actualizadas == 1
+
+
+def requeue_stale_bulk_uploads(timeout=None, max_attempts=None):
+    """
+    Reencola las cargas en PROCESANDO cuyo worker dejó de enviar heartbeat.
+
+    Las que ya agotaron sus intentos se marcan como ERROR.
+
+    Returns:
+        tuple: (reencoladas, fallidas)
+    """
+    timeout = timeout or getattr(settings, 'BULK_UPLOAD_HEARTBEAT_TIMEOUT', DEFAULT_HEARTBEAT_TIMEOUT)
+    max_attempts = max_attempts or getattr(settings, 'BULK_UPLOAD_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    ahora = timezone.now()
+    limite = ahora - timedelta(seconds=timeout)
+
+    # Solo las cargas tomadas por un worker envían heartbeat; sin worker no se sabe si siguen vivas
+    abandonadas = BulkUpload.objects.filter(estado='PROCESANDO', heartbeat_en__lt=limite).exclude(worker='')
+
+    fallidas = abandonadas.filter(intentos__gte=max_attempts).update(
+        estado='ERROR',
+        resumen_errores={'error_general': f'Procesamiento abandonado después de {max_attempts} intentos'},
+        fecha_fin=ahora,
+        worker='',
+        actualizado_en=ahora,
+    )
+    reencoladas = abandonadas.update(
+        estado='EN_COLA',
+        encolado_en=ahora,
+        worker='',
+        actualizado_en=ahora,
+    )
+
+    if reencoladas or fallidas:
+        logger.warning("Cargas abandonadas: %d reencoladas, %d marcadas como ERROR", reencoladas, fallidas)
+    return reencoladas, fallidas
+
+
+class ProgressReporter:
+    """
+    Publica el avance de una carga en curso en su propia fila de BulkUpload.
+
+    Se usa como `on_progress` del procesamiento: cada `every` filas escribe con
+    un UPDATE las filas OK/ERROR, el rendimiento en filas/s y la hora del reporte,
+    sin guardar el modelo completo ni tocar resumen_errores.
+
+    Al reanudar una carga los totales incluyen las filas confirmadas por la
+    ejecución anterior; el rendimiento solo cuenta las procesadas en esta.
+    """
+
+    def __init__(self, bulk_upload, every=None):
+        self.bulk_upload = bulk_upload
+        self.every = every or getattr(settings, 'BULK_UPLOAD_PROGRESS_EVERY', DEFAULT_PROGRESS_EVERY)
+        self.inicio = time.monotonic()
+        # Filas que ya tienen item de una ejecución anterior (las que se restauran al reanudar)
+        self.base = bulk_upload.items.count()
+        self.publicadas = self.base
+
+    def __call__(self, progreso):
+        procesadas = progreso['filas_ok'] + progreso['filas_error']
+        if procesadas - self.publicadas >= self.every:
+            self.publish(progreso)
+
+    def publish(self, progreso):
+        procesadas = progreso['filas_ok'] + progreso['filas_error']
+        segundos = time.monotonic() - self.inicio
+        campos = {
+            'filas_ok': progreso['filas_ok'],
+            'filas_error': progreso['filas_error'],
+            'filas_por_segundo': round((procesadas - self.base) / segundos, 2) if segundos > 0 else 0,
+            'progreso_en': timezone.now(),
+        }
+        # El conteo preliminar puede faltar si el preview falló al subir el archivo
+        if progreso['total_filas'] > self.bulk_upload.total_filas:
+            campos['total_filas'] = progreso['total_filas']
+        BulkUpload.objects.filter(pk=self.bulk_upload.pk).update(**campos)
+        self.publicadas = procesadas
+
+
+def finish_bulk_upload(bulk_upload, resultado):
+    """Guarda el resultado de una carga procesada, la deja COMPLETADO y la audita."""
+    from cuentas.audit_models import AuditLog
+
+    bulk_upload.estado = 'COMPLETADO'
+    bulk_upload.total_filas = resultado['total_filas']
+    bulk_upload.filas_ok = resultado['filas_ok']
+    bulk_upload.filas_error = resultado['filas_error']
+    bulk_upload.filas_actualizadas = resultado['filas_actualizadas']
+    bulk_upload.filas_sin_cambios = resultado['filas_sin_cambios']
+    bulk_upload.resumen_errores = resultado['resumen_errores']
+    bulk_upload.tiempos_etapas = resultado.get('tiempos', {})
+    bulk_upload.fecha_fin = timezone.now()
+    # Solo el resultado: el avance (filas_por_segundo, progreso_en, checkpoint) se escribe con update()
+    # y la instancia puede tener valores viejos
+    bulk_upload.save(update_fields=[
+        'estado', 'total_filas', 'filas_ok', 'filas_error', 'filas_actualizadas', 'filas_sin_cambios',
+        'resumen_errores', 'tiempos_etapas', 'fecha_fin', 'actualizado_en',
+    ])
+
+    AuditLog.objects.create(
+        usuario=bulk_upload.usuario,
+        accion='UPDATE',
+        modelo='BulkUpload',
+        object_id=str(bulk_upload.id),
+        descripcion=f'Carga masiva completada: {bulk_upload.filas_ok} OK, {bulk_upload.filas_error} errores'
+    )
+
+
+def fail_bulk_upload(bulk_upload, error):
+    """Deja una carga en ERROR con el mensaje de la excepción."""
+    bulk_upload.estado = 'ERROR'
+    bulk_upload.resumen_errores = {'error_general': str(error)}
+    bulk_upload.fecha_fin = timezone.now()
+    bulk_upload.save(update_fields=['estado', 'resumen_errores', 'fecha_fin', 'actualizado_en'])
+
+
+def run_bulk_upload(bulk_upload, chunk_size=None, on_progress=None):
+    """
+    Procesa una carga que ya está en PROCESANDO y guarda el resultado.
+
+    El avance se publica en la carga mientras se procesa (ver ProgressReporter).
+    Si el procesamiento falla la carga queda en ERROR y la excepción se propaga.
+
+    Returns:
+        dict: Resumen del procesamiento
+    """
+    reporter = ProgressReporter(bulk_upload)
+
+    def progreso(parcial):
+        if on_progress is not None:
+            on_progress(parcial)
+        reporter(parcial)
+
+    try:
+        resultado = process_bulk_upload_file(bulk_upload, chunk_size=chunk_size, on_progress=progreso)
+    except BulkUploadJobLost:
+        raise
+    except Exception as e:
+        fail_bulk_upload(bulk_upload, e)
+        raise
+
+    finish_bulk_upload(bulk_upload, resultado)
+    return resultado
+
+
+def heartbeat_callback(bulk_upload, worker_id):
+    """
+    Función de avance que envía el heartbeat de una carga tomada.
+
+    Lanza BulkUploadJobLost si otro proceso reencoló la carga (heartbeat perdido).
+    """
+    def heartbeat(_progreso):
+        if not send_heartbeat(bulk_upload, worker_id):
+            raise BulkUploadJobLost(f'La carga #{bulk_upload.id} ya no pertenece a {worker_id}')
+
+    return heartbeat
+
+
+def run_claimed_bulk_upload(bulk_upload, worker_id, chunk_size=None):
+    """
+    Procesa una carga tomada (de la cola o con claim_bulk_upload) enviando heartbeat después de cada lote.
+
+    Si otro proceso reencoló la carga (heartbeat perdido), se aborta sin tocar su estado.
+    """
+    return run_bulk_upload(bulk_upload, chunk_size=chunk_size, on_progress=heartbeat_callback(bulk_upload, worker_id))
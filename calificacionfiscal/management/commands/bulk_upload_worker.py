@@ -0,0 +1,79 @@
+"""
+Comando Django que procesa la cola de cargas masivas de forma continua.
+Toma las cargas en estado EN_COLA (encoladas por el endpoint procesar) y
+reencola las que quedaron abandonadas en PROCESANDO.
+Uso: python manage.py bulk_upload_worker [--once] [--sleep 5]
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from calificacionfiscal.jobs import (
+    BulkUploadJobLost, claim_next_bulk_upload, get_worker_id,
+    requeue_stale_bulk_uploads, run_claimed_bulk_upload,
+)
+
+
+class Command(BaseCommand):
+    help = 'Worker que procesa la cola de cargas masivas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar las cargas en cola hasta vaciarla y terminar',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Segundos de espera cuando la cola está vacía (por defecto 5)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Filas por lote de inserción (por defecto BULK_UPLOAD_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = get_worker_id()
+        self.stdout.write(self.style.NOTICE(f'Worker {worker_id} iniciado'))
+
+        try:
+            while True:
+                close_old_connections()
+                requeue_stale_bulk_uploads()
+
+                bulk_upload = claim_next_bulk_upload(worker_id)
+                if bulk_upload is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.process_job(bulk_upload, worker_id, options.get('chunk_size'))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f'Worker {worker_id} detenido'))
+
+    def process_job(self, bulk_upload, worker_id, chunk_size):
+        """Procesa una carga tomada de la cola."""
+        self.stdout.write(
+            self.style.NOTICE(f'Procesando carga #{bulk_upload.id} (intento {bulk_upload.intentos})...')
+        )
+
+        try:
+            resultado = run_claimed_bulk_upload(bulk_upload, worker_id, chunk_size=chunk_size)
+        except BulkUploadJobLost as e:
+            self.stdout.write(self.style.WARNING(f'✗ {e}'))
+            return
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'✗ Error en carga #{bulk_upload.id}: {str(e)}')
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Carga #{bulk_upload.id} completada: '
+                f'{resultado["filas_ok"]} OK, {resultado["filas_error"]} errores'
+            )
+        )
@@ -1,12 +1,16 @@
 """
 Comando Django para procesar cargas masivas pendientes.
 Solo procesa archivos UTF-8.
-Uso: python manage.py process_uploads
+Uso: python manage.py process_uploads [--id ID | --all] [--workers N]
 """
+from concurrent.futures import as_completed
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from calificacionfiscal.models import BulkUpload
-from calificacionfiscal.utils import process_bulk_upload_file
+from calificacionfiscal.jobs import (
+    BulkUploadJobLost, ProgressReporter, claim_bulk_upload, fail_bulk_upload, finish_bulk_upload,
+    get_worker_id, heartbeat_callback, run_claimed_bulk_upload,
+)
+from calificacionfiscal.parallel import create_process_pool, process_bulk_upload_parallel, process_upload_task
 
 
 class Command(BaseCommand):
@@ -23,24 +27,54 @@ class Command(BaseCommand):
             action='store_true',
             help='Procesar todas las cargas pendientes',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Filas por lote de inserción (por defecto BULK_UPLOAD_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Cantidad de procesos en paralelo (por defecto 1)',
+        )
+        parser.add_argument(
+            '--split-size',
+            type=float,
+            default=5,
+            help='Con --workers, las cargas de al menos este tamaño en MB reparten sus lotes entre los procesos',
+        )
 
     def handle(self, *args, **options):
         upload_id = options.get('id')
         process_all = options.get('all')
+        self.chunk_size = options.get('chunk_size')
+        self.workers = max(1, options.get('workers') or 1)
+        split_bytes = int(options.get('split_size') * 1024 * 1024)
+        self.worker_id = get_worker_id()
         
         if upload_id:
             # Procesar una carga específica
             try:
                 bulk_upload = BulkUpload.objects.get(id=upload_id)
-                self.process_upload(bulk_upload)
             except BulkUpload.DoesNotExist:
                 self.stdout.write(
                     self.style.ERROR(f'No existe carga con ID {upload_id}')
                 )
+                return
+            # Una carga con --id puede reprocesarse si terminó con error
+            self.estados_reprocesables = ('PENDIENTE', 'EN_COLA', 'ERROR')
+
+            if self.workers > 1:
+                with create_process_pool(self.workers) as pool:
+                    self.process_upload_parallel(bulk_upload, pool)
+            else:
+                self.process_upload(bulk_upload)
         elif process_all:
             # Procesar todas las pendientes
-            pending_uploads = BulkUpload.objects.filter(estado='PENDIENTE')
-            total = pending_uploads.count()
+            pending_uploads = list(BulkUpload.objects.filter(estado='PENDIENTE'))
+            self.estados_reprocesables = ('PENDIENTE',)
+            total = len(pending_uploads)
             
             if total == 0:
                 self.stdout.write(
@@ -49,11 +83,14 @@ class Command(BaseCommand):
                 return
             
             self.stdout.write(
-                self.style.NOTICE(f'Procesando {total} cargas pendientes...')
+                self.style.NOTICE(f'Procesando {total} cargas pendientes con {self.workers} proceso(s)...')
             )
             
-            for bulk_upload in pending_uploads:
-                self.process_upload(bulk_upload)
+            if self.workers > 1:
+                self.process_all_parallel(pending_uploads, split_bytes)
+            else:
+                for bulk_upload in pending_uploads:
+                    self.process_upload(bulk_upload)
         else:
             self.stdout.write(
                 self.style.ERROR('Debe especificar --id o --all')
@@ -65,39 +102,103 @@ class Command(BaseCommand):
             self.style.NOTICE(f'Procesando carga #{bulk_upload.id}...')
         )
         
-        # Actualizar estado
-        bulk_upload.estado = 'PROCESANDO'
-        bulk_upload.fecha_inicio = timezone.now()
-        bulk_upload.save()
+        # Tomar la carga con worker y heartbeat, igual que bulk_upload_worker
+        bulk_upload = self.claim(bulk_upload)
+        if bulk_upload is None:
+            return
         
         try:
-            # Procesar archivo
-            resultado = process_bulk_upload_file(bulk_upload)
-            
-            # Actualizar con resultados
-            bulk_upload.estado = 'COMPLETADO'
-            bulk_upload.total_filas = resultado['total_filas']
-            bulk_upload.filas_ok = resultado['filas_ok']
-            bulk_upload.filas_error = resultado['filas_error']
-            bulk_upload.resumen_errores = resultado['resumen_errores']
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'✓ Carga #{bulk_upload.id} completada: '
-                    f'{resultado["filas_ok"]} OK, {resultado["filas_error"]} errores'
-                )
+            resultado = run_claimed_bulk_upload(bulk_upload, self.worker_id, chunk_size=self.chunk_size)
+            self.report_success(bulk_upload.id, resultado)
+        except Exception as e:
+            self.report_error(bulk_upload.id, e)
+
+    def process_upload_parallel(self, bulk_upload, pool):
+        """Procesa una carga repartiendo sus lotes entre los procesos del pool."""
+        self.stdout.write(
+            self.style.NOTICE(f'Procesando carga #{bulk_upload.id} en paralelo...')
+        )
+
+        bulk_upload = self.claim(bulk_upload)
+        if bulk_upload is None:
+            return
+
+        reporter = ProgressReporter(bulk_upload)
+        heartbeat = heartbeat_callback(bulk_upload, self.worker_id)
+
+        def progreso(parcial):
+            heartbeat(parcial)
+            reporter(parcial)
+
+        try:
+            resultado = process_bulk_upload_parallel(
+                bulk_upload, pool, chunk_size=self.chunk_size, max_pending=2 * self.workers,
+                on_progress=progreso,
             )
-            
+        except BulkUploadJobLost as e:
+            self.report_error(bulk_upload.id, e)
+            return
         except Exception as e:
-            bulk_upload.estado = 'ERROR'
-            bulk_upload.resumen_errores = {'error_general': str(e)}
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
+            fail_bulk_upload(bulk_upload, e)
+            self.report_error(bulk_upload.id, e)
+            return
+
+        finish_bulk_upload(bulk_upload, resultado)
+        self.report_success(bulk_upload.id, resultado)
+
+    def process_all_parallel(self, pending_uploads, split_bytes):
+        """
+        Reparte las cargas pendientes entre un pool de procesos.
+        Las cargas grandes se procesan una a una repartiendo sus lotes;
+        las demás se envían completas a los procesos del pool.
+        """
+        grandes = [u for u in pending_uploads if self.file_size(u) >= split_bytes]
+        pequenas = [u for u in pending_uploads if u not in grandes]
+
+        with create_process_pool(self.workers) as pool:
+            futures = [pool.submit(process_upload_task, u.id, self.chunk_size) for u in pequenas]
+
+            for bulk_upload in grandes:
+                self.process_upload_parallel(bulk_upload, pool)
+
+            for future in as_completed(futures):
+                upload_id, resultado, error = future.result()
+                if error:
+                    self.report_error(upload_id, error)
+                elif resultado is None:
+                    self.stdout.write(
+                        self.style.WARNING(f'Carga #{upload_id} ya estaba siendo procesada')
+                    )
+                else:
+                    self.report_success(upload_id, resultado)
+
+    def claim(self, bulk_upload):
+        """Toma la carga para este proceso; retorna None si otro proceso ya la tomó o no está pendiente."""
+        tomada = claim_bulk_upload(bulk_upload.id, self.worker_id, estados=self.estados_reprocesables)
+        if tomada is None:
             self.stdout.write(
-                self.style.ERROR(
-                    f'✗ Error en carga #{bulk_upload.id}: {str(e)}'
-                )
+                self.style.WARNING(f'Carga #{bulk_upload.id} ya estaba siendo procesada o no está pendiente')
+            )
+        return tomada
+
+    @staticmethod
+    def file_size(bulk_upload):
+        try:
+            return bulk_upload.archivo.size
+        except (OSError, ValueError):
+            return 0
+
+    def report_success(self, upload_id, resultado):
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Carga #{upload_id} completada: '
+                f'{resultado["filas_ok"]} OK, {resultado["filas_error"]} errores'
             )
+        )
+
+    def report_error(self, upload_id, error):
+        self.stdout.write(
+            self.style.ERROR(
+                f'✗ Error en carga #{upload_id}: {str(error)}'
+            )
+        )
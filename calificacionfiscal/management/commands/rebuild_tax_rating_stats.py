@@ -0,0 +1,17 @@
+"""
+Comando Django para recalcular las estadísticas materializadas de calificaciones.
+Los contadores se mantienen solos al crear, modificar o eliminar calificaciones;
+este comando los reconstruye desde cero si quedaron desalineados (por ejemplo,
+tras cambios hechos directamente en la base de datos).
+Uso: python manage.py rebuild_tax_rating_stats
+"""
+from django.core.management.base import BaseCommand
+from calificacionfiscal.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de estadísticas de calificaciones tributarias'
+
+    def handle(self, *args, **options):
+        contadores = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas: {contadores} contadores'))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0007_add_rechazado_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='encolado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='heartbeat_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='intentos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='bulkupload',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_COLA', 'En cola'), ('PROCESANDO', 'Procesando'), ('COMPLETADO', 'Completado'), ('RECHAZADO', 'Rechazado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='bulkupload',
+            index=models.Index(fields=['estado', 'encolado_en'], name='calificacio_estado_28f4ac_idx'),
+        ),
+    ]
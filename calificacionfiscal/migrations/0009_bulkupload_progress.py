@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0008_bulkupload_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='filas_por_segundo',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='progreso_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
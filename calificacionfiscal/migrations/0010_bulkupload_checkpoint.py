@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0009_bulkupload_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='ultima_fila_confirmada',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0010_bulkupload_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='columnas',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0011_bulkupload_columnas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='filas_actualizadas',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='filas_sin_cambios',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='modo',
+            field=models.CharField(choices=[('INSERTAR', 'Solo insertar (las claves existentes son error)'), ('UPSERT', 'Insertar o actualizar'), ('OMITIR_SIN_CAMBIOS', 'Insertar y omitir filas sin cambios')], default='INSERTAR', max_length=20),
+        ),
+    ]
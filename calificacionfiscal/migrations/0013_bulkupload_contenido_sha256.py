@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0012_bulkupload_modo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='contenido_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
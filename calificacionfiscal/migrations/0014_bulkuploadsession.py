@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0013_bulkupload_contenido_sha256'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkUploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('modo', models.CharField(choices=[('INSERTAR', 'Solo insertar (las claves existentes son error)'), ('UPSERT', 'Insertar o actualizar'), ('OMITIR_SIN_CAMBIOS', 'Insertar y omitir filas sin cambios')], default='INSERTAR', max_length=20)),
+                ('tamano_total', models.BigIntegerField()),
+                ('tamano_parte', models.IntegerField()),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('partes', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('ABIERTA', 'Abierta'), ('FINALIZADA', 'Finalizada'), ('CANCELADA', 'Cancelada')], default='ABIERTA', max_length=20)),
+                ('columnas', models.JSONField(blank=True, default=list)),
+                ('error_encabezado', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('bulk_upload', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sesion_subida', to='calificacionfiscal.bulkupload')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sesión de Subida por Partes',
+                'verbose_name_plural': 'Sesiones de Subida por Partes',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['usuario', 'estado'], name='calificacio_usuario_76e8dd_idx')],
+            },
+        ),
+    ]
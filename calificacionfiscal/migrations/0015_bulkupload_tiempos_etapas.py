@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0014_bulkuploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='tiempos_etapas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
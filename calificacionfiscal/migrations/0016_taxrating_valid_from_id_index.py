@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0015_bulkupload_tiempos_etapas'),
+        ('parametros', '0002_instrument_issuer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taxrating',
+            index=models.Index(fields=['valid_from', 'id'], name='calificacio_valid_f_abcd47_idx'),
+        ),
+    ]
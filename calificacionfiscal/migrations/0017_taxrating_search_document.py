@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:00
+
+from django.db import migrations, models
+
+# Copia de calificacionfiscal.search.SEARCH_DOCUMENT_FIELDS al momento de la migración
+SEARCH_DOCUMENT_FIELDS = (
+    ('instrument', 'codigo'), ('rating',), ('issuer', 'rut'), ('issuer', 'nombre'), ('instrument', 'nombre'), ('status',),
+)
+
+INDEX_NAME = 'calificacio_search_trgm_idx'
+
+
+def _valor(tax_rating, partes):
+    valor = tax_rating
+    for parte in partes:
+        valor = getattr(valor, parte)
+    return str(valor or '').lower()
+
+
+def populate_search_documents(apps, schema_editor):
+    TaxRating = apps.get_model('calificacionfiscal', 'TaxRating')
+    pendientes = []
+    for tax_rating in TaxRating.objects.select_related('issuer', 'instrument').iterator(chunk_size=1000):
+        tax_rating.search_document = '\n'.join(_valor(tax_rating, partes) for partes in SEARCH_DOCUMENT_FIELDS)
+        pendientes.append(tax_rating)
+        if len(pendientes) >= 1000:
+            TaxRating.objects.bulk_update(pendientes, ['search_document'])
+            pendientes = []
+    if pendientes:
+        TaxRating.objects.bulk_update(pendientes, ['search_document'])
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON calificacionfiscal_taxrating '
+        f'USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0016_taxrating_valid_from_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxrating',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
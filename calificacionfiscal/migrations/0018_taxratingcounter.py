@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Copia de calificacionfiscal.stats.DIMENSIONS al momento de la migración
+DIMENSIONS = {
+    'rating': 'rating',
+    'status': 'status',
+    'risk_level': 'risk_level',
+    'issuer': 'issuer_id',
+    'instrument': 'instrument_id',
+}
+
+
+def populate_counters(apps, schema_editor):
+    TaxRating = apps.get_model('calificacionfiscal', 'TaxRating')
+    TaxRatingCounter = apps.get_model('calificacionfiscal', 'TaxRatingCounter')
+    contadores = [TaxRatingCounter(dimension='total', valor='', total=TaxRating.objects.count())]
+    for dimension, atributo in DIMENSIONS.items():
+        for fila in TaxRating.objects.order_by().values(atributo).annotate(total=Count('id')):
+            contadores.append(TaxRatingCounter(dimension=dimension, valor=str(fila[atributo]), total=fila['total']))
+    TaxRatingCounter.objects.bulk_create(contadores)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificacionfiscal', '0017_taxrating_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxRatingCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('valor', models.CharField(blank=True, max_length=50)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Calificaciones',
+                'verbose_name_plural': 'Contadores de Calificaciones',
+                'unique_together': {('dimension', 'valor')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -66,6 +66,8 @@ class TaxRating(models.Model):
     analista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='tax_ratings_creados')
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
+    # Textos buscables desnormalizados para el filtro `search` (ver calificacionfiscal.search)
+    search_document = models.TextField(blank=True, default='', editable=False)
 
     
     class Meta:
@@ -76,6 +78,8 @@ class TaxRating(models.Model):
         indexes = [
             models.Index(fields=['issuer', 'valid_from']),
             models.Index(fields=['instrument', 'valid_from']),
+            # Paginación por cursor (valid_from, id) del listado sin filtros
+            models.Index(fields=['valid_from', 'id']),
             models.Index(fields=['rating']),
             models.Index(fields=['status']),
             models.Index(fields=['creado_en']),
@@ -84,6 +88,45 @@ class TaxRating(models.Model):
     def __str__(self):
         return f"{self.issuer.nombre} - {self.instrument.nombre} ({self.rating}) - {self.valid_from}"
 
+    def save(self, *args, **kwargs):
+        """Recalcula el documento de búsqueda antes de guardar."""
+        from .search import build_search_document
+
+        self.search_document = build_search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_document' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'search_document']
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda los valores cargados de las dimensiones de estadísticas (ver calificacionfiscal.stats)."""
+        from .stats import STATS_ATTNAMES, remember_stats_key
+
+        instance = super().from_db(db, field_names, values)
+        if STATS_ATTNAMES.issubset(field_names):
+            remember_stats_key(instance)
+        return instance
+
+
+class TaxRatingCounter(models.Model):
+    """
+    Contador materializado de calificaciones por valor de una dimensión
+    (rating, status, risk_level, issuer o instrument, más el total).
+    Se mantiene de forma incremental, ver calificacionfiscal.stats.
+    """
+    dimension = models.CharField(max_length=20)
+    valor = models.CharField(max_length=50, blank=True)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('dimension', 'valor')
+        verbose_name = 'Contador de Calificaciones'
+        verbose_name_plural = 'Contadores de Calificaciones'
+
+    def __str__(self):
+        return f"{self.dimension}={self.valor}: {self.total}"
+
 
 class BulkUpload(models.Model):
     """
@@ -92,6 +135,7 @@ class BulkUpload(models.Model):
     """
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente'),
+        ('EN_COLA', 'En cola'),
         ('PROCESANDO', 'Procesando'),
         ('COMPLETADO', 'Completado'),
         ('RECHAZADO', 'Rechazado'),
@@ -102,16 +146,43 @@ class BulkUpload(models.Model):
         ('UTF8', 'UTF-8'),
     ]
     
+    # Qué hacer con filas cuya clave (issuer, instrument, valid_from) ya existe
+    MODO_CHOICES = [
+        ('INSERTAR', 'Solo insertar (las claves existentes son error)'),
+        ('UPSERT', 'Insertar o actualizar'),
+        ('OMITIR_SIN_CAMBIOS', 'Insertar y omitir filas sin cambios'),
+    ]
+    
     archivo = models.FileField(upload_to='bulk_uploads/%Y/%m/%d/')
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    modo = models.CharField(max_length=20, choices=MODO_CHOICES, default='INSERTAR')
+    # SHA-256 del contenido, para detectar archivos subidos más de una vez
+    contenido_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='bulk_uploads')
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
     total_filas = models.IntegerField(default=0)
     filas_ok = models.IntegerField(default=0)
     filas_error = models.IntegerField(default=0)
+    # Filas OK que modificaron o dejaron igual una calificación existente (modos UPSERT/OMITIR_SIN_CAMBIOS)
+    filas_actualizadas = models.IntegerField(default=0)
+    filas_sin_cambios = models.IntegerField(default=0)
     resumen_errores = models.JSONField(default=dict, blank=True)
     fecha_inicio = models.DateTimeField(null=True, blank=True)
     fecha_fin = models.DateTimeField(null=True, blank=True)
+    # Cola de procesamiento (ver calificacionfiscal.jobs)
+    encolado_en = models.DateTimeField(null=True, blank=True)
+    heartbeat_en = models.DateTimeField(null=True, blank=True)
+    intentos = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    # Avance publicado durante el procesamiento (ver calificacionfiscal.jobs.ProgressReporter)
+    filas_por_segundo = models.FloatField(default=0)
+    progreso_en = models.DateTimeField(null=True, blank=True)
+    # Checkpoint: última fila del archivo cuyo lote quedó confirmado en la base de datos
+    ultima_fila_confirmada = models.IntegerField(default=0)
+    # Headers del archivo; los items compactos guardan sus datos como lista en este orden
+    columnas = models.JSONField(default=list, blank=True)
+    # Segundos por etapa del último procesamiento (parseo, validacion, escritura, espera_escritura, total)
+    tiempos_etapas = models.JSONField(default=dict, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
     
@@ -122,6 +193,7 @@ class BulkUpload(models.Model):
         indexes = [
             models.Index(fields=['usuario', 'estado']),
             models.Index(fields=['creado_en']),
+            models.Index(fields=['estado', 'encolado_en']),
         ]
     
     def __str__(self):
@@ -134,6 +206,67 @@ class BulkUpload(models.Model):
         return round((self.filas_ok / self.total_filas) * 100, 2)
 
 
+class BulkUploadSession(models.Model):
+    """
+    Sesión de subida por partes de un archivo de carga masiva.
+    El cliente envía partes numeradas de `tamano_parte` bytes (en cualquier orden y
+    reintentando las que fallen) que se escriben directo en su posición de un archivo
+    parcial en disco; al finalizar se valida el archivo completo y se crea la BulkUpload.
+    Ver calificacionfiscal.chunked.
+    """
+    ESTADO_CHOICES = [
+        ('ABIERTA', 'Abierta'),
+        ('FINALIZADA', 'Finalizada'),
+        ('CANCELADA', 'Cancelada'),
+    ]
+    
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bulk_upload_sessions')
+    nombre_archivo = models.CharField(max_length=255)
+    modo = models.CharField(max_length=20, choices=BulkUpload.MODO_CHOICES, default='INSERTAR')
+    tamano_total = models.BigIntegerField()
+    tamano_parte = models.IntegerField()
+    # SHA-256 esperado del archivo completo tal como se transmite (opcional)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # {numero_parte: sha256 de la parte} de las partes recibidas y verificadas
+    partes = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='ABIERTA')
+    # Headers validados apenas llega la primera parte (solo archivos sin comprimir)
+    columnas = models.JSONField(default=list, blank=True)
+    error_encabezado = models.TextField(blank=True)
+    bulk_upload = models.OneToOneField(
+        BulkUpload, on_delete=models.SET_NULL, null=True, blank=True, related_name='sesion_subida'
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-creado_en']
+        verbose_name = 'Sesión de Subida por Partes'
+        verbose_name_plural = 'Sesiones de Subida por Partes'
+        indexes = [
+            models.Index(fields=['usuario', 'estado']),
+        ]
+    
+    def __str__(self):
+        return f"Sesión {self.id} - {self.nombre_archivo} ({self.estado})"
+    
+    @property
+    def partes_totales(self):
+        return -(-self.tamano_total // self.tamano_parte)
+    
+    def tamano_de_parte(self, numero):
+        """Bytes que debe tener la parte `numero` (la última puede ser más corta)."""
+        return min(self.tamano_parte, self.tamano_total - numero * self.tamano_parte)
+    
+    @property
+    def bytes_contiguos(self):
+        """Bytes recibidos sin huecos desde el inicio del archivo."""
+        numero = 0
+        while str(numero) in self.partes:
+            numero += 1
+        return min(numero * self.tamano_parte, self.tamano_total)
+
+
 class BulkUploadItem(models.Model):
     """
     Modelo para registrar cada fila procesada en una carga masiva.
@@ -148,6 +281,7 @@ class BulkUploadItem(models.Model):
     numero_fila = models.IntegerField()
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES)
     mensaje_error = models.CharField(max_length=500, blank=True)
+    # Diccionario con la fila, o lista de valores alineada con bulk_upload.columnas (modo compacto)
     datos = models.JSONField(default=dict)
     creado_en = models.DateTimeField(auto_now_add=True)
     
@@ -161,4 +295,16 @@ class BulkUploadItem(models.Model):
     
     def __str__(self):
         return f"Fila {self.numero_fila} - {self.estado}"
+    
+    def get_datos(self, columnas=None):
+        """
+        Retorna los datos de la fila como diccionario.
+        Si el item está compacto se reconstruye con las columnas de la carga
+        (se pueden pasar para no consultar la carga en cada item).
+        """
+        if isinstance(self.datos, list):
+            if columnas is None:
+                columnas = self.bulk_upload.columnas
+            return dict(zip(columnas, self.datos))
+        return self.datos
 
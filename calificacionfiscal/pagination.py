@@ -0,0 +1,134 @@
+"""
+Paginación por cursor (keyset) de las calificaciones.
+
+Con `?paginacion=cursor` el listado de TaxRatings y las acciones `por_issuer` y
+`por_rango_fecha` se paginan por la clave (valid_from, id) en vez de por número
+de página:
+- Cada página se obtiene con `WHERE (valid_from, id) < (cursor) ORDER BY
+  valid_from DESC, id DESC LIMIT n`, que usa los índices por valid_from y no
+  recorre las filas anteriores: una página profunda cuesta lo mismo que la primera.
+- Las respuestas traen `next` y `previous` con el cursor codificado; `count`
+  se calcula salvo con `?sin_total=true`, lo que deja cada página en una sola
+  consulta.
+- El orden es `-valid_from` (el del modelo) o `valid_from` con `?ordering=valid_from`;
+  en este modo se ignora cualquier otro `ordering`.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+VERDADEROS = ('1', 'true', 'si', 'sí')
+
+
+def wants_keyset_pagination(request):
+    """Indica si el request pidió paginación por cursor (o trae un cursor)."""
+    return (
+        request.query_params.get('paginacion') == 'cursor'
+        or KeysetPagination.cursor_query_param in request.query_params
+    )
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por (valid_from, id) para querysets de TaxRating."""
+
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.descendente = request.query_params.get('ordering') != 'valid_from'
+        self.count = None
+        if request.query_params.get('sin_total', '').lower() not in VERDADEROS:
+            self.count = queryset.order_by().count()
+
+        cursor = self.decode_cursor(request)
+        # Las páginas hacia atrás se leen en el orden inverso y se dan vuelta
+        hacia_atras = cursor is not None and cursor['anterior']
+        descendente = self.descendente != hacia_atras
+        orden = ('-valid_from', '-id') if descendente else ('valid_from', 'id')
+        queryset = queryset.order_by(*orden)
+
+        if cursor is not None:
+            if descendente:
+                despues = Q(valid_from__lt=cursor['valid_from']) | Q(valid_from=cursor['valid_from'], id__lt=cursor['id'])
+            else:
+                despues = Q(valid_from__gt=cursor['valid_from']) | Q(valid_from=cursor['valid_from'], id__gt=cursor['id'])
+            queryset = queryset.filter(despues)
+
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if hacia_atras:
+            filas.reverse()
+
+        self.siguiente = self.anterior = None
+        if filas:
+            if hay_mas or hacia_atras:
+                self.siguiente = self.encode_cursor(filas[-1], anterior=False)
+            if cursor is not None and (hay_mas or not hacia_atras):
+                self.anterior = self.encode_cursor(filas[0], anterior=True)
+        return filas
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Retorna el cursor del request como {'valid_from', 'id', 'anterior'} o None si no hay."""
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            datos = json.loads(urlsafe_b64decode(codificado.encode('ascii')).decode('utf-8'))
+            cursor = {
+                'valid_from': parse_date(datos['v']),
+                'id': int(datos['id']),
+                'anterior': bool(datos.get('a')),
+            }
+        except (BinasciiError, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor['valid_from'] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, tax_rating, anterior):
+        """URL de la página que sigue (o precede) a `tax_rating`."""
+        datos = {'v': tax_rating.valid_from.isoformat(), 'id': tax_rating.pk}
+        if anterior:
+            datos['a'] = 1
+        codificado = urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, codificado)
+
+    def get_paginated_response(self, data):
+        respuesta = {'next': self.siguiente, 'previous': self.anterior, 'results': data}
+        if self.count is not None:
+            respuesta = {'count': self.count, **respuesta}
+        return Response(respuesta)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
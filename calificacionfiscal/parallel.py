@@ -0,0 +1,216 @@
+"""
+Procesamiento paralelo de cargas masivas con un pool de procesos.
+
+Se usa desde `process_uploads --workers N`:
+- Las cargas pequeñas se reparten completas entre los procesos del pool.
+- Una carga grande se lee, valida y planifica en el proceso principal, con
+  un solo índice de claves y vigencias para todo el archivo, y sus lotes se
+  reparten entre los procesos solo para escribirlos. Así los duplicados y
+  solapamientos entre lotes se detectan igual que en el procesamiento
+  secuencial. Cada item conserva su numero_fila, por lo que el detalle de la
+  carga mantiene el orden del archivo. El checkpoint avanza a medida que
+  terminan los lotes, de modo que una carga interrumpida se puede reanudar
+  (en paralelo o no) sin reprocesar filas ya confirmadas.
+
+Cada proceso del pool abre su propia conexión a la base de datos. Los modelos
+se importan dentro de las funciones porque los procesos nuevos importan este
+módulo antes de ejecutar django.setup().
+"""
+import logging
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+def create_process_pool(workers):
+    """
+    Crea el pool de procesos para procesar cargas.
+
+    Se usa `spawn` en todas las plataformas: con `fork` los hijos heredarían el
+    socket de la conexión a la base de datos del proceso principal.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker_process,
+    )
+
+
+def init_worker_process():
+    """Configura Django en un proceso nuevo del pool; la conexión se abre al primer uso."""
+    import django
+    django.setup()
+
+
+def process_upload_task(upload_id, chunk_size=None):
+    """
+    Tarea del pool: procesa una carga PENDIENTE completa.
+
+    La carga se toma con claim_bulk_upload (UPDATE condicional con el worker
+    del proceso) para que no se procese dos veces y envíe heartbeats.
+
+    Returns:
+        tuple: (upload_id, resultado o None si otra ejecución ya la tomó, error)
+    """
+    from .jobs import claim_bulk_upload, get_worker_id, run_claimed_bulk_upload
+
+    worker_id = get_worker_id()
+    bulk_upload = claim_bulk_upload(upload_id, worker_id, estados=('PENDIENTE',))
+    if bulk_upload is None:
+        return upload_id, None, None
+
+    try:
+        return upload_id, run_claimed_bulk_upload(bulk_upload, worker_id, chunk_size=chunk_size), None
+    except Exception as e:
+        return upload_id, None, str(e)
+
+
+def ingest_chunk_task(upload_id, worker_id, resultados, plan):
+    """
+    Tarea del pool: escribe en una transacción un lote de una carga ya planificado.
+
+    Los contadores por modo se suman en la misma transacción, con la condición de
+    confirm_batch_checkpoint: si la carga ya no pertenece a `worker_id` (el
+    proceso principal que la tomó) el lote se revierte con BulkUploadJobLost.
+
+    Args:
+        upload_id: ID de la BulkUpload
+        worker_id: Worker que tomó la carga ('' si se procesa sin tomarla)
+        resultados: Filas del lote, como validate_tax_rating_batch
+        plan: Decisiones del lote, de plan_tax_rating_batch
+
+    Returns:
+        tuple: (filas_leidas, filas_ok, errores_por_fila, acciones)
+    """
+    from django.db import transaction
+    from django.db.models import F
+    from .jobs import BulkUploadJobLost
+    from .models import BulkUpload
+    from .utils import apply_tax_rating_plan, confirm_batch_checkpoint
+
+    bulk_upload = BulkUpload.objects.select_related('usuario').get(pk=upload_id)
+    bulk_upload.worker = worker_id
+    with transaction.atomic():
+        filas_ok, errores_por_fila, acciones = apply_tax_rating_plan(bulk_upload, resultados, plan)
+        confirmadas = confirm_batch_checkpoint(
+            bulk_upload,
+            filas_actualizadas=F('filas_actualizadas') + acciones['actualizadas'],
+            filas_sin_cambios=F('filas_sin_cambios') + acciones['sin_cambios'],
+        )
+        if not confirmadas:
+            raise BulkUploadJobLost(f'La carga #{upload_id} ya no pertenece a {worker_id}')
+    return len(resultados), filas_ok, errores_por_fila, acciones
+
+
+def process_bulk_upload_parallel(bulk_upload, executor, chunk_size=None, max_pending=4, on_progress=None):
+    """
+    Procesa una carga repartiendo sus lotes entre los procesos de `executor`.
+
+    El archivo se lee y valida en el proceso actual con iter_validated_batches
+    (que reutiliza los errores del dry-run en caché si el archivo no cambió) y
+    cada lote se planifica aquí con plan_tax_rating_batch y un ValidityIndex de
+    toda la carga: las claves repetidas y los rangos VIGENTE que se solapan con
+    filas de otros lotes son error antes de enviarlos. Los procesos solo aplican
+    el plan. A lo más `max_pending` lotes esperan en el pool a la vez, de modo
+    que la memoria usada sigue acotada.
+
+    Los lotes terminan en desorden: el checkpoint `ultima_fila_confirmada` avanza
+    hasta la última fila del mayor prefijo de lotes terminados. Al reanudar se
+    omiten las filas hasta el checkpoint y las de lotes posteriores que ya tienen
+    items (ver load_checkpoint_summary).
+
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        executor: concurrent.futures.Executor (normalmente ProcessPoolExecutor)
+        chunk_size: Cantidad de filas por lote
+        max_pending: Máximo de lotes enviados sin terminar (se recomienda 2 por proceso)
+        on_progress: Función opcional llamada con el resumen parcial cada vez que terminan lotes
+
+    Returns:
+        dict: Resumen del procesamiento, igual al de process_bulk_upload_file
+    """
+    from collections import deque
+    from .ingest_log import IngestLogger
+    from .intervals import ValidityIndex
+    from .jobs import BulkUploadJobLost
+    from .utils import (
+        confirm_batch_checkpoint, get_chunk_size, iter_validated_batches, load_checkpoint_summary,
+        plan_tax_rating_batch,
+    )
+
+    chunk_size = get_chunk_size(chunk_size)
+
+    checkpoint = bulk_upload.ultima_fila_confirmada
+    total_filas, filas_ok, resumen_errores, confirmadas = load_checkpoint_summary(bulk_upload)
+    if total_filas:
+        acciones = {'actualizadas': bulk_upload.filas_actualizadas, 'sin_cambios': bulk_upload.filas_sin_cambios}
+        logger.info(f"Reanudando BulkUpload {bulk_upload.id} después de la fila {checkpoint}")
+    else:
+        acciones = {'actualizadas': 0, 'sin_cambios': 0}
+    pendientes = set()
+    # (future, última fila) de los lotes enviados y aún no cubiertos por el checkpoint, en orden del archivo
+    enviados = deque()
+    recolectados = set()
+    ingest_log = IngestLogger(logger)
+    # Claves y vigencias de toda la carga: los lotes se planifican en orden en este proceso
+    indice = ValidityIndex()
+
+    def recolectar(terminados):
+        nonlocal total_filas, filas_ok
+        for future in terminados:
+            leidas, ok, errores_por_fila, acciones_lote = future.result()
+            total_filas += leidas
+            filas_ok += ok
+            resumen_errores.update(errores_por_fila)
+            for accion, cantidad in acciones_lote.items():
+                acciones[accion] += cantidad
+            recolectados.add(future)
+
+        ultima_fila = None
+        while enviados and enviados[0][0] in recolectados:
+            future, ultima_fila = enviados.popleft()
+            recolectados.discard(future)
+        if ultima_fila is not None and not confirm_batch_checkpoint(bulk_upload, ultima_fila_confirmada=ultima_fila):
+            raise BulkUploadJobLost(f'La carga #{bulk_upload.id} ya no pertenece a {bulk_upload.worker}')
+
+        if on_progress is not None and terminados:
+            on_progress({
+                'total_filas': total_filas,
+                'filas_ok': filas_ok,
+                'filas_error': len(resumen_errores),
+            })
+
+    lotes = iter_validated_batches(bulk_upload, chunk_size, checkpoint)
+    try:
+        for resultados, issuers, instruments in lotes:
+            if confirmadas:
+                resultados = [fila for fila in resultados if fila[0] not in confirmadas]
+                if not resultados:
+                    continue
+            plan = plan_tax_rating_batch(bulk_upload, resultados, issuers, instruments, ingest_log, indice)
+            future = executor.submit(ingest_chunk_task, bulk_upload.pk, bulk_upload.worker, resultados, plan)
+            pendientes.add(future)
+            enviados.append((future, resultados[-1][0]))
+            if len(pendientes) >= max_pending:
+                terminados, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                recolectar(terminados)
+    finally:
+        # Detiene los hilos de parseo/validación si un lote falló
+        lotes.close()
+
+    terminados, _ = wait(pendientes)
+    recolectar(terminados)
+
+    logger.info(
+        f"Procesamiento paralelo de BulkUpload {bulk_upload.id} completado: "
+        f"{filas_ok} OK, {len(resumen_errores)} ERROR, Total: {total_filas}"
+    )
+    return {
+        'total_filas': total_filas,
+        'filas_ok': filas_ok,
+        'filas_error': len(resumen_errores),
+        'filas_actualizadas': acciones['actualizadas'],
+        'filas_sin_cambios': acciones['sin_cambios'],
+        'resumen_errores': dict(sorted(resumen_errores.items())),
+    }
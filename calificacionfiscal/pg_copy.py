@@ -0,0 +1,138 @@
+"""
+Ingesta de TaxRatings con COPY para PostgreSQL.
+
+Para cargas muy grandes el INSERT de bulk_create sigue siendo costoso. Con
+BULK_UPLOAD_USE_COPY=True y el motor PostgreSQL, cada lote validado:
+1. Se envía con COPY FROM STDIN a una tabla temporal de staging.
+2. Se fusiona en calificacionfiscal_taxrating con un solo
+   INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING.
+
+Las filas que no vuelven en el RETURNING chocaron con la restricción única
+(issuer, instrument, valid_from) y se reportan como duplicadas.
+En otros motores (SQLite en los tests) se usa el camino del ORM.
+"""
+import io
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+STAGING_TABLE = 'tmp_bulk_taxrating'
+
+# Campos de TaxRating que se cargan desde el archivo
+COPY_FIELDS = (
+    'issuer', 'instrument', 'rating', 'risk_level', 'valid_from',
+    'valid_to', 'status', 'comments', 'analista', 'search_document',
+)
+
+# Clave única de TaxRating usada en ON CONFLICT
+CONFLICT_FIELDS = ('issuer', 'instrument', 'valid_from')
+
+
+def use_copy_backend():
+    """Indica si las cargas masivas deben insertar con COPY (solo PostgreSQL)."""
+    return getattr(settings, 'BULK_UPLOAD_USE_COPY', False) and connection.vendor == 'postgresql'
+
+
+def _field(name):
+    from .models import TaxRating
+    return TaxRating._meta.get_field(name)
+
+
+def _columns(names):
+    """Lista de columnas de TaxRating, entre comillas, para usar en SQL."""
+    return ', '.join(connection.ops.quote_name(_field(name).column) for name in names)
+
+
+def _copy_value(value):
+    """Convierte un valor al formato de texto de COPY (\\N para NULL, escapes de control)."""
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def build_copy_buffer(candidatas):
+    """
+    Arma el contenido de COPY para un lote de TaxRatings sin guardar.
+
+    Args:
+        candidatas: Lista de tuplas (numero_fila, datos, tax_rating)
+
+    Returns:
+        io.StringIO: Una línea por fila (numero_fila + COPY_FIELDS) separada por tabulaciones
+    """
+    attnames = [_field(name).attname for name in COPY_FIELDS]
+    buffer = io.StringIO()
+    for numero_fila, _, tax_rating in candidatas:
+        valores = [numero_fila] + [getattr(tax_rating, attname) for attname in attnames]
+        buffer.write('\t'.join(_copy_value(valor) for valor in valores))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_insert_tax_ratings(candidatas, errores_por_fila, mensaje_duplicado):
+    """
+    Inserta un lote de TaxRatings con COPY + INSERT ... ON CONFLICT.
+
+    Debe ejecutarse dentro de la transacción del lote: la tabla temporal se
+    vacía al confirmar (ON COMMIT DELETE ROWS) y se reutiliza en la sesión.
+
+    Args:
+        candidatas: Lista de tuplas (numero_fila, datos, tax_rating)
+        errores_por_fila: Diccionario donde se registran los errores por numero_fila
+        mensaje_duplicado: Función que arma el mensaje de error de una fila duplicada
+
+    Returns:
+        list: Las tuplas de `candidatas` que quedaron insertadas (con pk asignado)
+    """
+    from .models import TaxRating
+
+    if not candidatas:
+        return []
+
+    quote = connection.ops.quote_name
+    staging = quote(STAGING_TABLE)
+    tabla = quote(TaxRating._meta.db_table)
+    columnas = _columns(COPY_FIELDS)
+    definicion = ', '.join(
+        f"{quote(_field(name).column)} {_field(name).db_type(connection)}" for name in COPY_FIELDS
+    )
+    ahora = timezone.now()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} "
+            f"(numero_fila integer, {definicion}) ON COMMIT DELETE ROWS"
+        )
+        cursor.execute(f"TRUNCATE {staging}")
+        cursor.copy_expert(
+            f"COPY {staging} (numero_fila, {columnas}) FROM STDIN",
+            build_copy_buffer(candidatas),
+        )
+        cursor.execute(
+            f"INSERT INTO {tabla} ({columnas}, {_columns(['creado_en', 'actualizado_en'])}) "
+            f"SELECT {columnas}, %s, %s FROM {staging} ORDER BY numero_fila "
+            f"ON CONFLICT ({_columns(CONFLICT_FIELDS)}) DO NOTHING "
+            f"RETURNING {_columns(('id',) + CONFLICT_FIELDS)}",
+            [ahora, ahora],
+        )
+        insertadas = {tuple(fila[1:]): fila[0] for fila in cursor.fetchall()}
+
+    creadas = []
+    for numero_fila, row_data, tax_rating in candidatas:
+        pk = insertadas.get((tax_rating.issuer_id, tax_rating.instrument_id, tax_rating.valid_from))
+        if pk is None:
+            errores_por_fila[numero_fila] = mensaje_duplicado(row_data)
+            continue
+        tax_rating.pk = pk
+        tax_rating.creado_en = ahora
+        tax_rating.actualizado_en = ahora
+        tax_rating._state.adding = False
+        creadas.append((numero_fila, row_data, tax_rating))
+    return creadas
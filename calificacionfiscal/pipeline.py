@@ -0,0 +1,151 @@
+"""
+Ingesta de cargas masivas en etapas concurrentes unidas por colas acotadas.
+
+    hilo de parseo ──cola──> hilo de validación ──cola──> escritura (hilo actual)
+
+- Parseo: lee el archivo por bloques, lo decodifica, separa las columnas y
+  arma los lotes de `chunk_size` filas.
+- Validación: revisa los campos de cada fila con un RowSchema compilado una
+  vez para la carga, sin consultar la base de datos.
+- Escritura: en el hilo que llama, resuelve los Issuer/Instrument de cada lote
+  e inserta (ver process_bulk_upload_file). Todo el acceso a la base de datos
+  queda en este hilo, dentro de las transacciones y el checkpoint de cada lote.
+
+Las colas tienen a lo más BULK_UPLOAD_PIPELINE_QUEUE_SIZE lotes: si la escritura
+se atrasa, las etapas anteriores se detienen (backpressure) y la memoria usada
+sigue acotada. Mientras un lote espera a la base de datos, los siguientes se
+parsean y validan. El tiempo de trabajo de cada etapa se acumula en `tiempos`.
+"""
+import queue
+import threading
+import time
+from django.conf import settings
+from .row_schema import RowSchema
+from .utils import iter_batches, iter_utf8_file, validate_batch_references
+
+# Lotes que puede acumular cada cola entre etapas (configurable con BULK_UPLOAD_PIPELINE_QUEUE_SIZE)
+DEFAULT_QUEUE_SIZE = 4
+
+# Segundos entre revisiones de la señal de detención mientras una etapa espera una cola
+POLL_INTERVAL = 0.1
+
+# Marca de fin de datos enviada por cada etapa a la siguiente
+_FIN = object()
+
+
+class _StageError:
+    """Excepción de una etapa, enviada por la cola para relanzarla en la etapa siguiente."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def get_queue_size(queue_size=None):
+    """Tamaño de las colas: el indicado o el de settings (BULK_UPLOAD_PIPELINE_QUEUE_SIZE)."""
+    return queue_size or getattr(settings, 'BULK_UPLOAD_PIPELINE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+
+
+def _put(cola, item, detener):
+    """Encola `item` esperando si la cola está llena. Retorna False si se pidió detener."""
+    while not detener.is_set():
+        try:
+            cola.put(item, timeout=POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(cola, detener):
+    """Itera los items de una cola hasta la marca de fin; relanza los errores de la etapa anterior."""
+    while not detener.is_set():
+        try:
+            item = cola.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        if item is _FIN:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def _stage(trabajo, salida, detener):
+    """Envuelve el trabajo de una etapa: al terminar envía la marca de fin o su excepción."""
+    def run():
+        try:
+            trabajo()
+        except BaseException as e:
+            _put(salida, _StageError(e), detener)
+        else:
+            _put(salida, _FIN, detener)
+    return run
+
+
+def iter_pipelined_batches(bulk_upload, chunk_size, desde_fila=0, tiempos=None, queue_size=None):
+    """
+    Retorna los lotes validados de una carga parseando y validando en hilos aparte.
+
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        chunk_size: Cantidad de filas por lote
+        desde_fila: Se omiten las filas hasta esta (checkpoint)
+        tiempos: Diccionario donde se acumulan los segundos de 'parseo',
+            'validacion' y 'escritura' (la resolución de referencias)
+        queue_size: Lotes máximos por cola
+
+    Yields:
+        tuple: (resultados, issuers, instruments) como validate_tax_rating_batch
+    """
+    tiempos = tiempos if tiempos is not None else {}
+    for etapa in ('parseo', 'validacion', 'escritura'):
+        tiempos.setdefault(etapa, 0.0)
+
+    parseados = queue.Queue(maxsize=get_queue_size(queue_size))
+    validados = queue.Queue(maxsize=get_queue_size(queue_size))
+    detener = threading.Event()
+
+    def parsear():
+        filas = (fila for fila in iter_utf8_file(bulk_upload.archivo) if fila[0] > desde_fila)
+        lotes = iter_batches(filas, chunk_size)
+        while True:
+            inicio = time.perf_counter()
+            lote = next(lotes, None)
+            tiempos['parseo'] += time.perf_counter() - inicio
+            if lote is None or not _put(parseados, lote, detener):
+                return
+
+    def validar():
+        schema = None
+        for lote in _drain(parseados, detener):
+            inicio = time.perf_counter()
+            if schema is None:
+                # Todas las filas tienen las columnas del header
+                schema = RowSchema(lote[0][1])
+            resultados = [(numero_fila, datos, schema.validate(datos)) for numero_fila, datos in lote]
+            tiempos['validacion'] += time.perf_counter() - inicio
+            if not _put(validados, resultados, detener):
+                return
+
+    hilos = [
+        threading.Thread(
+            target=_stage(parsear, parseados, detener), name=f'bulk-upload-{bulk_upload.pk}-parseo', daemon=True
+        ),
+        threading.Thread(
+            target=_stage(validar, validados, detener), name=f'bulk-upload-{bulk_upload.pk}-validacion', daemon=True
+        ),
+    ]
+    for hilo in hilos:
+        hilo.start()
+
+    try:
+        for resultados in _drain(validados, detener):
+            inicio = time.perf_counter()
+            lote = validate_batch_references(resultados)
+            tiempos['escritura'] += time.perf_counter() - inicio
+            yield lote
+    finally:
+        # También al cerrar el generador antes de tiempo (error en la escritura)
+        detener.set()
+        for hilo in hilos:
+            hilo.join()
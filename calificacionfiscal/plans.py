@@ -0,0 +1,117 @@
+"""
+Validación en seco (dry-run) de cargas masivas y caché del plan validado.
+
+El endpoint `validar` ejecuta el mismo pipeline por lotes que el procesamiento
+(parseo, validación de filas, claves repetidas, solapamientos y claves existentes
+según el modo) sin escribir TaxRatings. El resultado de la validación de filas
+se guarda en la caché `bulk_uploads` bajo el SHA-256 del archivo: solo los
+errores de las filas inválidas, por número de fila, no las filas. Al procesar,
+si el archivo no cambió, sus filas se vuelven a leer por lotes (con memoria
+acotada) y se toman los errores de la caché en vez de validarlas otra vez.
+"""
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from .intervals import ValidityIndex
+from .utils import (
+    file_sha256, get_chunk_size, iter_batches, iter_utf8_file,
+    plan_tax_rating_batch, validate_tax_rating_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se conserva un plan validado (configurable con BULK_UPLOAD_PLAN_TTL)
+DEFAULT_PLAN_TTL = 3600
+
+
+def get_plan_cache():
+    """Caché compartida entre la API y los workers; usa 'default' si no hay alias propio."""
+    return caches['bulk_uploads'] if 'bulk_uploads' in settings.CACHES else caches['default']
+
+
+def _plan_key(sha256):
+    return f'bulk_upload_plan:{sha256}'
+
+
+def _hash_key(bulk_upload_id):
+    return f'bulk_upload_plan_hash:{bulk_upload_id}'
+
+
+def _content_hash(bulk_upload):
+    """SHA-256 del archivo: el calculado al subirlo o, en cargas antiguas, leyendo el archivo."""
+    return bulk_upload.contenido_sha256 or file_sha256(bulk_upload.archivo)
+
+
+def dry_run_bulk_upload(bulk_upload, chunk_size=None):
+    """
+    Valida una carga completa sin escribir TaxRatings ni items y guarda el plan en caché.
+
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        chunk_size: Cantidad de filas por lote
+
+    Returns:
+        dict: Resumen con los conteos que tendría el procesamiento y los errores por fila
+    """
+    chunk_size = get_chunk_size(chunk_size)
+    sha256 = _content_hash(bulk_upload)
+
+    errores_validacion = {}
+    indice = ValidityIndex()
+    total_filas = 0
+    nuevas = 0
+    actualizadas = 0
+    sin_cambios = 0
+    resumen_errores = {}
+
+    for batch in iter_batches(iter_utf8_file(bulk_upload.archivo), chunk_size):
+        resultados, issuers, instruments = validate_tax_rating_batch(batch)
+        candidatas, por_actualizar, iguales, errores_por_fila = plan_tax_rating_batch(
+            bulk_upload, resultados, issuers, instruments, indice=indice
+        )
+
+        total_filas += len(batch)
+        nuevas += len(candidatas)
+        actualizadas += len(por_actualizar)
+        sin_cambios += len(iguales)
+        resumen_errores.update(errores_por_fila)
+
+        for numero_fila, _, errores in resultados:
+            if errores:
+                errores_validacion[numero_fila] = errores
+
+    ttl = getattr(settings, 'BULK_UPLOAD_PLAN_TTL', DEFAULT_PLAN_TTL)
+    cache = get_plan_cache()
+    cache.set(_plan_key(sha256), {'total_filas': total_filas, 'errores': errores_validacion}, ttl)
+    cache.set(_hash_key(bulk_upload.pk), sha256, ttl)
+    logger.info(f"Plan validado de BulkUpload {bulk_upload.id} guardado ({total_filas} filas, sha256 {sha256})")
+
+    return {
+        'sha256': sha256,
+        'total_filas': total_filas,
+        'filas_ok': nuevas + actualizadas + sin_cambios,
+        'filas_error': len(resumen_errores),
+        'filas_nuevas': nuevas,
+        'filas_actualizadas': actualizadas,
+        'filas_sin_cambios': sin_cambios,
+        'resumen_errores': resumen_errores,
+    }
+
+
+def load_validation_errors(bulk_upload):
+    """
+    Retorna los errores de validación en caché de una carga si su archivo no cambió.
+
+    Returns:
+        dict o None: {numero_fila: errores} de las filas inválidas (las demás son
+            válidas), o None si no hay un plan válido (sin dry-run previo,
+            expirado o archivo distinto)
+    """
+    cache = get_plan_cache()
+    sha256 = cache.get(_hash_key(bulk_upload.pk))
+    if sha256 is None:
+        return None
+    plan = cache.get(_plan_key(sha256))
+    if plan is None or _content_hash(bulk_upload) != sha256:
+        return None
+    return plan['errores']
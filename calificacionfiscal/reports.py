@@ -5,7 +5,7 @@ import csv
 from io import BytesIO, StringIO
 from datetime import datetime
 from django.http import HttpResponse
-from django.db.models import Count, Q
+from django.db.models import Q
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -94,6 +94,11 @@ def generar_reporte_pdf(queryset, filename='reporte_tax_ratings.pdf', incluir_es
         spaceAfter=8,
     )
     
+    # Total y conteo por rating en una sola consulta
+    from .aggregates import count_groups
+
+    conteos = count_groups(queryset, {'por_rating': 'rating'})
+    
     # Título
     elements.append(Paragraph('Reporte de Calificaciones Tributarias', title_style))
     elements.append(Spacer(1, 12))
@@ -101,7 +106,7 @@ def generar_reporte_pdf(queryset, filename='reporte_tax_ratings.pdf', incluir_es
     # Fecha de generación
     fecha_generacion = datetime.now().strftime('%d/%m/%Y %H:%M')
     elements.append(Paragraph(f'<b>Fecha de Generación:</b> {fecha_generacion}', styles['Normal']))
-    elements.append(Paragraph(f'<b>Total de Registros:</b> {queryset.count()}', styles['Normal']))
+    elements.append(Paragraph(f'<b>Total de Registros:</b> {conteos["total"]}', styles['Normal']))
     elements.append(Spacer(1, 20))
     
     # Estadísticas (si se solicitó)
@@ -109,7 +114,7 @@ def generar_reporte_pdf(queryset, filename='reporte_tax_ratings.pdf', incluir_es
         elements.append(Paragraph('Estadísticas', heading_style))
         
         # Conteo por rating
-        rating_stats = queryset.values('rating').annotate(count=Count('id')).order_by('-count')
+        rating_stats = conteos['por_rating']
         
         stats_data = [['Rating', 'Cantidad']]
         for stat in rating_stats:
@@ -146,9 +151,9 @@ def generar_reporte_pdf(queryset, filename='reporte_tax_ratings.pdf', incluir_es
             obj.status
         ])
     
-    if queryset.count() > 50:
+    if conteos['total'] > 50:
         data.append(['...', '...', '...', '...', '...'])
-        elements.append(Paragraph(f'<i>Mostrando 50 de {queryset.count()} registros</i>', styles['Italic']))
+        elements.append(Paragraph(f'<i>Mostrando 50 de {conteos["total"]} registros</i>', styles['Italic']))
         elements.append(Spacer(1, 8))
     
     # Crear tabla
@@ -178,42 +183,43 @@ def generar_reporte_pdf(queryset, filename='reporte_tax_ratings.pdf', incluir_es
     return response
 
 
-def obtener_estadisticas(queryset):
+def obtener_estadisticas(queryset=None):
     """
     Genera estadísticas generales de un queryset de TaxRating.
     
     Args:
-        queryset: QuerySet de TaxRating
+        queryset: QuerySet de TaxRating; sin queryset se leen los contadores
+            materializados de todas las calificaciones (ver calificacionfiscal.stats)
         
     Returns:
         dict: Diccionario con estadísticas
     """
-    total = queryset.count()
-    vigentes = queryset.filter(status='VIGENTE').count()
+    if queryset is None:
+        from .stats import get_cached_stats
 
-    por_rating = list(
-        queryset.values('rating').annotate(count=Count('id')).order_by('-count')
-    )
-    por_status = list(
-        queryset.values('status').annotate(count=Count('id')).order_by('-count')
-    )
-    por_risk_level = list(
-        queryset.values('risk_level').annotate(count=Count('id')).order_by('-count')
-    )
+        return get_cached_stats()
 
-    top_issuers = list(
-        queryset.values('issuer__nombre').annotate(count=Count('id')).order_by('-count')[:10]
-    )
-    top_instruments = list(
-        queryset.values('instrument__nombre').annotate(count=Count('id')).order_by('-count')[:10]
+    from .aggregates import count_groups
+
+    conteos = count_groups(
+        queryset,
+        {
+            'por_rating': 'rating',
+            'por_status': 'status',
+            'por_risk_level': 'risk_level',
+            'top_issuers': 'issuer__nombre',
+            'top_instruments': 'instrument__nombre',
+        },
+        limites={'top_issuers': 10, 'top_instruments': 10},
     )
+    vigentes = next((fila['count'] for fila in conteos['por_status'] if fila['status'] == 'VIGENTE'), 0)
 
     return {
-        'total': total,
+        'total': conteos['total'],
         'vigentes': vigentes,
-        'por_rating': por_rating,
-        'por_status': por_status,
-        'por_risk_level': por_risk_level,
-        'top_issuers': top_issuers,
-        'top_instruments': top_instruments,
+        'por_rating': conteos['por_rating'],
+        'por_status': conteos['por_status'],
+        'por_risk_level': conteos['por_risk_level'],
+        'top_issuers': conteos['top_issuers'],
+        'top_instruments': conteos['top_instruments'],
     }
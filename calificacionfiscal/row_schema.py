@@ -0,0 +1,153 @@
+"""
+Esquema compilado de las filas de una carga masiva.
+
+RowSchema se construye una vez por carga a partir de los choices de TaxRating
+y de las columnas del archivo, y valida cada fila sin repetir trabajo:
+- Los valores válidos de rating, status y risk_level quedan en frozensets.
+- Los campos de la fila se extraen con un solo itemgetter sobre las columnas
+  presentes en el archivo (las ausentes se leen como vacías).
+- Las fechas YYYY-MM-DD se parsean con split/int en vez de strptime y se
+  memorizan: en un archivo las mismas fechas se repiten en miles de filas.
+
+Los mensajes de error son los mismos de la validación fila a fila.
+"""
+import functools
+from datetime import date
+from operator import itemgetter
+
+# Campos de la fila que revisa la validación, en el orden en que se extraen
+SCHEMA_FIELDS = (
+    'issuer_codigo', 'instrument_codigo', 'rating', 'valid_from', 'valid_to', 'status', 'risk_level',
+)
+
+# Fechas distintas que memoriza un esquema como máximo
+MAX_CACHED_DATES = 10000
+
+
+def parse_iso_date(value):
+    """
+    Convierte un string YYYY-MM-DD a date con las mismas reglas que strptime('%Y-%m-%d').
+
+    Raises:
+        ValueError: Si el string no tiene ese formato o no es una fecha válida
+    """
+    partes = str(value).split('-')
+    if len(partes) != 3:
+        raise ValueError(f"Fecha inválida: {value!r}")
+    anio, mes, dia = partes
+    if not (
+        len(anio) == 4 and 1 <= len(mes) <= 2 and 1 <= len(dia) <= 2
+        and anio.isdecimal() and mes.isdecimal() and dia.isdecimal()
+    ):
+        raise ValueError(f"Fecha inválida: {value!r}")
+    return date(int(anio), int(mes), int(dia))
+
+
+class RowSchema:
+    """Validador de filas compilado para las columnas de un archivo."""
+
+    def __init__(self, columnas=None):
+        from .models import TaxRating
+
+        self.ratings = tuple(valor for valor, _ in TaxRating.RATING_CHOICES)
+        self.status = tuple(valor for valor, _ in TaxRating.STATUS_CHOICES)
+        self.risk_levels = tuple(valor for valor, _ in TaxRating.RISK_LEVEL_CHOICES)
+        self._ratings = frozenset(self.ratings)
+        self._status = frozenset(self.status)
+        self._risk_levels = frozenset(self.risk_levels)
+        self._fechas = {}
+
+        self.columnas = tuple(columnas) if columnas is not None else None
+        if self.columnas is None:
+            self._getter = None
+        else:
+            presentes = [campo for campo in SCHEMA_FIELDS if campo in self.columnas]
+            # Posición de cada campo en la tupla extraída; None si el archivo no trae la columna
+            self._posiciones = tuple(
+                presentes.index(campo) if campo in presentes else None for campo in SCHEMA_FIELDS
+            )
+            self._getter = itemgetter(*presentes) if presentes else None
+            self._un_campo = len(presentes) == 1
+            self._completo = len(presentes) == len(SCHEMA_FIELDS)
+
+    def parse_date(self, value):
+        """Fecha de un string YYYY-MM-DD, memorizada; None si el formato es inválido."""
+        try:
+            return self._fechas[value]
+        except KeyError:
+            pass
+        try:
+            fecha = parse_iso_date(value)
+        except ValueError:
+            fecha = None
+        if len(self._fechas) < MAX_CACHED_DATES:
+            self._fechas[value] = fecha
+        return fecha
+
+    def values(self, row_data):
+        """Tupla con los valores de SCHEMA_FIELDS de una fila ('' si el campo no viene)."""
+        if self._getter is not None:
+            try:
+                extraidos = self._getter(row_data)
+            except KeyError:
+                pass
+            else:
+                if self._completo:
+                    return extraidos
+                if self._un_campo:
+                    extraidos = (extraidos,)
+                return tuple('' if pos is None else extraidos[pos] for pos in self._posiciones)
+        elif self.columnas is not None:
+            return ('',) * len(SCHEMA_FIELDS)
+        return tuple(row_data.get(campo, '') for campo in SCHEMA_FIELDS)
+
+    def validate(self, row_data):
+        """
+        Valida los campos de una fila que no dependen de la base de datos.
+
+        Returns:
+            list: Errores de la fila; si faltan campos requeridos, solo esos
+        """
+        issuer_codigo, instrument_codigo, rating, valid_from, valid_to, status, risk_level = self.values(row_data)
+
+        if not (issuer_codigo and instrument_codigo and rating and valid_from):
+            return [
+                f"Campo requerido '{campo}' faltante o vacío"
+                for campo, valor in zip(SCHEMA_FIELDS[:4], (issuer_codigo, instrument_codigo, rating, valid_from))
+                if not valor
+            ]
+
+        errores = []
+        if rating not in self._ratings:
+            errores.append(f"Rating '{rating}' no es válido. Opciones: {', '.join(self.ratings)}")
+
+        desde = self.parse_date(str(valid_from))
+        if desde is None:
+            errores.append("Formato de 'valid_from' inválido. Use YYYY-MM-DD")
+
+        # valid_to vacío se considera no definido
+        if valid_to and str(valid_to).strip():
+            hasta = self.parse_date(str(valid_to))
+            # Como en la validación fila a fila, sin valid_from válida tampoco se acepta valid_to
+            if hasta is None or desde is None:
+                errores.append("Formato de 'valid_to' inválido. Use YYYY-MM-DD")
+            elif hasta <= desde:
+                errores.append("'valid_to' debe ser posterior a 'valid_from'")
+
+        if status and status not in self._status:
+            errores.append(f"Status '{status}' no es válido. Opciones: {', '.join(self.status)}")
+
+        if risk_level and risk_level not in self._risk_levels:
+            errores.append(f"Risk level '{risk_level}' no es válido. Opciones: {', '.join(self.risk_levels)}")
+
+        return errores
+
+
+@functools.lru_cache(maxsize=None)
+def get_row_schema():
+    """
+    Esquema compartido para validar filas sueltas, sin columnas fijas.
+
+    El procesamiento de una carga construye su propio RowSchema.
+    """
+    return RowSchema()
@@ -0,0 +1,107 @@
+"""
+Búsqueda de calificaciones sobre un documento de búsqueda desnormalizado.
+
+El filtro `search` de TaxRatingViewSet no recorre los joins a Issuer e
+Instrument: cada TaxRating guarda en `search_document` los textos buscables
+(SEARCH_DOCUMENT_FIELDS) en minúsculas, uno por línea, y la búsqueda filtra
+esa sola columna.
+- En PostgreSQL la columna tiene un índice GIN de trigramas (pg_trgm), que
+  sirve los `LIKE '%término%'`, y los resultados se ordenan por similitud
+  de palabras con los términos buscados.
+- En otros motores (SQLite en los tests) se usa el mismo filtro sin índice y
+  se ordena por la posición de la coincidencia: los campos van en el
+  documento de más a menos relevante.
+
+El documento se calcula al guardar la calificación (TaxRating.save, la carga
+masiva y COPY) y se recalcula cuando cambian los datos de su Issuer o
+Instrument (ver calificacionfiscal.signals).
+"""
+from django.db import connection
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Campos buscables, de más a menos relevante para ordenar en motores sin trigramas
+SEARCH_DOCUMENT_FIELDS = (
+    'instrument__codigo', 'rating', 'issuer__rut', 'issuer__nombre', 'instrument__nombre', 'status',
+)
+
+# Calificaciones que se recalculan por cada UPDATE en refresh_search_documents
+REFRESH_BATCH_SIZE = 1000
+
+
+def use_trigram_search():
+    """Indica si la búsqueda puede usar el índice y la similitud de trigramas (solo PostgreSQL)."""
+    return connection.vendor == 'postgresql'
+
+
+def _field_value(tax_rating, campo):
+    valor = tax_rating
+    for parte in campo.split('__'):
+        valor = getattr(valor, parte)
+    return valor
+
+
+def build_search_document(tax_rating):
+    """Documento de búsqueda de un TaxRating con su Issuer e Instrument ya asignados."""
+    return '\n'.join(str(_field_value(tax_rating, campo) or '').lower() for campo in SEARCH_DOCUMENT_FIELDS)
+
+
+def refresh_search_documents(queryset, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Recalcula y guarda el documento de búsqueda de las calificaciones de `queryset`.
+
+    Returns:
+        int: Calificaciones cuyo documento cambió
+    """
+    from .models import TaxRating
+
+    cambiadas = []
+    total = 0
+    for tax_rating in queryset.select_related('issuer', 'instrument').order_by('pk').iterator(chunk_size=batch_size):
+        documento = build_search_document(tax_rating)
+        if documento == tax_rating.search_document:
+            continue
+        tax_rating.search_document = documento
+        cambiadas.append(tax_rating)
+        if len(cambiadas) >= batch_size:
+            TaxRating.objects.bulk_update(cambiadas, ['search_document'])
+            total += len(cambiadas)
+            cambiadas = []
+    if cambiadas:
+        TaxRating.objects.bulk_update(cambiadas, ['search_document'])
+        total += len(cambiadas)
+    return total
+
+
+class TaxRatingSearchFilter(filters.SearchFilter):
+    """
+    Filtro `search` sobre TaxRating.search_document.
+
+    Cada término debe aparecer en el documento (igual que SearchFilter con
+    varios campos). Sin `ordering` explícito los resultados se ordenan por
+    relevancia y luego por el orden por defecto de la vista; por eso debe ir
+    después de OrderingFilter en filter_backends.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terminos = [termino.lower() for termino in self.get_search_terms(request)]
+        if not terminos:
+            return queryset
+
+        orden_previo = queryset.query.order_by
+        for termino in terminos:
+            queryset = queryset.filter(search_document__contains=termino)
+
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+
+        if use_trigram_search():
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            relevancia = TrigramWordSimilarity(' '.join(terminos), 'search_document').desc()
+        else:
+            from django.db.models import Value
+            from django.db.models.functions import StrIndex
+
+            relevancia = StrIndex('search_document', Value(terminos[0])).asc()
+        return queryset.order_by(relevancia, *orden_previo)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.db import models
-from .models import CalificacionTributaria, Contribuyente, TaxRating, BulkUpload, BulkUploadItem
+from .models import CalificacionTributaria, Contribuyente, TaxRating, BulkUpload, BulkUploadItem, BulkUploadSession
 from parametros.serializers import IssuerSerializer, InstrumentSerializer
 from django.utils import timezone
 
@@ -123,42 +124,168 @@ class BulkUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = BulkUpload
         fields = (
-            'id', 'archivo', 'tipo', 'usuario', 'usuario_username', 'estado', 
-            'total_filas', 'filas_ok', 'filas_error', 'resumen_errores', 
-            'porcentaje_exito', 'fecha_inicio', 'fecha_fin', 'creado_en', 'actualizado_en'
+            'id', 'archivo', 'tipo', 'modo', 'contenido_sha256', 'usuario', 'usuario_username', 'estado', 
+            'total_filas', 'filas_ok', 'filas_error', 'filas_actualizadas', 'filas_sin_cambios', 'resumen_errores', 
+            'porcentaje_exito', 'fecha_inicio', 'fecha_fin', 'encolado_en', 'heartbeat_en',
+            'intentos', 'filas_por_segundo', 'progreso_en', 'ultima_fila_confirmada', 'tiempos_etapas',
+            'creado_en', 'actualizado_en'
         )
         read_only_fields = (
-            'id', 'usuario', 'estado', 'tipo', 'total_filas', 'filas_ok', 'filas_error', 
-            'resumen_errores', 'fecha_inicio', 'fecha_fin', 'creado_en', 'actualizado_en'
+            'id', 'usuario', 'estado', 'tipo', 'contenido_sha256', 'total_filas', 'filas_ok', 'filas_error', 
+            'filas_actualizadas', 'filas_sin_cambios', 'resumen_errores', 'fecha_inicio', 'fecha_fin', 'encolado_en', 'heartbeat_en',
+            'intentos', 'filas_por_segundo', 'progreso_en', 'ultima_fila_confirmada', 'tiempos_etapas',
+            'creado_en', 'actualizado_en'
         )
     
     def validate_archivo(self, value):
-        """Validar que el archivo sea UTF-8 (.txt, .tsv)."""
-        if not value.name.endswith(('.txt', '.tsv')):
+        """
+        Validar el archivo en una sola lectura: extensión, tamaño, UTF-8, delimitador y header.
+        Acepta texto plano (.txt, .tsv) o comprimido con gzip/zstd (.txt.gz, .tsv.zst, ...).
+        El resultado (SHA-256, columnas y total de filas) queda en `self.upload_scan`.
+        """
+        from django.core.exceptions import ValidationError as DjangoValidationError
+        from .utils import DEFAULT_MAX_UNCOMPRESSED_SIZE, UPLOAD_EXTENSIONS, get_compression, scan_upload
+        
+        if not value.name.lower().endswith(UPLOAD_EXTENSIONS):
             raise serializers.ValidationError(
-                "Solo se permiten archivos de texto UTF-8 (.txt, .tsv). No se aceptan CSV o XLSX."
+                "Solo se permiten archivos de texto UTF-8 (.txt, .tsv), opcionalmente comprimidos "
+                "con gzip (.gz) o zstd (.zst). No se aceptan CSV o XLSX."
             )
         
-        # Validar tamaño (max 10MB)
-        if value.size > 10 * 1024 * 1024:
-            raise serializers.ValidationError("El archivo no puede superar los 10MB")
+        # Rechazar de inmediato por el tamaño declarado (BULK_UPLOAD_MAX_FILE_SIZE, 10MB por defecto).
+        # En archivos comprimidos es el tamaño transferido; el contenido se limita aparte
+        max_size = getattr(settings, 'BULK_UPLOAD_MAX_FILE_SIZE', 10 * 1024 * 1024)
+        if value.size > max_size:
+            raise serializers.ValidationError(
+                f"El archivo no puede superar los {max_size // (1024 * 1024)}MB"
+            )
+        if get_compression(value.name):
+            max_size = getattr(settings, 'BULK_UPLOAD_MAX_UNCOMPRESSED_SIZE', DEFAULT_MAX_UNCOMPRESSED_SIZE)
         
-        # Validar que sea UTF-8 válido
         try:
-            value.read()
-            value.seek(0)
-            value.read().decode('utf-8')
-            value.seek(0)
+            self.upload_scan = scan_upload(value, max_size=max_size)
         except UnicodeDecodeError:
             raise serializers.ValidationError(
                 "El archivo no está en formato UTF-8 válido. Asegúrese de guardar con codificación UTF-8."
             )
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        finally:
+            value.seek(0)
         
         return value
+    
+    def validate(self, attrs):
+        scan = getattr(self, 'upload_scan', None)
+        if scan is not None:
+            attrs['contenido_sha256'] = scan.sha256
+            attrs['columnas'] = scan.columnas
+            attrs['total_filas'] = scan.total_filas
+        return attrs
+
+
+class BulkUploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer para sesiones de subida por partes (ver calificacionfiscal.chunked)."""
+    tamano_parte = serializers.IntegerField(required=False)
+    partes_totales = serializers.ReadOnlyField()
+    partes_recibidas = serializers.SerializerMethodField()
+    bytes_contiguos = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = BulkUploadSession
+        fields = (
+            'id', 'nombre_archivo', 'modo', 'tamano_total', 'tamano_parte', 'sha256', 'estado',
+            'partes_totales', 'partes_recibidas', 'bytes_contiguos', 'columnas', 'error_encabezado',
+            'bulk_upload', 'creado_en', 'actualizado_en'
+        )
+        read_only_fields = (
+            'id', 'estado', 'columnas', 'error_encabezado', 'bulk_upload', 'creado_en', 'actualizado_en'
+        )
+    
+    def get_partes_recibidas(self, obj):
+        return sorted(int(numero) for numero in obj.partes)
+    
+    def validate_nombre_archivo(self, value):
+        from .utils import UPLOAD_EXTENSIONS
+        
+        if not value.lower().endswith(UPLOAD_EXTENSIONS):
+            raise serializers.ValidationError(
+                "Solo se permiten archivos de texto UTF-8 (.txt, .tsv), opcionalmente comprimidos "
+                "con gzip (.gz) o zstd (.zst). No se aceptan CSV o XLSX."
+            )
+        return value
+    
+    def validate_tamano_total(self, value):
+        max_size = getattr(settings, 'BULK_UPLOAD_MAX_FILE_SIZE', 10 * 1024 * 1024)
+        if value <= 0:
+            raise serializers.ValidationError("El archivo está vacío")
+        if value > max_size:
+            raise serializers.ValidationError(f"El archivo no puede superar los {max_size // (1024 * 1024)}MB")
+        return value
+    
+    def validate_tamano_parte(self, value):
+        from .chunked import MIN_PART_SIZE
+        
+        if value < MIN_PART_SIZE:
+            raise serializers.ValidationError(f"Las partes deben tener al menos {MIN_PART_SIZE} bytes")
+        return value
+    
+    def validate_sha256(self, value):
+        if value and (len(value) != 64 or any(c not in '0123456789abcdefABCDEF' for c in value)):
+            raise serializers.ValidationError("Debe ser un SHA-256 en hexadecimal (64 caracteres)")
+        return value.lower()
+    
+    def validate(self, attrs):
+        from .chunked import get_part_size
+        
+        attrs['tamano_parte'] = get_part_size(attrs.get('tamano_parte'))
+        return attrs
+
+
+class BulkUploadProgresoSerializer(serializers.Serializer):
+    """
+    Serializer liviano para consultar el avance de una carga en proceso.
+    Se construye desde un dict de valores para no leer resumen_errores.
+    """
+    id = serializers.IntegerField()
+    estado = serializers.CharField()
+    total_filas = serializers.IntegerField()
+    filas_ok = serializers.IntegerField()
+    filas_error = serializers.IntegerField()
+    filas_procesadas = serializers.SerializerMethodField()
+    porcentaje = serializers.SerializerMethodField()
+    filas_por_segundo = serializers.FloatField()
+    eta_segundos = serializers.SerializerMethodField()
+    fecha_inicio = serializers.DateTimeField(allow_null=True)
+    progreso_en = serializers.DateTimeField(allow_null=True)
+    fecha_fin = serializers.DateTimeField(allow_null=True)
+
+    def get_filas_procesadas(self, obj):
+        return obj['filas_ok'] + obj['filas_error']
+
+    def get_porcentaje(self, obj):
+        if obj['estado'] == 'COMPLETADO':
+            return 100.0
+        if obj['total_filas'] == 0:
+            return 0.0
+        procesadas = self.get_filas_procesadas(obj)
+        return round(min(procesadas / obj['total_filas'], 1) * 100, 2)
+
+    def get_eta_segundos(self, obj):
+        """Segundos estimados para terminar; None si la carga no está en proceso."""
+        if obj['estado'] != 'PROCESANDO' or not obj['filas_por_segundo']:
+            return None
+        restantes = max(obj['total_filas'] - self.get_filas_procesadas(obj), 0)
+        return round(restantes / obj['filas_por_segundo'], 1)
 
 
 class BulkUploadItemSerializer(serializers.ModelSerializer):
-    """Serializer para items individuales de cargas masivas."""
+    """
+    Serializer para items individuales de cargas masivas.
+    Los datos compactos se devuelven como diccionario; la vista puede pasar
+    las columnas de la carga en el contexto ('columnas').
+    """
+    datos = serializers.SerializerMethodField()
     
     class Meta:
         model = BulkUploadItem
@@ -167,6 +294,9 @@ class BulkUploadItemSerializer(serializers.ModelSerializer):
             'datos', 'creado_en'
         )
         read_only_fields = ('id', 'creado_en')
+    
+    def get_datos(self, obj):
+        return obj.get_datos(self.context.get('columnas'))
 
 
 class BulkUploadListSerializer(serializers.ModelSerializer):
@@ -177,6 +307,6 @@ class BulkUploadListSerializer(serializers.ModelSerializer):
     class Meta:
         model = BulkUpload
         fields = (
-            'id', 'archivo', 'tipo', 'usuario_username', 'estado', 
+            'id', 'archivo', 'tipo', 'modo', 'usuario_username', 'estado', 
             'total_filas', 'filas_ok', 'filas_error', 'porcentaje_exito', 'creado_en'
         )
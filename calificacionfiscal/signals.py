@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from parametros.models import Issuer, Instrument
+from .models import TaxRating
+from .search import refresh_search_documents
+from .stats import DIMENSIONS, STATS_ATTNAMES, record_created, record_deleted, record_updated
+
+
+@receiver(post_save, sender=Issuer)
+def refresh_issuer_search_documents(sender, instance, created, **kwargs):
+    """Recalcula el documento de búsqueda de las calificaciones de un Issuer modificado."""
+    if not created:
+        refresh_search_documents(TaxRating.objects.filter(issuer=instance))
+
+
+@receiver(post_save, sender=Instrument)
+def refresh_instrument_search_documents(sender, instance, created, **kwargs):
+    """Recalcula el documento de búsqueda de las calificaciones de un Instrument modificado."""
+    if not created:
+        refresh_search_documents(TaxRating.objects.filter(instrument=instance))
+
+
+@receiver(pre_save, sender=TaxRating)
+def load_tax_rating_stats_key(sender, instance, **kwargs):
+    """Lee los valores previos de una calificación que no se cargó completa desde la base de datos."""
+    if instance.pk is None or hasattr(instance, '_stats_key'):
+        return
+    previa = TaxRating.objects.filter(pk=instance.pk).values_list(*DIMENSIONS.values()).first()
+    if previa is not None:
+        instance._stats_key = tuple(str(valor) for valor in previa)
+
+
+@receiver(post_save, sender=TaxRating)
+def update_tax_rating_stats(sender, instance, created, update_fields=None, **kwargs):
+    """Suma la calificación creada a los contadores, o aplica el cambio de sus dimensiones."""
+    if created:
+        record_created([instance])
+        return
+    if not hasattr(instance, '_stats_key'):
+        return
+    if update_fields is not None and not (set(update_fields) & (STATS_ATTNAMES | set(DIMENSIONS))):
+        return
+    record_updated([instance])
+
+
+@receiver(post_delete, sender=TaxRating)
+def discount_tax_rating_stats(sender, instance, **kwargs):
+    """Descuenta la calificación eliminada de los contadores."""
+    record_deleted([instance])
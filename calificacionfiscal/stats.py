@@ -0,0 +1,174 @@
+"""
+Estadísticas de calificaciones mantenidas de forma incremental.
+
+TaxRatingCounter guarda un contador por valor de cada dimensión (rating,
+status, risk_level, issuer e instrument) más el total. Los contadores se
+actualizan en la misma transacción que cada escritura de TaxRating:
+- save() y delete() individuales, con los signals de calificacionfiscal.signals.
+- La carga masiva (bulk_create, COPY y bulk_update), que no dispara signals,
+  llama a record_created / record_updated por lote.
+
+Cada cambio aplica solo la diferencia (+1/-1 por dimensión) con un UPDATE
+por contador. Las estadísticas sin filtros se leen de esta tabla pequeña en
+vez de agregar toda la tabla de calificaciones; el comando
+`rebuild_tax_rating_stats` las recalcula desde cero si se desalinean.
+"""
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+# Dimensiones contadas: nombre del contador -> atributo de TaxRating
+DIMENSIONS = {
+    'rating': 'rating',
+    'status': 'status',
+    'risk_level': 'risk_level',
+    'issuer': 'issuer_id',
+    'instrument': 'instrument_id',
+}
+
+# Atributos que deben venir cargados para conocer los valores previos de una instancia
+STATS_ATTNAMES = frozenset(DIMENSIONS.values())
+
+# Dimensión del contador con el total de calificaciones (con valor '')
+TOTAL = 'total'
+
+# Cantidad de emisores e instrumentos en los rankings
+TOP_SIZE = 10
+
+
+def stats_key(tax_rating):
+    """Valores de las dimensiones de un TaxRating, como strings."""
+    return tuple(str(getattr(tax_rating, atributo)) for atributo in DIMENSIONS.values())
+
+
+def _delta(claves, signo, delta=None):
+    delta = delta if delta is not None else Counter()
+    for clave in claves:
+        delta[(TOTAL, '')] += signo
+        for dimension, valor in zip(DIMENSIONS, clave):
+            delta[(dimension, valor)] += signo
+    return delta
+
+
+def apply_stats_delta(delta):
+    """Suma a cada contador (dimension, valor) su diferencia; crea los que no existen."""
+    from .models import TaxRatingCounter
+
+    for (dimension, valor), diferencia in sorted(delta.items()):
+        if not diferencia:
+            continue
+        contadores = TaxRatingCounter.objects.filter(dimension=dimension, valor=valor)
+        if contadores.update(total=F('total') + diferencia):
+            continue
+        try:
+            with transaction.atomic():
+                TaxRatingCounter.objects.create(dimension=dimension, valor=valor, total=diferencia)
+        except IntegrityError:
+            # Otra transacción lo creó entre el UPDATE y el INSERT
+            contadores.update(total=F('total') + diferencia)
+
+
+def remember_stats_key(tax_rating):
+    """Guarda en la instancia sus valores actuales, para calcular la diferencia al actualizarla."""
+    tax_rating._stats_key = stats_key(tax_rating)
+
+
+def record_created(tax_ratings):
+    """Cuenta calificaciones recién insertadas."""
+    claves = [stats_key(tax_rating) for tax_rating in tax_ratings]
+    apply_stats_delta(_delta(claves, 1))
+    for tax_rating, clave in zip(tax_ratings, claves):
+        tax_rating._stats_key = clave
+
+
+def record_updated(tax_ratings):
+    """
+    Aplica el cambio de calificaciones actualizadas.
+
+    Cada instancia debe traer los valores previos en `_stats_key` (se guardan al
+    cargarla desde la base de datos, ver TaxRating.from_db).
+    """
+    delta = Counter()
+    for tax_rating in tax_ratings:
+        clave = stats_key(tax_rating)
+        if clave != tax_rating._stats_key:
+            _delta([tax_rating._stats_key], -1, delta)
+            _delta([clave], 1, delta)
+            tax_rating._stats_key = clave
+    apply_stats_delta(delta)
+
+
+def record_deleted(tax_ratings):
+    """Descuenta calificaciones eliminadas (con los valores que tenían guardados)."""
+    apply_stats_delta(_delta([getattr(t, '_stats_key', None) or stats_key(t) for t in tax_ratings], -1))
+
+
+def rebuild_stats():
+    """
+    Recalcula todos los contadores desde la tabla de calificaciones.
+
+    Returns:
+        int: Cantidad de contadores guardados
+    """
+    from .models import TaxRating, TaxRatingCounter
+
+    contadores = [TaxRatingCounter(dimension=TOTAL, valor='', total=TaxRating.objects.count())]
+    for dimension, atributo in DIMENSIONS.items():
+        for fila in TaxRating.objects.order_by().values(atributo).annotate(total=Count('id')):
+            contadores.append(TaxRatingCounter(dimension=dimension, valor=str(fila[atributo]), total=fila['total']))
+
+    with transaction.atomic():
+        TaxRatingCounter.objects.all().delete()
+        TaxRatingCounter.objects.bulk_create(contadores)
+    return len(contadores)
+
+
+def _ranking(valores, nombres, campo):
+    """Suma los contadores por nombre (como el GROUP BY por nombre) y retorna los TOP_SIZE mayores."""
+    por_nombre = Counter()
+    for valor, total in valores.items():
+        por_nombre[nombres.get(int(valor))] += total
+    return [{campo: nombre, 'count': total} for nombre, total in por_nombre.most_common(TOP_SIZE)]
+
+
+def get_cached_stats(incluir_rankings=True):
+    """
+    Estadísticas de todas las calificaciones leídas de los contadores.
+
+    Args:
+        incluir_rankings: Si es False se omiten top_issuers y top_instruments
+            (y las consultas de sus nombres)
+
+    Returns:
+        dict: Las mismas claves que reports.obtener_estadisticas sin filtros
+    """
+    from parametros.models import Instrument, Issuer
+    from .models import TaxRatingCounter
+
+    por_dimension = {dimension: {} for dimension in (TOTAL, *DIMENSIONS)}
+    contadores = TaxRatingCounter.objects.filter(total__gt=0)
+    if not incluir_rankings:
+        contadores = contadores.exclude(dimension__in=('issuer', 'instrument'))
+    for dimension, valor, total in contadores.values_list('dimension', 'valor', 'total'):
+        por_dimension[dimension][valor] = total
+
+    def agrupado(dimension):
+        filas = sorted(por_dimension[dimension].items(), key=lambda item: -item[1])
+        return [{dimension: valor, 'count': total} for valor, total in filas]
+
+    stats = {
+        'total': por_dimension[TOTAL].get('', 0),
+        'vigentes': por_dimension['status'].get('VIGENTE', 0),
+        'por_rating': agrupado('rating'),
+        'por_status': agrupado('status'),
+        'por_risk_level': agrupado('risk_level'),
+    }
+    if not incluir_rankings:
+        return stats
+
+    issuers = dict(Issuer.objects.filter(pk__in=por_dimension['issuer']).values_list('pk', 'nombre'))
+    instruments = dict(Instrument.objects.filter(pk__in=por_dimension['instrument']).values_list('pk', 'nombre'))
+
+    stats['top_issuers'] = _ranking(por_dimension['issuer'], issuers, 'issuer__nombre')
+    stats['top_instruments'] = _ranking(por_dimension['instrument'], instruments, 'instrument__nombre')
+    return stats
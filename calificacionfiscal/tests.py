@@ -230,6 +230,154 @@ class TaxRatingCRUDTests(TestCase):
         self.assertEqual(len(response.data), 3)
 
 
+class TaxRatingKeysetPaginationTests(TestCase):
+    """Tests para la paginación por cursor de calificaciones"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='lector', email='lector@example.com', password='lectorpass123', rol='ANALISTA'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.issuer = Issuer.objects.create(codigo='ABC', nombre='ABC Corp', rut='11111111-1')
+        otro_issuer = Issuer.objects.create(codigo='XYZ', nombre='XYZ Corp', rut='22222222-2')
+        self.instrument = Instrument.objects.create(codigo='BOND001', nombre='Corporate Bond', tipo='BONO')
+        # Varias calificaciones por fecha, para que el orden dependa también del id
+        for dia in range(1, 9):
+            for issuer in (self.issuer, otro_issuer):
+                TaxRating.objects.create(
+                    issuer=issuer, instrument=self.instrument, rating='AAA', valid_from=f'2025-01-0{dia}'
+                )
+        self.orden = list(TaxRating.objects.order_by('-valid_from', '-id').values_list('id', flat=True))
+
+    def _recorrer(self, url):
+        ids = []
+        paginas = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            paginas.append(response.data)
+            ids += [fila['id'] for fila in response.data['results']]
+            url = response.data['next']
+        return ids, paginas
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        """Debería entregar cada calificación una vez, en orden (valid_from, id) descendente"""
+        ids, paginas = self._recorrer('/api/v1/tax-ratings/?paginacion=cursor&page_size=5')
+
+        self.assertEqual(ids, self.orden)
+        self.assertEqual(len(paginas), 4)
+        self.assertEqual(paginas[0]['count'], 16)
+        self.assertIsNone(paginas[0]['previous'])
+
+    def test_previous_vuelve_a_la_pagina_anterior(self):
+        """Debería volver con `previous` a las mismas filas de la página anterior"""
+        primera = self.client.get('/api/v1/tax-ratings/?paginacion=cursor&page_size=5').data
+        segunda = self.client.get(primera['next']).data
+        tercera = self.client.get(segunda['next']).data
+
+        de_vuelta = self.client.get(tercera['previous']).data
+
+        self.assertEqual(de_vuelta['results'], segunda['results'])
+        self.assertEqual(self.client.get(de_vuelta['previous']).data['results'], primera['results'])
+
+    def test_sin_total_omite_el_conteo(self):
+        """Debería obtener cada página con una sola consulta y sin `count`"""
+        primera = self.client.get('/api/v1/tax-ratings/?paginacion=cursor&page_size=5&sin_total=true').data
+
+        with self.assertNumQueries(1):
+            segunda = self.client.get(primera['next']).data
+
+        self.assertNotIn('count', segunda)
+        self.assertEqual([fila['id'] for fila in segunda['results']], self.orden[5:10])
+
+    def test_acciones_filtradas_y_orden_ascendente(self):
+        """Debería paginar por cursor por_issuer y por_rango_fecha respetando sus filtros"""
+        ids, _ = self._recorrer(
+            f'/api/v1/tax-ratings/por_issuer/?issuer_id={self.issuer.id}&paginacion=cursor&page_size=3'
+        )
+        self.assertEqual(ids, list(
+            TaxRating.objects.filter(issuer=self.issuer).order_by('-valid_from', '-id').values_list('id', flat=True)
+        ))
+
+        ids, _ = self._recorrer(
+            '/api/v1/tax-ratings/por_rango_fecha/?fecha_desde=2025-01-03&fecha_hasta=2025-01-06'
+            '&paginacion=cursor&ordering=valid_from&page_size=3'
+        )
+        self.assertEqual(ids, list(
+            TaxRating.objects.filter(valid_from__range=('2025-01-03', '2025-01-06'))
+            .order_by('valid_from', 'id').values_list('id', flat=True)
+        ))
+
+    def test_cursor_invalido(self):
+        """Debería responder 404 con un cursor que no se puede decodificar"""
+        response = self.client.get('/api/v1/tax-ratings/?cursor=no-es-un-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TaxRatingSearchTests(TestCase):
+    """Tests para la búsqueda de calificaciones sobre el documento de búsqueda"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='buscador', email='buscador@example.com', password='buscapass123', rol='ANALISTA'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.issuer = Issuer.objects.create(codigo='ABC', nombre='Andes Corp', rut='11111111-1')
+        self.instrument = Instrument.objects.create(codigo='BOND001', nombre='Bono Verde', tipo='BONO')
+
+    def _buscar(self, termino):
+        response = self.client.get('/api/v1/tax-ratings/', {'search': termino})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [fila['id'] for fila in response.data['results']]
+
+    def test_documento_se_guarda_con_la_calificacion(self):
+        """Debería guardar en minúsculas los textos buscables del issuer, instrument y la calificación"""
+        tax_rating = TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AA', valid_from='2025-01-01'
+        )
+
+        self.assertEqual(
+            tax_rating.search_document, 'bond001\naa\n11111111-1\nandes corp\nbono verde\nvigente'
+        )
+
+    def test_busqueda_exige_todos_los_terminos_y_ordena_por_relevancia(self):
+        """Debería filtrar por todos los términos y poner primero las coincidencias en campos más relevantes"""
+        otro_issuer = Issuer.objects.create(codigo='XYZ', nombre='Verde Holdings', rut='22222222-2')
+        otro_instrument = Instrument.objects.create(codigo='VERDE01', nombre='Pagaré', tipo='BONO')
+        por_nombre = TaxRating.objects.create(
+            issuer=otro_issuer, instrument=self.instrument, rating='A', valid_from='2025-03-01'
+        )
+        por_codigo = TaxRating.objects.create(
+            issuer=self.issuer, instrument=otro_instrument, rating='A', valid_from='2025-01-01'
+        )
+        por_instrument = TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='BBB', valid_from='2025-02-01'
+        )
+
+        self.assertEqual(self._buscar('VERDE'), [por_codigo.id, por_nombre.id, por_instrument.id])
+        self.assertEqual(self._buscar('verde holdings'), [por_nombre.id])
+        # Con un orden explícito no se ordena por relevancia
+        response = self.client.get('/api/v1/tax-ratings/', {'search': 'verde', 'ordering': '-valid_from'})
+        self.assertEqual(
+            [fila['id'] for fila in response.data['results']], [por_nombre.id, por_instrument.id, por_codigo.id]
+        )
+
+    def test_documento_se_actualiza_al_renombrar_el_issuer(self):
+        """Debería encontrar la calificación por el nombre nuevo del issuer y no por el anterior"""
+        tax_rating = TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AA', valid_from='2025-01-01'
+        )
+
+        self.issuer.nombre = 'Pacífico SpA'
+        self.issuer.save()
+
+        self.assertEqual(self._buscar('pacífico'), [tax_rating.id])
+        self.assertEqual(self._buscar('andes'), [])
+
+
 class BulkUploadTests(TestCase):
     """Tests para carga masiva de calificaciones"""
     
@@ -391,3 +539,1660 @@ class BulkUploadTests(TestCase):
         self.assertIn('total', response.data)
         self.assertEqual(response.data['total'], 3)
 
+
+
+class BulkUploadParsingTests(TestCase):
+    """Tests para el parser incremental de archivos de carga masiva"""
+
+    HEADER = 'issuer_codigo|instrument_codigo|rating|valid_from|valid_to|status|risk_level|comments\n'
+
+    def test_iter_utf8_file_retorna_filas_numeradas(self):
+        """Debería retornar tuplas (numero_fila, datos) empezando en la fila 2"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .utils import iter_utf8_file
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||VIGENTE|BAJO|Primera\n'
+        contenido += 'ABC|BOND001|AA|2025-02-01||VIGENTE|BAJO|Segunda\n'
+        archivo = SimpleUploadedFile('carga.txt', contenido.encode('utf-8'))
+
+        filas = list(iter_utf8_file(archivo))
+
+        self.assertEqual([numero for numero, _ in filas], [2, 3])
+        self.assertEqual(filas[0][1]['rating'], 'AAA')
+        self.assertEqual(filas[1][1]['comments'], 'Segunda')
+
+    def test_iter_utf8_file_es_perezoso(self):
+        """Debería entregar la primera fila sin leer el archivo completo"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .utils import iter_utf8_file
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||VIGENTE|BAJO|x\n' * 1000
+        archivo = SimpleUploadedFile('carga.txt', contenido.encode('utf-8'))
+
+        filas = iter_utf8_file(archivo, chunk_size=256)
+        numero_fila, datos = next(filas)
+
+        self.assertEqual(numero_fila, 2)
+        self.assertLess(archivo.tell(), len(contenido))
+
+    def test_iter_utf8_file_caracter_multibyte_entre_bloques(self):
+        """Debería decodificar caracteres multibyte cortados entre dos bloques"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .utils import iter_utf8_file
+
+        contenido = 'issuer_codigo\tcomments\n' + 'ABC\tCalificación económica\n' * 50
+        archivo = SimpleUploadedFile('carga.tsv', contenido.encode('utf-8'))
+
+        filas = list(iter_utf8_file(archivo, chunk_size=7))
+
+        self.assertEqual(len(filas), 50)
+        self.assertTrue(all(datos['comments'] == 'Calificación económica' for _, datos in filas))
+
+    def test_iter_utf8_file_rechaza_archivo_no_utf8(self):
+        """Debería lanzar ValidationError si el archivo no es UTF-8"""
+        from django.core.exceptions import ValidationError
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .utils import iter_utf8_file
+
+        contenido = (self.HEADER + 'ABC|BOND001|AAA|2025-01-01||VIGENTE|BAJO|Calificación\n').encode('latin-1')
+        archivo = SimpleUploadedFile('carga.txt', contenido)
+
+        with self.assertRaises(ValidationError):
+            list(iter_utf8_file(archivo))
+
+
+    def test_scan_upload_valida_y_cuenta_en_una_lectura(self):
+        """Debería calcular SHA-256, delimitador, columnas y filas recorriendo el archivo una vez"""
+        import hashlib
+        from unittest.mock import patch
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from . import utils
+        from .utils import scan_upload
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||VIGENTE|BAJO|Calificación\n' * 20 + '\n'
+        archivo = SimpleUploadedFile('carga.txt', contenido.encode('utf-8'))
+
+        with patch('calificacionfiscal.utils._iter_file_chunks', wraps=utils._iter_file_chunks) as lector:
+            scan = scan_upload(archivo, chunk_size=7)
+
+        self.assertEqual(lector.call_count, 1)
+        self.assertEqual(scan.sha256, hashlib.sha256(contenido.encode('utf-8')).hexdigest())
+        self.assertEqual(scan.tamano, len(contenido.encode('utf-8')))
+        self.assertEqual(scan.delimitador, '|')
+        self.assertEqual(scan.columnas[:4], ['issuer_codigo', 'instrument_codigo', 'rating', 'valid_from'])
+        self.assertEqual(scan.total_filas, 20)
+
+    def test_scan_upload_rechaza_header_incompleto_y_tamano(self):
+        """Debería rechazar headers sin columnas requeridas y archivos sobre el tamaño máximo"""
+        from django.core.exceptions import ValidationError
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .utils import scan_upload
+
+        sin_rating = SimpleUploadedFile('carga.txt', b'issuer_codigo|instrument_codigo|valid_from\nABC|BOND001|2025-01-01\n')
+        with self.assertRaisesMessage(ValidationError, 'rating'):
+            scan_upload(sin_rating)
+
+        grande = SimpleUploadedFile('carga.txt', (self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n' * 100).encode('utf-8'))
+        with self.assertRaises(ValidationError):
+            scan_upload(grande, max_size=1024, chunk_size=256)
+        self.assertLess(grande.tell(), grande.size)
+
+class BulkUploadFileTestCase(TestCase):
+    """Base para tests que procesan archivos de carga masiva en un MEDIA_ROOT y una caché temporales"""
+
+    HEADER = 'issuer_codigo|instrument_codigo|rating|valid_from|valid_to|status|risk_level|comments\n'
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'bulk_uploads': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cargas-tests'},
+            },
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create_user(
+            username='cargador',
+            email='cargador@example.com',
+            password='cargapass123',
+            rol='ADMIN'
+        )
+        self.issuer = Issuer.objects.create(codigo='ABC', nombre='ABC Corp', rut='11111111-1')
+        self.instrument = Instrument.objects.create(codigo='BOND001', nombre='Corporate Bond', tipo='BONO')
+
+    def _crear_carga(self, contenido):
+        from django.core.files.base import ContentFile
+
+        bulk_upload = BulkUpload(usuario=self.user, tipo='UTF8')
+        bulk_upload.archivo.save('carga.txt', ContentFile(contenido.encode('utf-8')))
+        return bulk_upload
+
+
+class BulkUploadProcessingTests(BulkUploadFileTestCase):
+    """Tests para el procesamiento de cargas masivas"""
+
+    def test_validate_tax_rating_batch_resuelve_codigos_en_bloque(self):
+        """Debería validar un lote completo con una consulta por modelo"""
+        from .utils import validate_tax_rating_batch
+
+        batch = [
+            (fila, {
+                'issuer_codigo': 'ABC' if fila % 2 else 'NOEXISTE',
+                'instrument_codigo': 'BOND001',
+                'rating': 'AAA',
+                'valid_from': f'2025-01-{fila:02d}',
+            })
+            for fila in range(2, 22)
+        ]
+
+        with self.assertNumQueries(2):
+            resultados, issuers, instruments = validate_tax_rating_batch(batch)
+
+        self.assertEqual(len(resultados), 20)
+        self.assertEqual(set(issuers), {'ABC'})
+        self.assertEqual(set(instruments), {'BOND001'})
+        errores_fila_2 = resultados[0][2]
+        self.assertEqual(errores_fila_2, ["Issuer con código 'NOEXISTE' no existe"])
+        self.assertEqual(resultados[1][2], [])
+
+    def test_validate_tax_rating_batch_mantiene_mensajes(self):
+        """Debería producir los mismos errores que la validación fila a fila"""
+        from .utils import validate_tax_rating_batch, validate_tax_rating_row
+
+        filas = [
+            {'issuer_codigo': 'X', 'instrument_codigo': 'Y', 'rating': 'ZZZ', 'valid_from': '2025-13-01'},
+            {'issuer_codigo': 'ABC', 'instrument_codigo': 'BOND001', 'rating': 'AA',
+             'valid_from': '2025-02-01', 'valid_to': '2025-01-01', 'status': 'OTRO', 'risk_level': 'NADA'},
+            {'issuer_codigo': 'ABC', 'rating': 'AA'},
+        ]
+
+        resultados, _, _ = validate_tax_rating_batch(list(enumerate(filas, start=2)))
+
+        for (_, datos, errores), fila in zip(resultados, filas):
+            self.assertEqual(errores, validate_tax_rating_row(fila)[1])
+
+    def test_process_bulk_upload_file_crea_calificaciones(self):
+        """Debería crear TaxRatings e items OK/ERROR para cada fila"""
+        from .utils import process_bulk_upload_file
+
+        contenido = self.HEADER
+        contenido += 'ABC|BOND001|AAA|2025-01-01|2025-01-31|VIGENTE|BAJO|Primera\n'
+        contenido += 'ABC|BOND001|AA|2025-02-01||||Segunda\n'
+        contenido += 'NOEXISTE|BOND001|AA|2025-03-01||||Tercera\n'
+        bulk_upload = self._crear_carga(contenido)
+
+        resultado = process_bulk_upload_file(bulk_upload, chunk_size=2)
+
+        self.assertEqual(resultado['total_filas'], 3)
+        self.assertEqual(resultado['filas_ok'], 2)
+        self.assertEqual(resultado['filas_error'], 1)
+        self.assertEqual(resultado['resumen_errores'], {4: "Issuer con código 'NOEXISTE' no existe"})
+        self.assertEqual(TaxRating.objects.count(), 2)
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', 'estado')),
+            [(2, 'OK'), (3, 'OK'), (4, 'ERROR')]
+        )
+        segunda = TaxRating.objects.get(valid_from='2025-02-01')
+        self.assertEqual((segunda.status, segunda.risk_level, segunda.valid_to), ('VIGENTE', 'MODERADO', None))
+
+    def test_process_bulk_upload_file_detecta_claves_duplicadas(self):
+        """Debería marcar como error las filas con clave existente o repetida en el archivo"""
+        from .utils import process_bulk_upload_file
+
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='A',
+            valid_from='2025-01-01', valid_to='2025-01-31'
+        )
+        contenido = self.HEADER
+        contenido += 'ABC|BOND001|AAA|2025-01-01||||Existente\n'
+        contenido += 'ABC|BOND001|AA|2025-02-01||||Nueva\n'
+        contenido += 'ABC|BOND001|B|2025-02-01||||Repetida\n'
+        bulk_upload = self._crear_carga(contenido)
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual(resultado['filas_ok'], 1)
+        self.assertEqual(sorted(resultado['resumen_errores']), [2, 4])
+        self.assertIn('Ya existe una calificación', resultado['resumen_errores'][2])
+        self.assertEqual(TaxRating.objects.count(), 2)
+
+    def test_fila_rechazada_por_la_base_no_aborta_el_lote(self):
+        """Debería aislar con savepoints una fila que falla al insertar y confirmar el resto del lote"""
+        from unittest.mock import patch
+        from .utils import process_bulk_upload_file
+
+        # Vencida, para que la fila no se rechace antes por solapamiento
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AA',
+            valid_from='2025-01-02', status='VENCIDO', analista=self.user
+        )
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 4)
+        )
+        bulk_upload = self._crear_carga(contenido)
+
+        # Sin la verificación previa, el duplicado llega hasta la restricción única
+        with patch('calificacionfiscal.utils.find_existing_keys', return_value=set()):
+            resultado = process_bulk_upload_file(bulk_upload, chunk_size=10)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (2, 1))
+        self.assertIn('Ya existe una calificación', resultado['resumen_errores'][3])
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', 'estado')),
+            [(2, 'OK'), (3, 'ERROR'), (4, 'OK')]
+        )
+        self.assertEqual(TaxRating.objects.count(), 3)
+
+    def test_copy_backend_usa_orm_fuera_de_postgresql(self):
+        """Debería procesar con bulk_create aunque BULK_UPLOAD_USE_COPY esté activo en SQLite"""
+        from django.db import connection
+        from django.test import override_settings
+        from .pg_copy import use_copy_backend
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n')
+
+        with override_settings(BULK_UPLOAD_USE_COPY=True):
+            self.assertEqual(use_copy_backend(), connection.vendor == 'postgresql')
+            resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual(resultado['filas_ok'], 1)
+        self.assertEqual(TaxRating.objects.count(), 1)
+
+    def test_build_copy_buffer_escapa_valores(self):
+        """Debería generar líneas de COPY con NULL como \\N y escapar tabulaciones y saltos"""
+        from datetime import date
+        from .pg_copy import build_copy_buffer
+
+        tax_rating = TaxRating(
+            issuer=self.issuer, instrument=self.instrument, rating='AAA', risk_level='BAJO',
+            valid_from=date(2025, 1, 1), valid_to=None, status='VIGENTE',
+            comments='linea 1\nlinea\t2', analista=self.user
+        )
+
+        linea = build_copy_buffer([(2, {}, tax_rating)]).read()
+
+        self.assertEqual(
+            linea,
+            f'2\t{self.issuer.id}\t{self.instrument.id}\tAAA\tBAJO\t2025-01-01\t\\N\tVIGENTE\t'
+            f'linea 1\\nlinea\\t2\t{self.user.id}\t\n'
+        )
+
+    def test_items_compactos_se_reconstruyen_al_leer(self):
+        """Debería guardar los headers una vez y devolver los datos de cada item como diccionario"""
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(
+            self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\nNOEXISTE|BOND001|AA|2025-01-02||||\n'
+        )
+        process_bulk_upload_file(bulk_upload)
+
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.columnas, self.HEADER.strip().split('|'))
+        item = bulk_upload.items.get(numero_fila=2)
+        self.assertEqual(item.datos[:4], ['ABC', 'BOND001', 'AAA', '2025-01-01'])
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(f'/api/v1/bulk-uploads/{bulk_upload.id}/items/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        filas = response.data['results']
+        self.assertEqual(filas[0]['datos']['issuer_codigo'], 'ABC')
+        self.assertEqual(filas[1]['datos']['rating'], 'AA')
+        self.assertEqual(filas[1]['estado'], 'ERROR')
+
+    def _carga_con_existentes(self, modo):
+        """Crea dos calificaciones existentes y una carga que repite una, cambia otra y agrega una nueva"""
+        # Vencidas, para que la fila nueva no se solape con ellas
+        for dia, rating in ((1, 'AAA'), (2, 'AA')):
+            TaxRating.objects.create(
+                issuer=self.issuer, instrument=self.instrument, rating=rating,
+                valid_from=f'2025-01-0{dia}', status='VENCIDO', analista=self.user
+            )
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|AAA|2025-01-01||VENCIDO||\n'
+            + 'ABC|BOND001|BBB|2025-01-02||VENCIDO||\n'
+            + 'ABC|BOND001|A|2025-01-03||||\n'
+        )
+        bulk_upload.modo = modo
+        bulk_upload.save()
+        return bulk_upload
+
+    def test_modo_upsert_actualiza_solo_filas_con_cambios(self):
+        """Debería omitir filas iguales, actualizar las modificadas e insertar las nuevas"""
+        from cuentas.audit_models import AuditLog
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._carga_con_existentes('UPSERT')
+        actualizada = TaxRating.objects.get(valid_from='2025-01-02')
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (3, 0))
+        self.assertEqual((resultado['filas_actualizadas'], resultado['filas_sin_cambios']), (1, 1))
+        self.assertEqual(
+            list(TaxRating.objects.order_by('valid_from').values_list('rating', flat=True)),
+            ['AAA', 'BBB', 'A']
+        )
+        self.assertTrue(AuditLog.objects.filter(
+            accion='UPDATE', modelo='TaxRating', object_id=str(actualizada.id)
+        ).exists())
+
+    def test_modo_omitir_sin_cambios_rechaza_filas_modificadas(self):
+        """Debería omitir filas iguales y marcar como error las que cambian una calificación existente"""
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._carga_con_existentes('OMITIR_SIN_CAMBIOS')
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_sin_cambios']), (2, 1))
+        self.assertIn('ya existe con otros valores', resultado['resumen_errores'][3])
+        self.assertEqual(TaxRating.objects.get(valid_from='2025-01-02').rating, 'AA')
+        self.assertEqual(TaxRating.objects.count(), 3)
+
+    def test_process_bulk_upload_file_audita_en_bloque(self):
+        """Debería registrar auditoría de creación para cada calificación insertada"""
+        from cuentas.audit_models import AuditLog
+        from .utils import process_bulk_upload_file
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 11)
+        )
+        bulk_upload = self._crear_carga(contenido)
+
+        resultado = process_bulk_upload_file(bulk_upload, chunk_size=4)
+
+        self.assertEqual(resultado['filas_ok'], 10)
+        logs = AuditLog.objects.filter(modelo='TaxRating', accion='CREATE')
+        self.assertEqual(logs.count(), 10)
+        self.assertEqual(
+            set(logs.values_list('object_id', flat=True)),
+            {str(pk) for pk in TaxRating.objects.values_list('pk', flat=True)}
+        )
+
+
+class BulkUploadJobQueueTests(BulkUploadFileTestCase):
+    """Tests para la cola de procesamiento de cargas masivas"""
+
+    def test_procesar_encola_y_retorna_202(self):
+        """Debería encolar la carga sin procesarla dentro del request"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        bulk_upload = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n')
+
+        response = client.post(f'/api/v1/bulk-uploads/{bulk_upload.id}/procesar/')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.estado, 'EN_COLA')
+        self.assertIsNotNone(bulk_upload.encolado_en)
+        self.assertEqual(TaxRating.objects.count(), 0)
+
+    def test_worker_toma_y_procesa_la_carga(self):
+        """Debería tomar la carga en cola, procesarla y dejarla COMPLETADO"""
+        from .jobs import claim_next_bulk_upload, enqueue_bulk_upload, run_claimed_bulk_upload
+
+        bulk_upload = enqueue_bulk_upload(self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n'))
+
+        tomada = claim_next_bulk_upload('worker-test')
+        self.assertEqual(tomada.pk, bulk_upload.pk)
+        self.assertEqual((tomada.estado, tomada.worker, tomada.intentos), ('PROCESANDO', 'worker-test', 1))
+        self.assertIsNone(claim_next_bulk_upload('otro-worker'))
+
+        run_claimed_bulk_upload(tomada, 'worker-test')
+
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.estado, 'COMPLETADO')
+        self.assertEqual(bulk_upload.filas_ok, 1)
+
+    def test_reencola_cargas_abandonadas(self):
+        """Debería reencolar cargas sin heartbeat y marcar ERROR al agotar intentos"""
+        from datetime import timedelta
+        from .jobs import requeue_stale_bulk_uploads
+
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        abandonada = self._crear_carga(self.HEADER)
+        agotada = self._crear_carga(self.HEADER)
+        activa = self._crear_carga(self.HEADER)
+        BulkUpload.objects.filter(pk=abandonada.pk).update(
+            estado='PROCESANDO', heartbeat_en=hace_una_hora, worker='w1', intentos=1
+        )
+        BulkUpload.objects.filter(pk=agotada.pk).update(
+            estado='PROCESANDO', heartbeat_en=hace_una_hora, worker='w2', intentos=3
+        )
+        BulkUpload.objects.filter(pk=activa.pk).update(
+            estado='PROCESANDO', heartbeat_en=timezone.now(), worker='w3', intentos=1
+        )
+
+        reencoladas, fallidas = requeue_stale_bulk_uploads(timeout=300, max_attempts=3)
+
+        self.assertEqual((reencoladas, fallidas), (1, 1))
+        estados = dict(BulkUpload.objects.values_list('pk', 'estado'))
+        self.assertEqual(estados[abandonada.pk], 'EN_COLA')
+        self.assertEqual(estados[agotada.pk], 'ERROR')
+        self.assertEqual(estados[activa.pk], 'PROCESANDO')
+
+    def test_no_reencola_cargas_sin_worker(self):
+        """Debería dejar en PROCESANDO una carga sin worker aunque haya empezado hace mucho"""
+        from datetime import timedelta
+        from .jobs import requeue_stale_bulk_uploads
+
+        hace_400_segundos = timezone.now() - timedelta(seconds=400)
+        carga = self._crear_carga(self.HEADER)
+        BulkUpload.objects.filter(pk=carga.pk).update(estado='PROCESANDO', fecha_inicio=hace_400_segundos)
+
+        self.assertEqual(requeue_stale_bulk_uploads(timeout=300), (0, 0))
+        carga.refresh_from_db()
+        self.assertEqual(carga.estado, 'PROCESANDO')
+
+    def test_comando_process_uploads_toma_la_carga_con_heartbeat(self):
+        """Debería tomar la carga con worker y heartbeat para que no se reencole mientras se procesa"""
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from . import jobs
+
+        carga = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n')
+        vistas = []
+        send_heartbeat = jobs.send_heartbeat
+
+        def registrar(bulk_upload, worker_id):
+            vistas.append(BulkUpload.objects.values_list('estado', 'worker').get(pk=bulk_upload.pk))
+            return send_heartbeat(bulk_upload, worker_id)
+
+        with mock.patch.object(jobs, 'send_heartbeat', side_effect=registrar):
+            call_command('process_uploads', '--id', str(carga.id), stdout=StringIO())
+
+        self.assertTrue(vistas)
+        self.assertEqual(vistas[0], ('PROCESANDO', jobs.get_worker_id()))
+        carga.refresh_from_db()
+        self.assertEqual((carga.estado, carga.intentos), ('COMPLETADO', 1))
+        self.assertIsNotNone(carga.heartbeat_en)
+
+    def test_worker_aborta_si_pierde_la_carga(self):
+        """Debería abortar sin sobrescribir el estado si la carga fue reencolada"""
+        from .jobs import BulkUploadJobLost, claim_next_bulk_upload, enqueue_bulk_upload, run_claimed_bulk_upload
+
+        enqueue_bulk_upload(self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n'))
+        tomada = claim_next_bulk_upload('worker-test')
+        BulkUpload.objects.filter(pk=tomada.pk).update(estado='EN_COLA', worker='')
+
+        with self.assertRaises(BulkUploadJobLost):
+            run_claimed_bulk_upload(tomada, 'worker-test')
+
+        tomada.refresh_from_db()
+        self.assertEqual(tomada.estado, 'EN_COLA')
+        self.assertEqual(TaxRating.objects.count(), 0)
+
+    def test_lote_se_revierte_si_la_carga_cambia_de_worker(self):
+        """Debería revertir el lote en curso, sin esperar al heartbeat, si otro worker tomó la carga"""
+        from .jobs import BulkUploadJobLost, claim_bulk_upload
+        from .utils import process_bulk_upload_file
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 5)
+        )
+        tomada = claim_bulk_upload(self._crear_carga(contenido).pk, 'worker-viejo')
+
+        def reencolar(progreso):
+            # Otro worker toma la carga después del primer lote
+            BulkUpload.objects.filter(pk=tomada.pk).update(worker='worker-nuevo')
+
+        with self.assertRaises(BulkUploadJobLost):
+            process_bulk_upload_file(tomada, chunk_size=2, on_progress=reencolar)
+
+        tomada.refresh_from_db()
+        self.assertEqual(tomada.ultima_fila_confirmada, 3)
+        self.assertEqual(TaxRating.objects.count(), 2)
+        self.assertEqual(list(tomada.items.values_list('numero_fila', flat=True)), [2, 3])
+
+    def test_comando_worker_once_vacia_la_cola(self):
+        """Debería procesar todas las cargas en cola y terminar con --once"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .jobs import enqueue_bulk_upload
+
+        enqueue_bulk_upload(self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01|2025-01-31|||\n'))
+        enqueue_bulk_upload(self._crear_carga(self.HEADER + 'ABC|BOND001|AA|2025-02-01||||\n'))
+
+        call_command('bulk_upload_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(BulkUpload.objects.filter(estado='COMPLETADO').count(), 2)
+        self.assertEqual(TaxRating.objects.count(), 2)
+
+
+    def test_reanuda_desde_el_checkpoint_sin_duplicar(self):
+        """Debería retomar una carga interrumpida después de la última fila confirmada"""
+        from .jobs import run_bulk_upload
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 6)
+        )
+        contenido += 'NOEXISTE|BOND001|AAA|2025-02-01||||\n'
+        bulk_upload = self._crear_carga(contenido)
+
+        def interrumpir(progreso):
+            raise RuntimeError('worker detenido')
+
+        with self.assertRaises(RuntimeError):
+            run_bulk_upload(bulk_upload, chunk_size=2, on_progress=interrumpir)
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.ultima_fila_confirmada, 3)
+        self.assertEqual(bulk_upload.items.count(), 2)
+
+        resultado = run_bulk_upload(bulk_upload, chunk_size=2)
+
+        self.assertEqual((resultado['total_filas'], resultado['filas_ok'], resultado['filas_error']), (6, 5, 1))
+        self.assertEqual(list(resultado['resumen_errores']), [7])
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', flat=True)),
+            list(range(2, 8))
+        )
+        self.assertEqual(TaxRating.objects.count(), 5)
+
+
+class BulkUploadDryRunTests(BulkUploadFileTestCase):
+    """Tests para la validación en seco de cargas masivas"""
+
+    CONTENIDO = (
+        BulkUploadFileTestCase.HEADER
+        + 'ABC|BOND001|AAA|2025-01-01||||\n'
+        + 'NOEXISTE|BOND001|AA|2025-01-02||||\n'
+        + 'ABC|BOND001|A|2025-01-01||||\n'
+    )
+
+    def setUp(self):
+        from django.core.cache import caches
+
+        super().setUp()
+        caches['bulk_uploads'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_validar_no_escribe_y_retorna_errores(self):
+        """Debería retornar los conteos y errores por fila sin crear calificaciones ni items"""
+        bulk_upload = self._crear_carga(self.CONTENIDO)
+
+        response = self.client.post(f'/api/v1/bulk-uploads/{bulk_upload.id}/validar/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['total_filas'], response.data['filas_ok']), (3, 1))
+        self.assertEqual(sorted(response.data['resumen_errores']), [3, 4])
+        self.assertIn('Ya existe una calificación', response.data['resumen_errores'][4])
+        self.assertEqual(TaxRating.objects.count(), 0)
+        self.assertEqual(bulk_upload.items.count(), 0)
+
+    def test_procesar_reutiliza_el_plan_validado(self):
+        """Debería releer el archivo y tomar los errores del plan en caché sin validar las filas otra vez"""
+        from unittest.mock import patch
+        from .plans import _plan_key, dry_run_bulk_upload, get_plan_cache
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(self.CONTENIDO)
+        resumen = dry_run_bulk_upload(bulk_upload)
+
+        # La caché guarda solo los errores de validación por fila, no las filas
+        plan = get_plan_cache().get(_plan_key(resumen['sha256']))
+        self.assertEqual(plan, {'total_filas': 3, 'errores': {3: ["Issuer con código 'NOEXISTE' no existe"]}})
+
+        with patch('calificacionfiscal.utils.validate_tax_rating_batch') as validar:
+            resultado = process_bulk_upload_file(bulk_upload)
+
+        validar.assert_not_called()
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (1, 2))
+        self.assertEqual(TaxRating.objects.count(), 1)
+
+    def test_procesar_ignora_el_plan_si_el_archivo_cambio(self):
+        """Debería volver a parsear si el contenido del archivo ya no coincide con el plan"""
+        from django.core.files.base import ContentFile
+        from .plans import dry_run_bulk_upload
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(self.CONTENIDO)
+        dry_run_bulk_upload(bulk_upload)
+        bulk_upload.archivo.save('carga.txt', ContentFile(
+            (self.HEADER + 'ABC|BOND001|BBB|2025-03-01||||\n').encode('utf-8')
+        ))
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual((resultado['total_filas'], resultado['filas_ok']), (1, 1))
+        self.assertEqual(TaxRating.objects.get().rating, 'BBB')
+
+
+class BulkUploadOverlapTests(BulkUploadFileTestCase):
+    """Tests para la detección de claves repetidas y solapamientos de vigencia en cargas masivas"""
+
+    def test_intervalos_usan_la_regla_del_serializer(self):
+        """Debería solaparse con rangos cerrados que se tocan y con rangos abiertos, salvo el excluido"""
+        from datetime import date
+        from .intervals import ValidityIntervals
+
+        intervalos = ValidityIntervals([
+            (date(2025, 3, 1), None),
+            (date(2025, 1, 1), date(2025, 1, 31)),
+        ])
+
+        self.assertTrue(intervalos.overlaps(date(2025, 1, 31), date(2025, 2, 15)))
+        self.assertFalse(intervalos.overlaps(date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertTrue(intervalos.overlaps(date(2025, 2, 1), date(2025, 3, 1)))
+        self.assertTrue(intervalos.overlaps(date(2025, 2, 1)))
+        self.assertTrue(intervalos.overlaps(date(2026, 1, 1), date(2026, 2, 1)))
+        self.assertTrue(intervalos.overlaps(date(2025, 1, 1), date(2025, 1, 15)))
+        self.assertFalse(intervalos.overlaps(date(2025, 1, 1), date(2025, 1, 15), excluir_inicio=True))
+
+        intervalos.discard(date(2025, 3, 1))
+        self.assertFalse(intervalos.overlaps(date(2026, 1, 1), date(2026, 2, 1)))
+        intervalos.add(date(2025, 2, 1), date(2025, 2, 28))
+        self.assertTrue(intervalos.overlaps(date(2025, 2, 15), date(2025, 3, 15)))
+        self.assertFalse(intervalos.overlaps(date(2025, 3, 1)))
+
+    def test_procesamiento_rechaza_duplicados_entre_lotes_antes_de_insertar(self):
+        """Debería marcar la clave repetida en otro lote sin llegar a la restricción única"""
+        from unittest.mock import patch
+        from . import utils
+
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|AAA|2025-01-01|2025-01-31|||\n'
+            + 'ABC|BOND001|AA|2025-02-01|2025-02-28|||\n'
+            + 'ABC|BOND001|A|2025-01-01|2025-01-31|||\n'
+        )
+
+        with patch('calificacionfiscal.utils._insert_tax_ratings', wraps=utils._insert_tax_ratings) as insertar:
+            resultado = utils.process_bulk_upload_file(bulk_upload, chunk_size=1)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (2, 1))
+        self.assertIn('Ya existe una calificación', resultado['resumen_errores'][4])
+        self.assertEqual(insertar.call_args_list[-1].args[0], [])
+        self.assertEqual(TaxRating.objects.count(), 2)
+
+    def test_procesamiento_rechaza_solapamientos_con_vigentes(self):
+        """Debería marcar las filas que se solapan con una calificación VIGENTE e ignorar las vencidas"""
+        from .utils import process_bulk_upload_file
+
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='A',
+            valid_from='2025-01-01', valid_to='2025-06-30', analista=self.user
+        )
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='B',
+            valid_from='2024-01-01', status='VENCIDO', analista=self.user
+        )
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|AAA|2025-06-01|2025-12-31|||\n'
+            + 'ABC|BOND001|AA|2025-07-01||||\n'
+            + 'ABC|BOND001|BB|2024-06-01|2024-12-31|||\n'
+        )
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual(list(resultado['resumen_errores']), [2])
+        self.assertIn('en el rango de fechas especificado', resultado['resumen_errores'][2])
+        self.assertEqual(resultado['filas_ok'], 2)
+
+    def test_procesamiento_rechaza_solapamientos_entre_filas_del_archivo(self):
+        """Debería comparar cada fila con las filas VIGENTE anteriores del archivo, aunque estén en otro lote"""
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|BB|2022-06-01||VENCIDO||\n'
+            + 'ABC|BOND001|AAA|2024-01-01||||\n'
+            + 'ABC|BOND001|AA|2024-06-01||||\n'
+            + 'ABC|BOND001|A|2023-01-01|2023-12-31|||\n'
+        )
+
+        resultado = process_bulk_upload_file(bulk_upload, chunk_size=1)
+
+        self.assertEqual(list(resultado['resumen_errores']), [4])
+        self.assertIn('en el rango de fechas especificado', resultado['resumen_errores'][4])
+        self.assertEqual(resultado['filas_ok'], 3)
+
+    def test_procesamiento_considera_vigentes_creadas_despues_de_subir(self):
+        """Debería detectar el solapamiento con una calificación creada entre la subida y el procesamiento"""
+        from .utils import process_bulk_upload_file
+
+        bulk_upload = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-03-01|2025-03-31|||\n')
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='A',
+            valid_from='2025-01-01', analista=self.user
+        )
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (0, 1))
+        self.assertIn('en el rango de fechas especificado', resultado['resumen_errores'][2])
+
+    def test_validar_reporta_solapamientos(self):
+        """Debería informar en el dry-run los mismos solapamientos que el procesamiento"""
+        from .plans import dry_run_bulk_upload
+
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='A',
+            valid_from='2025-01-01', analista=self.user
+        )
+        bulk_upload = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-03-01|2025-03-31|||\n')
+
+        resultado = dry_run_bulk_upload(bulk_upload)
+
+        self.assertEqual((resultado['filas_nuevas'], resultado['filas_error']), (0, 1))
+        self.assertIn('en el rango de fechas especificado', resultado['resumen_errores'][2])
+
+
+class BulkUploadDeduplicationTests(BulkUploadFileTestCase):
+    """Tests para la detección de archivos subidos más de una vez"""
+
+    def _subir(self, contenido, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile('carga.txt', contenido.encode('utf-8'), content_type='text/plain')
+        return self.client.post('/api/v1/bulk-uploads/', {'archivo': archivo, **extra}, format='multipart')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_archivo_repetido_retorna_la_carga_existente(self):
+        """Debería guardar el SHA-256 y no crear otra carga para el mismo contenido"""
+        import hashlib
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n'
+        primera = self._subir(contenido)
+        segunda = self._subir(contenido)
+
+        self.assertEqual(primera.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            primera.data['contenido_sha256'], hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+        )
+        self.assertEqual(segunda.status_code, status.HTTP_200_OK)
+        self.assertTrue(segunda.data['duplicado'])
+        self.assertEqual(segunda.data['id'], primera.data['id'])
+        self.assertEqual(BulkUpload.objects.count(), 1)
+
+    def test_forzar_o_carga_rechazada_crean_una_nueva(self):
+        """Debería crear una carga nueva si se fuerza o si la anterior fue rechazada"""
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n'
+        primera = self._subir(contenido)
+
+        self.assertEqual(self._subir(contenido, forzar='true').status_code, status.HTTP_201_CREATED)
+        BulkUpload.objects.update(estado='RECHAZADO')
+        self.assertEqual(self._subir(contenido).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._subir(contenido, modo='UPSERT').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(BulkUpload.objects.count(), 4)
+        self.assertNotEqual(BulkUpload.objects.latest('id').id, primera.data['id'])
+
+
+class BulkUploadValidationTests(BulkUploadFileTestCase):
+    """Tests para la validación del archivo al subirlo"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _subir(self, contenido):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile('carga.txt', contenido, content_type='text/plain')
+        return self.client.post('/api/v1/bulk-uploads/', {'archivo': archivo}, format='multipart')
+
+    def test_subida_guarda_el_resultado_sin_volver_a_parsear(self):
+        """Debería guardar total_filas y columnas del escaneo sin parsear el archivo otra vez"""
+        from unittest.mock import patch
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n' + 'ABC|BOND001|AA|2025-02-01||||\n'
+
+        with patch('calificacionfiscal.utils.iter_utf8_file') as parser:
+            response = self._subir(contenido.encode('utf-8'))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        parser.assert_not_called()
+        bulk_upload = BulkUpload.objects.get(pk=response.data['id'])
+        self.assertEqual(bulk_upload.total_filas, 2)
+        self.assertEqual(bulk_upload.columnas, self.HEADER.strip().split('|'))
+
+    def test_subida_rechaza_delimitador_header_o_codificacion_invalidos(self):
+        """Debería responder 400 sin crear la carga si el archivo no cumple el formato"""
+        invalidos = [
+            b'issuer_codigo,instrument_codigo,rating,valid_from\nABC,BOND001,AAA,2025-01-01\n',
+            b'issuer_codigo|rating|valid_from\nABC|AAA|2025-01-01\n',
+            (self.HEADER + 'ABC|BOND001|AAA|2025-01-01|||BAJO|Calificación\n').encode('latin-1'),
+        ]
+        for contenido in invalidos:
+            response = self._subir(contenido)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('archivo', response.data)
+
+        self.assertEqual(BulkUpload.objects.count(), 0)
+
+
+class BulkUploadRowSchemaTests(TestCase):
+    """Tests para el esquema compilado de filas de carga masiva"""
+
+    COLUMNAS = ['issuer_codigo', 'instrument_codigo', 'rating', 'valid_from', 'valid_to', 'comments']
+
+    def test_parse_iso_date_acepta_lo_mismo_que_strptime(self):
+        """Debería aceptar y rechazar las mismas fechas que strptime('%Y-%m-%d')"""
+        from datetime import datetime
+        from .row_schema import parse_iso_date
+
+        for valor in ['2025-01-31', '2025-1-5', '2024-02-29', '2025-02-29', '2025-13-01',
+                      '2025/01/01', '25-01-01', '2025-01-001', '2025-01', '', 'fecha']:
+            try:
+                esperado = datetime.strptime(valor, '%Y-%m-%d').date()
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    parse_iso_date(valor)
+            else:
+                self.assertEqual(parse_iso_date(valor), esperado)
+
+    def test_valida_con_los_choices_del_modelo_y_columnas_ausentes(self):
+        """Debería usar los choices de TaxRating y leer como vacías las columnas que el archivo no trae"""
+        from .row_schema import RowSchema
+
+        schema = RowSchema(self.COLUMNAS)
+        self.assertEqual(schema.ratings, tuple(valor for valor, _ in TaxRating.RATING_CHOICES))
+
+        fila = dict(zip(self.COLUMNAS, ['ABC', 'BOND001', 'ZZZ', '2025-02-01', '2025-01-01', '']))
+        self.assertEqual(schema.validate(fila), [
+            f"Rating 'ZZZ' no es válido. Opciones: {', '.join(schema.ratings)}",
+            "'valid_to' debe ser posterior a 'valid_from'",
+        ])
+        fila = dict(zip(self.COLUMNAS, ['', 'BOND001', 'AAA', '', '', '']))
+        self.assertEqual(schema.validate(fila), [
+            "Campo requerido 'issuer_codigo' faltante o vacío",
+            "Campo requerido 'valid_from' faltante o vacío",
+        ])
+
+    def test_memoriza_las_fechas_repetidas(self):
+        """Debería parsear una sola vez cada fecha distinta"""
+        from unittest.mock import patch
+        from .row_schema import RowSchema, parse_iso_date
+
+        schema = RowSchema(self.COLUMNAS)
+        filas = [
+            dict(zip(self.COLUMNAS, ['ABC', 'BOND001', 'AAA', '2025-01-01', '2025-12-31', '']))
+            for _ in range(50)
+        ]
+        with patch('calificacionfiscal.row_schema.parse_iso_date', side_effect=parse_iso_date) as parser:
+            self.assertTrue(all(schema.validate(fila) == [] for fila in filas))
+
+        self.assertEqual(parser.call_count, 2)
+
+
+class BulkUploadCompressionTests(BulkUploadFileTestCase):
+    """Tests para cargas comprimidas con gzip o zstd"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.contenido = (
+            self.HEADER + 'ABC|BOND001|AAA|2025-01-01|2025-01-31|||\n' + 'ABC|BOND001|AA|2025-02-01||||\n'
+        ).encode('utf-8')
+
+    def _subir(self, nombre, contenido):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile(nombre, contenido, content_type='application/octet-stream')
+        return self.client.post('/api/v1/bulk-uploads/', {'archivo': archivo}, format='multipart')
+
+    def test_carga_gzip_se_guarda_comprimida_y_se_procesa(self):
+        """Debería guardar el .gz tal cual, validarlo descomprimido y procesar sus filas"""
+        import gzip
+        import hashlib
+        from .utils import process_bulk_upload_file
+
+        comprimido = gzip.compress(self.contenido)
+        response = self._subir('carga.txt.gz', comprimido)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        bulk_upload = BulkUpload.objects.get(pk=response.data['id'])
+        self.assertTrue(bulk_upload.archivo.name.endswith('.gz'))
+        with bulk_upload.archivo.open('rb') as guardado:
+            self.assertEqual(guardado.read(), comprimido)
+        self.assertEqual(bulk_upload.total_filas, 2)
+        self.assertEqual(bulk_upload.contenido_sha256, hashlib.sha256(self.contenido).hexdigest())
+
+        resultado = process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual(resultado['filas_ok'], 2)
+        self.assertEqual(TaxRating.objects.count(), 2)
+
+    def test_carga_gzip_danada_o_muy_grande_se_rechaza(self):
+        """Debería responder 400 si el .gz está dañado o su contenido supera el máximo"""
+        import gzip
+        from django.test import override_settings
+
+        danado = gzip.compress(self.contenido)[:-12]
+        self.assertEqual(self._subir('carga.tsv.gz', danado).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(BULK_UPLOAD_MAX_UNCOMPRESSED_SIZE=64):
+            response = self._subir('carga.txt.gz', gzip.compress(self.contenido))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(BulkUpload.objects.count(), 0)
+
+    def test_carga_zstd(self):
+        """Debería aceptar .zst si zstandard está instalado y rechazarlo con un mensaje si no"""
+        try:
+            import zstandard
+        except ImportError:
+            response = self._subir('carga.tsv.zst', b'(zstd)')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('zstandard', str(response.data['archivo']))
+            return
+
+        response = self._subir('carga.tsv.zst', zstandard.ZstdCompressor().compress(self.contenido))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_filas'], 2)
+
+    def test_carga_zstd_con_varios_frames(self):
+        """Debería leer todos los frames de un .zst concatenado, no solo el primero"""
+        from .utils import process_bulk_upload_file
+
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest('zstandard no está instalado')
+
+        primera, segunda = self.contenido.splitlines(keepends=True)[1:]
+        compresor = zstandard.ZstdCompressor()
+        comprimido = compresor.compress(self.HEADER.encode('utf-8') + primera) + compresor.compress(segunda)
+        response = self._subir('carga.txt.zst', comprimido)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_filas'], 2)
+        resultado = process_bulk_upload_file(BulkUpload.objects.get(pk=response.data['id']))
+        self.assertEqual((resultado['total_filas'], resultado['filas_ok']), (2, 2))
+
+
+class BulkUploadSessionTests(BulkUploadFileTestCase):
+    """Tests para la subida por partes (reanudable)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        filas = ''.join(f'ABC|BOND001|AAA|2025-01-{dia:02d}||||Fila {dia}\n' for dia in range(1, 29)) * 2
+        self.contenido = (self.HEADER + filas).encode('utf-8')
+        self.partes = [self.contenido[i:i + 1024] for i in range(0, len(self.contenido), 1024)]
+
+    def _abrir(self, **extra):
+        import hashlib
+
+        data = {
+            'nombre_archivo': 'carga.txt',
+            'tamano_total': len(self.contenido),
+            'tamano_parte': 1024,
+            'sha256': hashlib.sha256(self.contenido).hexdigest(),
+            **extra,
+        }
+        response = self.client.post('/api/v1/bulk-upload-sessions/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def _enviar(self, sesion_id, numero, contenido, checksum=None):
+        import hashlib
+
+        checksum = checksum or hashlib.sha256(contenido).hexdigest()
+        return self.client.put(
+            f'/api/v1/bulk-upload-sessions/{sesion_id}/partes/{numero}/', contenido,
+            content_type='application/octet-stream', HTTP_X_CONTENT_SHA256=checksum,
+        )
+
+    def test_partes_en_desorden_se_arman_y_crean_la_carga(self):
+        """Debería armar las partes en disco, validar headers con la primera y crear la carga al finalizar"""
+        import os
+        from .chunked import get_partial_path
+        from .models import BulkUploadSession
+
+        sesion_id = self._abrir()
+        self.assertEqual(len(self.partes), 3)
+
+        respuesta = self._enviar(sesion_id, 2, self.partes[2])
+        self.assertEqual(respuesta.data['bytes_contiguos'], 0)
+        respuesta = self._enviar(sesion_id, 0, self.partes[0])
+        self.assertEqual(respuesta.data['columnas'], self.HEADER.strip().split('|'))
+        self.assertEqual(respuesta.data['partes_recibidas'], [0, 2])
+        self.assertEqual(self._enviar(sesion_id, 1, self.partes[1]).status_code, status.HTTP_200_OK)
+
+        ruta = get_partial_path(BulkUploadSession.objects.get(pk=sesion_id))
+        response = self.client.post(f'/api/v1/bulk-upload-sessions/{sesion_id}/finalizar/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        bulk_upload = BulkUpload.objects.get(pk=response.data['id'])
+        self.assertEqual(bulk_upload.total_filas, 56)
+        with bulk_upload.archivo.open('rb') as guardado:
+            self.assertEqual(guardado.read(), self.contenido)
+        self.assertFalse(os.path.exists(ruta))
+        sesion = BulkUploadSession.objects.get(pk=sesion_id)
+        self.assertEqual((sesion.estado, sesion.bulk_upload_id), ('FINALIZADA', bulk_upload.id))
+
+    def test_partes_invalidas_se_rechazan_y_se_pueden_reenviar(self):
+        """Debería rechazar partes con checksum o largo incorrecto y no finalizar con partes faltantes"""
+        sesion_id = self._abrir()
+
+        self.assertEqual(
+            self._enviar(sesion_id, 0, self.partes[0], checksum='0' * 64).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(self._enviar(sesion_id, 1, self.partes[1][:-1]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._enviar(sesion_id, 3, b'x').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self._enviar(sesion_id, 0, self.partes[0])
+        response = self.client.post(f'/api/v1/bulk-upload-sessions/{sesion_id}/finalizar/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Faltan 2 partes', response.data['error'])
+
+        estado = self.client.get(f'/api/v1/bulk-upload-sessions/{sesion_id}/')
+        self.assertEqual(estado.data['partes_recibidas'], [0])
+        self.assertEqual(BulkUpload.objects.count(), 0)
+
+    def test_reenvio_fallido_deja_la_parte_como_faltante(self):
+        """Debería quitar una parte ya recibida si su reenvío sobrescribe los bytes y falla la verificación"""
+        sesion_id = self._abrir(sha256='')
+        for numero, parte in enumerate(self.partes):
+            self._enviar(sesion_id, numero, parte)
+
+        corrupta = b'X' * len(self.partes[1])
+        self.assertEqual(
+            self._enviar(sesion_id, 1, corrupta, checksum='0' * 64).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+        estado = self.client.get(f'/api/v1/bulk-upload-sessions/{sesion_id}/')
+        self.assertEqual(estado.data['partes_recibidas'], [0, 2])
+        response = self.client.post(f'/api/v1/bulk-upload-sessions/{sesion_id}/finalizar/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Faltan 1 partes', response.data['error'])
+
+        self._enviar(sesion_id, 1, self.partes[1])
+        response = self.client.post(f'/api/v1/bulk-upload-sessions/{sesion_id}/finalizar/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_header_invalido_se_informa_con_la_primera_parte(self):
+        """Debería informar el error de headers sin esperar el resto del archivo"""
+        self.contenido = b'issuer_codigo|rating\n' + b'ABC|AAA\n' * 200
+        self.partes = [self.contenido[i:i + 1024] for i in range(0, len(self.contenido), 1024)]
+        sesion_id = self._abrir()
+
+        response = self._enviar(sesion_id, 0, self.partes[0])
+
+        self.assertIn('instrument_codigo', response.data['error_encabezado'])
+        self.assertEqual(self.client.delete(f'/api/v1/bulk-upload-sessions/{sesion_id}/').status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._enviar(sesion_id, 1, self.partes[1]).status_code, status.HTTP_400_BAD_REQUEST)
+
+class BulkUploadPipelineTests(BulkUploadFileTestCase):
+    """Tests para la ingesta en etapas concurrentes (parseo, validación, escritura)"""
+
+    def _hilos_de_carga(self):
+        import threading
+
+        return [hilo for hilo in threading.enumerate() if hilo.name.startswith('bulk-upload-')]
+
+    def test_procesamiento_reporta_tiempos_por_etapa(self):
+        """Debería procesar los lotes en orden y guardar los segundos de cada etapa en la carga"""
+        from .jobs import run_bulk_upload
+
+        filas = ''.join(f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 29))
+        bulk_upload = self._crear_carga(self.HEADER + filas + 'XYZ|BOND001|AAA|2025-02-01||||\n')
+
+        resultado = run_bulk_upload(bulk_upload, chunk_size=5)
+
+        self.assertEqual((resultado['filas_ok'], resultado['filas_error']), (28, 1))
+        self.assertIn("Issuer con código 'XYZ' no existe", resultado['resumen_errores'][30])
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', flat=True)), list(range(2, 31))
+        )
+        bulk_upload.refresh_from_db()
+        self.assertEqual(
+            set(bulk_upload.tiempos_etapas),
+            {'parseo', 'validacion', 'escritura', 'espera_escritura', 'logging', 'total'},
+        )
+        self.assertTrue(all(segundos >= 0 for segundos in bulk_upload.tiempos_etapas.values()))
+        self.assertEqual(self._hilos_de_carga(), [])
+
+    def test_errores_de_una_etapa_detienen_el_pipeline(self):
+        """Debería propagar errores del parseo o de la escritura y terminar los hilos"""
+        from django.core.exceptions import ValidationError
+        from django.core.files.base import ContentFile
+        from .utils import process_bulk_upload_file
+
+        filas = 'ABC|BOND001|AAA|2025-01-01||||\n' * 50
+        no_utf8 = BulkUpload(usuario=self.user, tipo='UTF8')
+        no_utf8.archivo.save('no_utf8.txt', ContentFile((self.HEADER + filas).encode('utf-8') + 'ñ\n'.encode('latin-1')))
+        with self.assertRaises(ValidationError):
+            process_bulk_upload_file(no_utf8, chunk_size=5)
+        self.assertEqual(self._hilos_de_carga(), [])
+
+        def falla(_progreso):
+            raise RuntimeError('escritura interrumpida')
+
+        bulk_upload = self._crear_carga(self.HEADER + filas)
+        with self.assertRaisesMessage(RuntimeError, 'escritura interrumpida'):
+            process_bulk_upload_file(bulk_upload, chunk_size=1, on_progress=falla)
+        self.assertEqual(self._hilos_de_carga(), [])
+
+class BulkUploadLoggingTests(BulkUploadFileTestCase):
+    """Tests para el logging muestreado y limitado de la ingesta"""
+
+    def test_advertencias_por_fila_limitadas_y_resumen_por_lote(self):
+        """Debería limitar las advertencias de filas, resumir por lote y no loguear cada fila en INFO"""
+        from django.test import override_settings
+        from .utils import process_bulk_upload_file
+
+        filas = ''.join(f'ABC|BOND001|ZZZ|2025-01-{dia:02d}||||\n' for dia in range(1, 11))
+        bulk_upload = self._crear_carga(self.HEADER + filas)
+
+        with override_settings(BULK_UPLOAD_LOG_MAX_WARNINGS=2):
+            with self.assertLogs('calificacionfiscal.utils', level='INFO') as logs:
+                resultado = process_bulk_upload_file(bulk_upload, chunk_size=10)
+
+        self.assertEqual(resultado['filas_error'], 10)
+        self.assertEqual(sum('falló validación' in linea for linea in logs.output), 2)
+        self.assertFalse(any('Procesando fila' in linea for linea in logs.output))
+        self.assertTrue(any('8 advertencias de filas omitidas' in linea for linea in logs.output))
+        self.assertIn('logging', resultado['tiempos'])
+
+    def test_detalle_por_fila_muestreado_y_perezoso(self):
+        """Debería formatear el detalle de fila solo para la muestra y solo con DEBUG habilitado"""
+        import logging
+        from .ingest_log import IngestLogger
+
+        class Fila:
+            formateos = 0
+
+            def __str__(self):
+                Fila.formateos += 1
+                return 'fila'
+
+        logger = logging.getLogger('calificacionfiscal.tests.ingesta')
+        logger.setLevel(logging.INFO)
+        sin_debug = IngestLogger(logger, sample_every=3)
+        for numero in range(2, 11):
+            sin_debug.row(numero, Fila())
+        self.assertEqual(Fila.formateos, 0)
+
+        with self.assertLogs(logger, level='DEBUG') as logs:
+            con_debug = IngestLogger(logger, sample_every=3)
+            for numero in range(2, 11):
+                con_debug.row(numero, Fila())
+
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(Fila.formateos, 3)
+        self.assertGreater(con_debug.segundos, 0)
+
+class BulkUploadProgressTests(BulkUploadFileTestCase):
+    """Tests para el reporte de avance de cargas en proceso"""
+
+    def test_progress_reporter_publica_cada_n_filas(self):
+        """Debería escribir el avance solo al cruzar cada bloque de N filas"""
+        from .jobs import ProgressReporter
+
+        bulk_upload = self._crear_carga(self.HEADER)
+        reporter = ProgressReporter(bulk_upload, every=100)
+
+        reporter({'total_filas': 60, 'filas_ok': 50, 'filas_error': 10})
+        bulk_upload.refresh_from_db()
+        self.assertIsNone(bulk_upload.progreso_en)
+
+        reporter({'total_filas': 120, 'filas_ok': 100, 'filas_error': 20})
+        bulk_upload.refresh_from_db()
+        self.assertEqual((bulk_upload.filas_ok, bulk_upload.filas_error, bulk_upload.total_filas), (100, 20, 120))
+        self.assertIsNotNone(bulk_upload.progreso_en)
+        self.assertGreater(bulk_upload.filas_por_segundo, 0)
+
+    def test_progress_reporter_al_reanudar_cuenta_solo_las_filas_nuevas(self):
+        """Debería calcular filas/s sin las filas confirmadas por la ejecución anterior"""
+        from unittest.mock import patch
+        from .jobs import ProgressReporter
+        from .models import BulkUploadItem
+
+        bulk_upload = self._crear_carga(self.HEADER)
+        for numero_fila in (2, 3):
+            BulkUploadItem.objects.create(bulk_upload=bulk_upload, numero_fila=numero_fila, estado='OK', datos={})
+        bulk_upload.ultima_fila_confirmada = 3
+
+        with patch('calificacionfiscal.jobs.time.monotonic', side_effect=[100.0, 102.0]):
+            reporter = ProgressReporter(bulk_upload, every=1)
+            reporter({'total_filas': 6, 'filas_ok': 6, 'filas_error': 0})
+
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.filas_por_segundo, 2.0)
+
+    def test_finalizar_conserva_el_ultimo_avance_publicado(self):
+        """Debería guardar el resultado final sin pisar el rendimiento ni la hora del último reporte"""
+        from django.test import override_settings
+        from .jobs import run_bulk_upload
+
+        filas = ''.join(f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 11))
+        bulk_upload = self._crear_carga(self.HEADER + filas)
+
+        with override_settings(BULK_UPLOAD_PROGRESS_EVERY=5):
+            run_bulk_upload(bulk_upload, chunk_size=5)
+
+        bulk_upload.refresh_from_db()
+        self.assertEqual((bulk_upload.estado, bulk_upload.filas_ok), ('COMPLETADO', 10))
+        self.assertIsNotNone(bulk_upload.progreso_en)
+        self.assertGreater(bulk_upload.filas_por_segundo, 0)
+        self.assertEqual(bulk_upload.ultima_fila_confirmada, 11)
+
+    def test_endpoint_progreso_calcula_eta_sin_resumen_errores(self):
+        """Debería retornar porcentaje y ETA sin incluir el detalle de errores"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        bulk_upload = self._crear_carga(self.HEADER)
+        BulkUpload.objects.filter(pk=bulk_upload.pk).update(
+            estado='PROCESANDO', total_filas=1000, filas_ok=200, filas_error=50,
+            filas_por_segundo=50, resumen_errores={'2': 'error'}
+        )
+
+        response = client.get(f'/api/v1/bulk-uploads/{bulk_upload.id}/progreso/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('resumen_errores', response.data)
+        self.assertEqual(response.data['filas_procesadas'], 250)
+        self.assertEqual(response.data['porcentaje'], 25.0)
+        self.assertEqual(response.data['eta_segundos'], 15.0)
+
+        self.assertEqual(client.get('/api/v1/bulk-uploads/99999/progreso/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkUploadParallelTests(BulkUploadFileTestCase):
+    """Tests para el reparto de lotes de una carga entre procesos"""
+
+    class SerialExecutor:
+        """Executor que ejecuta cada tarea al enviarla (sustituye al pool en los tests)"""
+
+        def submit(self, fn, *args, **kwargs):
+            from concurrent.futures import Future
+
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+
+    def test_process_bulk_upload_parallel_combina_los_lotes(self):
+        """Debería sumar los resultados de todos los lotes y conservar el orden de filas"""
+        from .parallel import process_bulk_upload_parallel
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 11)
+        )
+        contenido += 'NOEXISTE|BOND001|AAA|2025-02-01||||\n'
+        bulk_upload = self._crear_carga(contenido)
+
+        resultado = process_bulk_upload_parallel(bulk_upload, self.SerialExecutor(), chunk_size=3, max_pending=2)
+
+        self.assertEqual(resultado['total_filas'], 11)
+        self.assertEqual(resultado['filas_ok'], 10)
+        self.assertEqual(list(resultado['resumen_errores']), [12])
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', flat=True)),
+            list(range(2, 13))
+        )
+
+    def test_process_bulk_upload_parallel_rechaza_solapamientos_entre_lotes(self):
+        """Debería rechazar la fila posterior aunque su lote se escriba antes que el anterior"""
+        from concurrent.futures import Future
+        from datetime import date
+        from .parallel import process_bulk_upload_parallel
+
+        class ReversedExecutor:
+            """Executor que ejecuta los lotes de a pares en orden inverso (simula lotes concurrentes)"""
+
+            def __init__(self):
+                self.encolados = []
+
+            def submit(self, fn, *args):
+                future = Future()
+                self.encolados.append((future, fn, args))
+                if len(self.encolados) == 2:
+                    for encolado, fn, args in reversed(self.encolados):
+                        encolado.set_result(fn(*args))
+                    self.encolados = []
+                return future
+
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|AAA|2024-01-01||||\n'
+            + 'ABC|BOND001|AA|2024-06-01||||\n'
+        )
+
+        resultado = process_bulk_upload_parallel(bulk_upload, ReversedExecutor(), chunk_size=1, max_pending=2)
+
+        self.assertEqual(list(resultado['resumen_errores']), [3])
+        self.assertIn('en el rango de fechas especificado', resultado['resumen_errores'][3])
+        self.assertEqual(resultado['filas_ok'], 1)
+        self.assertEqual(TaxRating.objects.get().valid_from, date(2024, 1, 1))
+
+    def test_process_bulk_upload_parallel_reutiliza_el_plan_validado(self):
+        """Debería tomar los errores del dry-run en caché sin validar las filas otra vez"""
+        from unittest.mock import patch
+        from .parallel import process_bulk_upload_parallel
+        from .plans import dry_run_bulk_upload
+
+        contenido = self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n' + 'NOEXISTE|BOND001|AA|2025-01-02||||\n'
+        bulk_upload = self._crear_carga(contenido)
+        dry_run_bulk_upload(bulk_upload)
+
+        with patch('calificacionfiscal.utils.validate_tax_rating_batch') as validar:
+            resultado = process_bulk_upload_parallel(bulk_upload, self.SerialExecutor(), chunk_size=1)
+
+        validar.assert_not_called()
+        self.assertEqual((resultado['filas_ok'], list(resultado['resumen_errores'])), (1, [3]))
+
+    def test_process_bulk_upload_parallel_reanuda_desde_el_checkpoint(self):
+        """Debería omitir las filas ya confirmadas y avanzar el checkpoint a medida que terminan los lotes"""
+        from .jobs import run_bulk_upload
+        from .parallel import process_bulk_upload_parallel
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 6)
+        )
+        contenido += 'NOEXISTE|BOND001|AAA|2025-02-01||||\n'
+        bulk_upload = self._crear_carga(contenido)
+
+        def interrumpir(progreso):
+            raise RuntimeError('worker detenido')
+
+        with self.assertRaises(RuntimeError):
+            run_bulk_upload(bulk_upload, chunk_size=2, on_progress=interrumpir)
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.ultima_fila_confirmada, 3)
+
+        resultado = process_bulk_upload_parallel(bulk_upload, self.SerialExecutor(), chunk_size=2, max_pending=2)
+
+        self.assertEqual((resultado['total_filas'], resultado['filas_ok'], resultado['filas_error']), (6, 5, 1))
+        self.assertEqual(
+            list(bulk_upload.items.values_list('numero_fila', flat=True)), list(range(2, 8))
+        )
+        self.assertEqual(TaxRating.objects.count(), 5)
+        bulk_upload.refresh_from_db()
+        self.assertEqual(bulk_upload.ultima_fila_confirmada, 7)
+
+    def test_reanudar_omite_lotes_confirmados_despues_del_checkpoint(self):
+        """Debería omitir las filas de un lote paralelo que terminó antes que los anteriores"""
+        from .parallel import ingest_chunk_task
+        from .utils import (
+            iter_utf8_file, plan_tax_rating_batch, process_bulk_upload_file, validate_tax_rating_batch,
+        )
+
+        contenido = self.HEADER + ''.join(
+            f'ABC|BOND001|AAA|2025-01-{dia:02d}||VENCIDO||\n' for dia in range(1, 7)
+        )
+        bulk_upload = self._crear_carga(contenido)
+        filas = list(iter_utf8_file(bulk_upload.archivo))
+        # El lote de las filas 4 y 5 se confirmó, pero el checkpoint no avanzó (faltaban las filas 2 y 3)
+        resultados, issuers, instruments = validate_tax_rating_batch(filas[2:4])
+        plan = plan_tax_rating_batch(bulk_upload, resultados, issuers, instruments)
+        ingest_chunk_task(bulk_upload.pk, '', resultados, plan)
+
+        resultado = process_bulk_upload_file(bulk_upload, chunk_size=2)
+
+        self.assertEqual((resultado['total_filas'], resultado['filas_ok'], resultado['filas_error']), (6, 6, 0))
+        self.assertEqual(
+            list(bulk_upload.items.order_by('numero_fila').values_list('numero_fila', flat=True)),
+            list(range(2, 8))
+        )
+        self.assertEqual(TaxRating.objects.count(), 6)
+
+    def test_process_upload_task_no_procesa_dos_veces(self):
+        """Debería ignorar cargas que ya no están PENDIENTE"""
+        from .parallel import process_upload_task
+
+        bulk_upload = self._crear_carga(self.HEADER + 'ABC|BOND001|AAA|2025-01-01||||\n')
+
+        _, resultado, error = process_upload_task(bulk_upload.id)
+        self.assertIsNone(error)
+        self.assertEqual(resultado['filas_ok'], 1)
+
+        self.assertEqual(process_upload_task(bulk_upload.id), (bulk_upload.id, None, None))
+        self.assertEqual(TaxRating.objects.count(), 1)
+
+
+class TaxRatingStatsTests(BulkUploadFileTestCase):
+    """Tests para las estadísticas materializadas de calificaciones"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.otro_issuer = Issuer.objects.create(codigo='XYZ', nombre='XYZ Corp', rut='22222222-2')
+
+    def _normalizadas(self, stats):
+        """Estadísticas con las listas ordenadas, para comparar sin depender del orden de los empates"""
+        return {
+            clave: sorted(valor, key=lambda fila: sorted(map(str, fila.values()))) if isinstance(valor, list) else valor
+            for clave, valor in stats.items()
+        }
+
+    def _assert_contadores_alineados(self):
+        from .reports import obtener_estadisticas
+
+        self.assertEqual(
+            self._normalizadas(obtener_estadisticas()),
+            self._normalizadas(obtener_estadisticas(TaxRating.objects.all())),
+        )
+
+    def test_contadores_siguen_altas_cambios_y_bajas(self):
+        """Debería mantener los contadores al crear, modificar y eliminar calificaciones"""
+        from .reports import obtener_estadisticas
+
+        primera = TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AAA', valid_from='2025-01-01'
+        )
+        segunda = TaxRating.objects.create(
+            issuer=self.otro_issuer, instrument=self.instrument, rating='AA', valid_from='2025-02-01',
+            status='VENCIDO', risk_level='BAJO'
+        )
+        self._assert_contadores_alineados()
+
+        primera.rating = 'BBB'
+        primera.status = 'SUSPENDIDO'
+        primera.save()
+        # Instancia que no se cargó desde la base de datos: los valores previos se leen al guardar
+        TaxRating(
+            pk=segunda.pk, issuer=self.issuer, instrument=self.instrument, rating='AA',
+            valid_from=segunda.valid_from, status='VENCIDO', risk_level='BAJO'
+        ).save(update_fields=['issuer'])
+        self._assert_contadores_alineados()
+
+        TaxRating.objects.get(pk=primera.pk).delete()
+        stats = obtener_estadisticas()
+        self._assert_contadores_alineados()
+        self.assertEqual(stats['total'], 1)
+        self.assertEqual(stats['vigentes'], 0)
+        self.assertEqual(stats['top_issuers'], [{'issuer__nombre': 'ABC Corp', 'count': 1}])
+
+    def test_carga_masiva_actualiza_contadores(self):
+        """Debería contar las filas insertadas y los cambios de una carga en modo UPSERT"""
+        from .utils import process_bulk_upload_file
+
+        TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AAA', valid_from='2025-01-01', status='VENCIDO'
+        )
+        bulk_upload = self._crear_carga(
+            self.HEADER
+            + 'ABC|BOND001|BBB|2025-01-01||VENCIDO||\n'
+            + 'XYZ|BOND001|A|2025-01-03||||\n'
+        )
+        bulk_upload.modo = 'UPSERT'
+        bulk_upload.save()
+
+        process_bulk_upload_file(bulk_upload)
+
+        self.assertEqual(TaxRating.objects.count(), 2)
+        self._assert_contadores_alineados()
+
+    def test_endpoints_sin_filtros_leen_contadores_y_comando_los_reconstruye(self):
+        """Debería responder con los contadores y recalcularlos con rebuild_tax_rating_stats"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import TaxRatingCounter
+
+        TaxRating.objects.create(issuer=self.issuer, instrument=self.instrument, rating='AAA', valid_from='2025-01-01')
+        TaxRatingCounter.objects.filter(dimension='total').update(total=99)
+
+        response = self.client.get('/api/v1/tax-ratings/estadisticas/')
+        self.assertEqual(response.data['total'], 99)
+        self.assertEqual(
+            set(response.data), {'total', 'por_rating', 'por_status', 'por_risk_level', 'vigentes'}
+        )
+        # Con filtros se agrega la tabla de calificaciones
+        response = self.client.get('/api/v1/reports/estadisticas/', {'issuer_id': self.issuer.pk})
+        self.assertEqual(response.data['total'], 1)
+
+        call_command('rebuild_tax_rating_stats', stdout=StringIO())
+
+        response = self.client.get('/api/v1/reports/estadisticas/')
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['por_rating'], [{'rating': 'AAA', 'count': 1}])
+        self.assertEqual(response.data['top_instruments'], [{'instrument__nombre': 'Corporate Bond', 'count': 1}])
+
+
+class CountGroupsTests(TestCase):
+    """Tests para los conteos agrupados en una pasada de las estadísticas"""
+
+    def setUp(self):
+        self.issuer = Issuer.objects.create(codigo='ABC', nombre='ABC Corp', rut='11111111-1')
+        self.otro_issuer = Issuer.objects.create(codigo='XYZ', nombre='XYZ Corp', rut='22222222-2')
+        self.instrument = Instrument.objects.create(codigo='BOND001', nombre='Corporate Bond', tipo='BONO')
+        for dia, (issuer, rating, status_rating) in enumerate([
+            (self.issuer, 'AAA', 'VIGENTE'),
+            (self.issuer, 'AAA', 'VENCIDO'),
+            (self.otro_issuer, 'BB', 'VIGENTE'),
+        ], start=1):
+            TaxRating.objects.create(
+                issuer=issuer, instrument=self.instrument, rating=rating,
+                valid_from=f'2025-01-0{dia}', status=status_rating
+            )
+
+    def test_estadisticas_filtradas_en_una_pasada(self):
+        """Debería calcular total, grupos con choices y rankings sin una consulta por conteo"""
+        from .reports import obtener_estadisticas
+
+        queryset = TaxRating.objects.filter(valid_from__gte='2025-01-01')
+        # Un aggregate para total y campos con choices, y una consulta por ranking
+        with self.assertNumQueries(3):
+            stats = obtener_estadisticas(queryset)
+
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['vigentes'], 2)
+        self.assertEqual(stats['por_rating'], [{'rating': 'AAA', 'count': 2}, {'rating': 'BB', 'count': 1}])
+        self.assertEqual(stats['por_risk_level'], [{'risk_level': 'MODERADO', 'count': 3}])
+        self.assertEqual(
+            stats['top_issuers'],
+            [{'issuer__nombre': 'ABC Corp', 'count': 2}, {'issuer__nombre': 'XYZ Corp', 'count': 1}]
+        )
+
+    def test_valores_fuera_de_choices_se_agrupan_igual(self):
+        """Debería agrupar la tabla si hay valores que no están en choices"""
+        from .aggregates import count_groups
+
+        TaxRating.objects.filter(rating='BB').update(rating='ZZ')
+
+        conteos = count_groups(TaxRating.objects.all(), {'por_rating': 'rating'})
+
+        self.assertEqual(conteos['total'], 3)
+        self.assertEqual(conteos['por_rating'], [{'rating': 'AAA', 'count': 2}, {'rating': 'ZZ', 'count': 1}])
+
+    def test_resumen_de_cargas_en_una_consulta(self):
+        """Debería contar las cargas del usuario por estado con un solo aggregate"""
+        user = User.objects.create_user(
+            username='resumidor', email='resumidor@example.com', password='resumen123', rol='ADMIN'
+        )
+        for estado in ('PENDIENTE', 'EN_COLA', 'COMPLETADO', 'COMPLETADO', 'ERROR'):
+            BulkUpload.objects.create(usuario=user, archivo='carga.txt', estado=estado)
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/v1/bulk-uploads/resumen/')
+
+        # en_cola es parte del contrato: las cargas encoladas no suman en ningún otro estado
+        self.assertEqual(response.data, {
+            'total_cargas': 5, 'pendientes': 1, 'en_cola': 1,
+            'procesando': 0, 'completadas': 2, 'con_error': 1,
+        })
+
+
+class TaxRatingConditionalTests(TestCase):
+    """Tests para las respuestas condicionales (ETag / Last-Modified) de calificaciones"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='consultor', email='consultor@example.com', password='consulta123', rol='ANALISTA'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.issuer = Issuer.objects.create(codigo='ABC', nombre='ABC Corp', rut='11111111-1')
+        self.instrument = Instrument.objects.create(codigo='BOND001', nombre='Corporate Bond', tipo='BONO')
+        self.tax_rating = TaxRating.objects.create(
+            issuer=self.issuer, instrument=self.instrument, rating='AAA', valid_from='2025-01-01'
+        )
+
+    def test_listado_responde_304_sin_serializar(self):
+        """Debería responder 304 con una sola consulta de versión por tabla si nada cambió"""
+        response = self.client.get('/api/v1/tax-ratings/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Una consulta con la versión de TaxRating, Issuer e Instrument; sin leer las filas
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/tax-ratings/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # Otra página u otros filtros tienen otro ETag
+        response = self.client.get('/api/v1/tax-ratings/', {'search': 'abc'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cambios_y_bajas_invalidan_el_etag(self):
+        """Debería responder 200 tras modificar un Issuer o eliminar una calificación"""
+        etags = {}
+        for url in ('/api/v1/tax-ratings/', '/api/v1/tax-ratings/ultimas/', '/api/v1/tax-ratings/estadisticas/'):
+            etags[url] = self.client.get(url)['ETag']
+
+        self.issuer.nombre = 'ABC Holdings'
+        self.issuer.save()
+        response = self.client.get('/api/v1/tax-ratings/', HTTP_IF_NONE_MATCH=etags['/api/v1/tax-ratings/'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['issuer_nombre'], 'ABC Holdings')
+        # Las estadísticas no dependen de los nombres
+        response = self.client.get(
+            '/api/v1/tax-ratings/estadisticas/', HTTP_IF_NONE_MATCH=etags['/api/v1/tax-ratings/estadisticas/']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.tax_rating.delete()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+    def test_detalle_usa_etag_y_last_modified(self):
+        """Debería validar el detalle por ETag o por If-Modified-Since"""
+        url = f'/api/v1/tax-ratings/{self.tax_rating.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 31 Dec 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get('/api/v1/tax-ratings/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,311 +1,1116 @@
 """
 Utilidades para procesar cargas masivas de archivos UTF-8.
 Los archivos deben ser texto plano en formato UTF-8, con datos separados por pipes (|) o tabulaciones.
+Se aceptan comprimidos con gzip (.gz) o zstd (.zst); se guardan así y se descomprimen al leerlos.
 """
+import codecs
 import csv
-import io
+import hashlib
+import itertools
 import logging
-from datetime import datetime
+import time
+import zlib
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import DatabaseError, IntegrityError, transaction
 from parametros.models import Issuer, Instrument
+from .ingest_log import IngestLogger
+from .intervals import ValidityIndex
+from .row_schema import RowSchema, get_row_schema, parse_iso_date
+from .search import build_search_document
 
 logger = logging.getLogger(__name__)
 
 
-def parse_utf8_file(file_obj):
+# Tamaño de los bloques leídos desde el archivo (64 KB)
+CHUNK_SIZE = 64 * 1024
+
+# Cantidad de filas que se validan e insertan juntas (configurable con BULK_UPLOAD_CHUNK_SIZE)
+DEFAULT_CHUNK_SIZE = 1000
+
+# Extensiones aceptadas para los archivos de carga masiva
+UPLOAD_EXTENSIONS = ('.txt', '.tsv', '.txt.gz', '.tsv.gz', '.txt.zst', '.tsv.zst')
+
+# Tamaño máximo del contenido descomprimido en bytes (configurable con BULK_UPLOAD_MAX_UNCOMPRESSED_SIZE)
+DEFAULT_MAX_UNCOMPRESSED_SIZE = 500 * 1024 * 1024
+
+# Columnas que debe traer el header y que cada fila debe completar
+REQUIRED_FIELDS = ('issuer_codigo', 'instrument_codigo', 'rating', 'valid_from')
+
+
+def get_compression(name):
     """
-    Parsea un archivo de texto UTF-8 y retorna las filas.
-    
+    Retorna la compresión de un archivo según su nombre.
+
+    Returns:
+        str o None: 'gzip', 'zstd' o None si es texto plano
+    """
+    name = (name or '').lower()
+    if name.endswith('.gz'):
+        return 'gzip'
+    if name.endswith('.zst'):
+        return 'zstd'
+    return None
+
+
+def _decompressing_reader(raw, compression):
+    """
+    Envuelve un archivo binario con un lector que lo descomprime a medida que se lee.
+
+    Returns:
+        tuple: (lector, excepciones que indican un archivo comprimido dañado)
+
+    Raises:
+        ValidationError: Si el archivo es .zst y no está instalado el paquete zstandard
+    """
+    if compression == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode='rb'), (OSError, EOFError, zlib.error)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ValidationError("Los archivos .zst requieren el paquete 'zstandard' en el servidor")
+    # Un .zst puede tener varios frames concatenados (p. ej. `cat a.zst b.zst`); sin
+    # read_across_frames el lector se detiene al final del primero
+    reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    return reader, (zstandard.ZstdError,)
+
+
+def _read_chunks(reader, chunk_size, compression=None):
+    """Lee `reader` en bloques de a lo más `chunk_size` bytes (descomprimiendo si corresponde)."""
+    errores = ()
+    if compression is not None:
+        reader, errores = _decompressing_reader(reader, compression)
+    while True:
+        try:
+            chunk = reader.read(chunk_size)
+        except errores as e:
+            raise ValidationError(f"El archivo comprimido ({compression}) está dañado: {e}")
+        if not chunk:
+            break
+        yield chunk
+
+
+def _iter_file_chunks(file_obj, chunk_size=CHUNK_SIZE):
+    """
+    Itera el contenido de un archivo en bloques, sin cargarlo completo en memoria.
+
+    Los archivos .gz y .zst se descomprimen como stream: cada bloque retornado
+    es contenido descomprimido de a lo más `chunk_size` bytes.
+
+    Args:
+        file_obj: Objeto FileField de Django, UploadedFile, archivo abierto o ruta string
+        chunk_size: Tamaño de cada bloque en bytes
+
+    Yields:
+        bytes o str: Bloques del archivo
+    """
+    if isinstance(file_obj, str):
+        # Es una ruta de archivo
+        with open(file_obj, 'rb') as f:
+            yield from _read_chunks(f, chunk_size, get_compression(file_obj))
+        return
+
+    # Es un objeto FileField/File de Django o un archivo abierto.
+    # No se usa File.chunks(): en InMemoryUploadedFile retorna todo en un solo bloque.
+    if getattr(file_obj, 'closed', False) and hasattr(file_obj, 'open'):
+        file_obj.open('rb')
+    try:
+        file_obj.seek(0)
+    except (AttributeError, OSError):
+        pass
+    yield from _read_chunks(file_obj, chunk_size, get_compression(getattr(file_obj, 'name', '')))
+
+
+def _iter_text_lines(file_obj, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Decodifica incrementalmente un archivo UTF-8 y retorna sus líneas una a una.
+
+    Las líneas conservan su salto de línea final para que el lector CSV
+    pueda manejar campos entre comillas que abarcan varias líneas.
+    Un bloque puede cortar un carácter multibyte por la mitad; el decodificador
+    incremental lo completa con el bloque siguiente.
+
+    `on_chunk`, si se entrega, recibe cada bloque crudo antes de decodificarlo.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    for chunk in _iter_file_chunks(file_obj, chunk_size):
+        if on_chunk is not None:
+            on_chunk(chunk)
+        buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line + '\n'
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+
+def file_sha256(file_obj, chunk_size=CHUNK_SIZE):
+    """Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    for chunk in _iter_file_chunks(file_obj, chunk_size):
+        digest.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return digest.hexdigest()
+
+
+def find_duplicate_upload(contenido_sha256, modo):
+    """
+    Busca una carga anterior con el mismo contenido y modo que no haya sido rechazada ni fallado.
+
+    Returns:
+        BulkUpload o None
+    """
+    from .models import BulkUpload
+
+    if not contenido_sha256:
+        return None
+    return (
+        BulkUpload.objects.filter(contenido_sha256=contenido_sha256, modo=modo)
+        .exclude(estado__in=['RECHAZADO', 'ERROR'])
+        .order_by('-creado_en')
+        .first()
+    )
+
+
+def detect_delimiter(first_line):
+    """
+    Detecta el delimitador a partir de la línea de headers.
+
+    Returns:
+        str: '|' o '\t'
+
+    Raises:
+        ValidationError: Si la línea no contiene ninguno de los delimitadores soportados
+    """
+    if '|' in first_line:
+        return '|'
+    if '\t' in first_line:
+        return '\t'
+    logger.error("No se detectó delimitador en: %r", first_line)
+    raise ValidationError(
+        "El archivo debe tener headers separados por pipes (|) o tabulaciones"
+    )
+
+
+def _read_header_line(lines):
+    """
+    Lee la línea de headers y detecta el delimitador.
+
+    Returns:
+        tuple: (first_line, delimiter)
+
+    Raises:
+        ValidationError: Si el archivo está vacío, sin headers o sin filas de datos
+    """
+    first_line = next(lines, None)
+    if first_line is None:
+        raise ValidationError("El archivo está vacío")
+
+    if not first_line.strip():
+        # Distinguir un archivo en blanco de uno con la línea de headers vacía
+        if not any(line.strip() for line in lines):
+            raise ValidationError("El archivo está vacío")
+        raise ValidationError("La primera línea (headers) está vacía")
+
+    if not first_line.endswith('\n'):
+        raise ValidationError("El archivo debe tener al menos un header y una fila de datos")
+
+    return first_line, detect_delimiter(first_line.strip())
+
+
+def parse_header_columns(first_line, delimiter):
+    """
+    Retorna las columnas de la línea de headers verificando que estén las requeridas.
+
+    Raises:
+        ValidationError: Si faltan columnas de REQUIRED_FIELDS
+    """
+    columnas = [header.strip() for header in next(csv.reader([first_line], delimiter=delimiter))]
+    faltantes = [campo for campo in REQUIRED_FIELDS if campo not in columnas]
+    if faltantes:
+        raise ValidationError(f"Faltan columnas requeridas en el header: {', '.join(faltantes)}")
+    return columnas
+
+
+class UploadScan:
+    """
+    Resultado de revisar un archivo subido en una sola lectura (ver scan_upload).
+
+    Attributes:
+        sha256: SHA-256 del contenido en hexadecimal
+        tamano: Bytes del contenido (descomprimido)
+        delimitador: '|' o '\t'
+        columnas: Headers del archivo, sin espacios
+        total_filas: Filas de datos (sin el header ni líneas en blanco)
+    """
+
+    def __init__(self, sha256, tamano, delimitador, columnas, total_filas):
+        self.sha256 = sha256
+        self.tamano = tamano
+        self.delimitador = delimitador
+        self.columnas = columnas
+        self.total_filas = total_filas
+
+    def __repr__(self):
+        return f"<UploadScan {self.total_filas} filas, {self.tamano} bytes, sha256 {self.sha256[:12]}>"
+
+
+def scan_upload(file_obj, max_size=None, chunk_size=CHUNK_SIZE):
+    """
+    Valida un archivo subido recorriéndolo una sola vez.
+
+    En la misma lectura por bloques se controla el tamaño, se calcula el SHA-256,
+    se decodifica incrementalmente como UTF-8, se detecta el delimitador, se
+    revisa que el header tenga las columnas requeridas y se cuentan las filas.
+    La lectura se corta apenas el archivo supera `max_size`.
+
+    En archivos comprimidos el tamaño y el SHA-256 son los del contenido
+    descomprimido, de modo que el mismo archivo se reconoce comprimido o no.
+
+    Args:
+        file_obj: UploadedFile, objeto FileField, archivo abierto o ruta string
+        max_size: Tamaño máximo del contenido en bytes (None para no limitar)
+        chunk_size: Tamaño de los bloques leídos en bytes
+
+    Returns:
+        UploadScan
+
+    Raises:
+        ValidationError: Si el archivo es muy grande, está mal formado o le faltan columnas
+        UnicodeDecodeError: Si el archivo no es UTF-8 válido
+    """
+    digest = hashlib.sha256()
+    tamano = 0
+
+    def consumir(chunk):
+        nonlocal tamano
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        tamano += len(chunk)
+        if max_size is not None and tamano > max_size:
+            raise ValidationError(f"El contenido del archivo no puede superar los {max_size // (1024 * 1024)}MB")
+        digest.update(chunk)
+
+    lines = _iter_text_lines(file_obj, chunk_size, on_chunk=consumir)
+    first_line, delimiter = _read_header_line(lines)
+    columnas = parse_header_columns(first_line, delimiter)
+
+    # csv.reader retorna [] para las líneas en blanco, que DictReader también omite
+    total_filas = sum(1 for row in csv.reader(lines, delimiter=delimiter) if row)
+
+    return UploadScan(digest.hexdigest(), tamano, delimiter, columnas, total_filas)
+
+
+def iter_utf8_file(file_obj, chunk_size=CHUNK_SIZE):
+    """
+    Parsea de forma perezosa un archivo de texto UTF-8 y retorna sus filas una a una.
+
+    El archivo se lee por bloques y se decodifica incrementalmente, por lo que la
+    memoria usada no depende del tamaño del archivo. El delimitador se detecta
+    solo desde la primera línea.
+
     El archivo debe tener:
     - Primera fila: headers separados por pipes (|) o tabulaciones
     - Filas siguientes: datos separados por el mismo delimitador
-    
+
     Args:
         file_obj: Objeto FileField de Django o archivo abierto o ruta string
-        
-    Returns:
-        list: Lista de diccionarios con los datos de cada fila
-        
+        chunk_size: Tamaño de los bloques leídos en bytes
+
+    Yields:
+        tuple: (numero_fila, datos) donde datos es un diccionario con la fila
+
     Raises:
         ValidationError: Si el archivo no es UTF-8 válido o está mal formado
     """
-    rows = []
-    content = None
-    
+    logger.info("Leyendo archivo: %s", file_obj if isinstance(file_obj, str) else getattr(file_obj, 'name', 'unknown'))
+
     try:
-        # Obtener contenido según el tipo de input
-        if isinstance(file_obj, str):
-            # Es una ruta de archivo
-            logger.info(f"Leyendo archivo desde ruta: {file_obj}")
-            with open(file_obj, 'r', encoding='utf-8') as f:
-                content = f.read()
-        else:
-            # Es un objeto FileField/File de Django
-            logger.info(f"Leyendo archivo desde FileField: {getattr(file_obj, 'name', 'unknown')}")
-            try:
-                file_obj.seek(0)  # Ir al inicio del archivo
-            except:
-                pass
-            
-            # Intentar leer
-            try:
-                data = file_obj.read()
-            except:
-                # Si read() sin argumentos no funciona, abrir el file
-                file_obj.open('r')
-                data = file_obj.read()
-            
-            # Convertir a string si es bytes
-            if isinstance(data, bytes):
-                logger.info("Contenido es bytes, decodificando a UTF-8")
-                content = data.decode('utf-8')
-            else:
-                content = data
-        
-        if not content or len(content.strip()) == 0:
-            raise ValidationError("El archivo está vacío")
-        
-        logger.info(f"Contenido leído, {len(content)} caracteres")
-        logger.info(f"Primeros 200 caracteres: {repr(content[:200])}")
-        
-        # Dividir en líneas
-        lines = content.split('\n')
-        logger.info(f"Total de líneas: {len(lines)}")
-        
-        if len(lines) < 2:
-            raise ValidationError("El archivo debe tener al menos un header y una fila de datos")
-        
-        # Detectar delimitador desde la primera línea
-        first_line = lines[0].strip()
-        logger.info(f"Primera línea (stripped): {repr(first_line)}")
-        
-        if not first_line:
-            raise ValidationError("La primera línea (headers) está vacía")
-        
-        # Determinar delimitador
-        delimiter = None
-        if '|' in first_line:
-            delimiter = '|'
-            logger.info("Delimitador detectado: pipe (|)")
-        elif '\t' in first_line:
-            delimiter = '\t'
-            logger.info("Delimitador detectado: tabulación")
-        else:
-            logger.error(f"No se detectó delimitador en: {repr(first_line)}")
-            raise ValidationError(
-                "El archivo debe tener headers separados por pipes (|) o tabulaciones"
-            )
-        
-        # Usar StringIO para leer como archivo CSV
-        file_stream = io.StringIO(content)
-        
-        # Leer con CSV reader
-        reader = csv.DictReader(file_stream, delimiter=delimiter)
-        
+        lines = _iter_text_lines(file_obj, chunk_size)
+        first_line, delimiter = _read_header_line(lines)
+        logger.info("Delimitador detectado: %s", 'pipe (|)' if delimiter == '|' else 'tabulación')
+
+        reader = csv.DictReader(itertools.chain([first_line], lines), delimiter=delimiter)
+
         if reader.fieldnames is None:
             raise ValidationError("El archivo no tiene headers válidos")
-        
-        logger.info(f"Headers encontrados: {reader.fieldnames}")
-        
-        # Parsear filas
+
+        logger.info("Headers encontrados: %s", reader.fieldnames)
+
+        total = 0
         for idx, row in enumerate(reader, start=2):  # Fila 1 es el header
             # Limpiar espacios en blanco de las claves y valores
             cleaned_row = {k.strip(): (v.strip() if v else '') for k, v in row.items()}
-            rows.append({'numero_fila': idx, 'datos': cleaned_row})
-            logger.debug(f"Fila {idx} parseada: {cleaned_row}")
-        
-        logger.info(f"✓ Total filas parseadas exitosamente: {len(rows)}")
-        
+            total += 1
+            yield idx, cleaned_row
+
+        logger.info("✓ Total filas parseadas exitosamente: %d", total)
+
     except ValidationError:
         raise
     except UnicodeDecodeError as e:
-        logger.error(f"Error de codificación UTF-8: {str(e)}")
+        logger.error("Error de codificación UTF-8: %s", e)
         raise ValidationError(
             f"El archivo no está en formato UTF-8 válido: {str(e)}"
         )
     except Exception as e:
-        logger.error(f"Error inesperado al leer archivo: {type(e).__name__}: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("Error inesperado al leer archivo: %s: %s", type(e).__name__, e)
         raise ValidationError(f"Error al leer archivo UTF-8: {str(e)}")
-    
-    return rows
 
 
-def validate_tax_rating_row(row_data):
+def parse_utf8_file(file_obj):
+    """
+    Parsea un archivo de texto UTF-8 y retorna todas las filas en una lista.
+
+    Se mantiene por compatibilidad; para archivos grandes usar iter_utf8_file(),
+    que no materializa las filas en memoria.
+
+    Args:
+        file_obj: Objeto FileField de Django o archivo abierto o ruta string
+
+    Returns:
+        list: Lista de diccionarios con los datos de cada fila
+
+    Raises:
+        ValidationError: Si el archivo no es UTF-8 válido o está mal formado
+    """
+    return [
+        {'numero_fila': numero_fila, 'datos': datos}
+        for numero_fila, datos in iter_utf8_file(file_obj)
+    ]
+
+
+def iter_batches(iterable, size):
+    """
+    Agrupa un iterable en listas de hasta `size` elementos sin materializarlo completo.
+
+    Yields:
+        list: Lote de elementos consecutivos
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def resolve_row_references(rows):
+    """
+    Resuelve los códigos de Issuer e Instrument de un lote de filas.
+
+    Ejecuta una sola consulta `codigo__in` por modelo para todos los códigos
+    distintos del lote, en lugar de una consulta por fila.
+
+    Args:
+        rows: Iterable de diccionarios con los datos de cada fila
+
+    Returns:
+        tuple: (issuers, instruments) diccionarios {codigo: instancia}
+    """
+    issuer_codigos = set()
+    instrument_codigos = set()
+    for row_data in rows:
+        if row_data.get('issuer_codigo'):
+            issuer_codigos.add(row_data['issuer_codigo'])
+        if row_data.get('instrument_codigo'):
+            instrument_codigos.add(row_data['instrument_codigo'])
+
+    issuers = {}
+    if issuer_codigos:
+        issuers = {obj.codigo: obj for obj in Issuer.objects.filter(codigo__in=issuer_codigos)}
+
+    instruments = {}
+    if instrument_codigos:
+        instruments = {obj.codigo: obj for obj in Instrument.objects.filter(codigo__in=instrument_codigos)}
+
+    return issuers, instruments
+
+
+def validate_tax_rating_batch(batch):
+    """
+    Valida un lote de filas contra los Issuer/Instrument resueltos en bloque.
+
+    Los campos se validan con un mismo RowSchema para todo el lote.
+
+    Args:
+        batch: Lista de tuplas (numero_fila, datos)
+
+    Returns:
+        tuple: (resultados, issuers, instruments) donde resultados es una lista de
+        tuplas (numero_fila, datos, errores) en el mismo orden del lote
+    """
+    schema = RowSchema()
+    return validate_batch_references(
+        [(numero_fila, row_data, schema.validate(row_data)) for numero_fila, row_data in batch]
+    )
+
+
+def validate_batch_references(resultados):
+    """
+    Completa la validación de un lote revisando que existan sus Issuer/Instrument.
+
+    Es la parte de la validación que consulta la base de datos (una consulta por
+    modelo para todo el lote); los campos ya vienen revisados con
+    validate_tax_rating_fields, que no la consulta.
+
+    Args:
+        resultados: Lista de tuplas (numero_fila, datos, errores de campos)
+
+    Returns:
+        tuple: (resultados, issuers, instruments) como validate_tax_rating_batch
+    """
+    issuers, instruments = resolve_row_references(datos for _, datos, _ in resultados)
+    return [
+        (numero_fila, row_data, _check_row_references(row_data, errores, issuers, instruments))
+        for numero_fila, row_data, errores in resultados
+    ], issuers, instruments
+
+
+def _missing_required(row_data):
+    return any(not row_data.get(field) for field in REQUIRED_FIELDS)
+
+
+def _check_row_references(row_data, errores, issuers=None, instruments=None):
+    """Antepone a `errores` los de Issuer/Instrument inexistentes (si están los campos requeridos)."""
+    if _missing_required(row_data):
+        return errores
+
+    referencias = []
+
+    # Validar que exista el Issuer
+    if issuers is None:
+        issuer_existe = Issuer.objects.filter(codigo=row_data['issuer_codigo']).exists()
+    else:
+        issuer_existe = row_data['issuer_codigo'] in issuers
+    if not issuer_existe:
+        referencias.append(f"Issuer con código '{row_data['issuer_codigo']}' no existe")
+
+    # Validar que exista el Instrument
+    if instruments is None:
+        instrument_existe = Instrument.objects.filter(codigo=row_data['instrument_codigo']).exists()
+    else:
+        instrument_existe = row_data['instrument_codigo'] in instruments
+    if not instrument_existe:
+        referencias.append(f"Instrument con código '{row_data['instrument_codigo']}' no existe")
+
+    return referencias + errores
+
+
+def validate_tax_rating_row(row_data, issuers=None, instruments=None):
     """
     Valida que una fila tenga los datos necesarios para crear un TaxRating.
     
     Args:
         row_data: Diccionario con los datos de la fila
+        issuers: Diccionario {codigo: Issuer} ya resuelto (opcional; si no se
+            entrega, se consulta la base de datos)
+        instruments: Diccionario {codigo: Instrument} ya resuelto (opcional)
         
     Returns:
         tuple: (es_valido: bool, errores: list)
     """
-    errores = []
-    
-    # Campos requeridos
-    required_fields = ['issuer_codigo', 'instrument_codigo', 'rating', 'valid_from']
-    for field in required_fields:
-        if not row_data.get(field):
-            errores.append(f"Campo requerido '{field}' faltante o vacío")
-    
-    if errores:
-        return False, errores
-    
-    # Validar que exista el Issuer
-    try:
-        issuer = Issuer.objects.get(codigo=row_data['issuer_codigo'])
-    except Issuer.DoesNotExist:
-        errores.append(f"Issuer con código '{row_data['issuer_codigo']}' no existe")
-    
-    # Validar que exista el Instrument
-    try:
-        instrument = Instrument.objects.get(codigo=row_data['instrument_codigo'])
-    except Instrument.DoesNotExist:
-        errores.append(f"Instrument con código '{row_data['instrument_codigo']}' no existe")
-    
-    # Validar rating
-    valid_ratings = ['AAA', 'AA', 'A', 'BBB', 'BB', 'B', 'CCC', 'CC', 'C', 'D']
-    if row_data['rating'] not in valid_ratings:
-        errores.append(f"Rating '{row_data['rating']}' no es válido. Opciones: {', '.join(valid_ratings)}")
-    
-    # Validar formato de fechas (valid_from requerido, valid_to opcional)
+    errores = _check_row_references(row_data, validate_tax_rating_fields(row_data), issuers, instruments)
+    return len(errores) == 0, errores
+
+
+def validate_tax_rating_fields(row_data, schema=None):
+    """
+    Valida los campos de una fila que no dependen de la base de datos.
+
+    No consulta la base de datos, por lo que se puede ejecutar fuera del hilo
+    que escribe (ver calificacionfiscal.pipeline).
+
+    Args:
+        row_data: Diccionario con los datos de la fila
+        schema: RowSchema de la carga (opcional; si no se entrega, se usa el
+            compartido de get_row_schema)
+
+    Returns:
+        list: Errores de la fila; si faltan campos requeridos, solo esos
+    """
+    if schema is None:
+        schema = get_row_schema()
+    return schema.validate(row_data)
+
+
+def get_chunk_size(chunk_size=None):
+    """Retorna el tamaño de lote a usar: el entregado o el configurado en settings."""
+    return chunk_size or getattr(settings, 'BULK_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def _parse_fecha(value):
+    """Convierte un string YYYY-MM-DD (ya validado) a date."""
+    return parse_iso_date(value)
+
+
+def build_tax_rating(row_data, issuer, instrument, analista):
+    """
+    Construye (sin guardar) un TaxRating a partir de una fila validada.
+
+    Normaliza los campos opcionales con los mismos valores por defecto que la carga fila a fila.
+    """
+    from .models import TaxRating
+
+    valid_to_value = row_data.get('valid_to')
+    if valid_to_value is not None and str(valid_to_value).strip() == '':
+        valid_to_value = None
+
+    tax_rating = TaxRating(
+        issuer=issuer,
+        instrument=instrument,
+        rating=row_data['rating'],
+        valid_from=_parse_fecha(row_data['valid_from']),
+        valid_to=_parse_fecha(valid_to_value) if valid_to_value else None,
+        status=row_data.get('status') or 'VIGENTE',
+        risk_level=row_data.get('risk_level') or 'MODERADO',
+        comments=row_data.get('comments') or row_data.get('notas', '') or '',
+        analista=analista,
+    )
+    # bulk_create y COPY no pasan por TaxRating.save()
+    tax_rating.search_document = build_search_document(tax_rating)
+    return tax_rating
+
+
+# Campos que una carga en modo UPSERT compara y actualiza en una calificación existente
+MERGE_FIELDS = ('rating', 'risk_level', 'valid_to', 'status', 'comments')
+
+
+def find_existing_keys(tax_ratings):
+    """
+    Retorna las claves (issuer_id, instrument_id, valid_from) que ya existen en la base de datos.
+
+    Usa una sola consulta por lote; el filtro por componentes entrega un superconjunto
+    que se reduce a las claves exactas en memoria.
+    """
+    from .models import TaxRating
+
+    if not tax_ratings:
+        return set()
+
+    claves = {(tr.issuer_id, tr.instrument_id, tr.valid_from) for tr in tax_ratings}
+    candidatas = TaxRating.objects.filter(
+        issuer_id__in={clave[0] for clave in claves},
+        instrument_id__in={clave[1] for clave in claves},
+        valid_from__in={clave[2] for clave in claves},
+    ).values_list('issuer_id', 'instrument_id', 'valid_from')
+    return claves.intersection(candidatas)
+
+
+def find_existing_tax_ratings(tax_ratings):
+    """
+    Retorna las calificaciones existentes de un lote como {(issuer_id, instrument_id, valid_from): TaxRating}.
+
+    Igual que find_existing_keys pero carga las instancias para comparar sus valores
+    (modos UPSERT y OMITIR_SIN_CAMBIOS).
+    """
+    from .models import TaxRating
+
+    if not tax_ratings:
+        return {}
+
+    claves = {(tr.issuer_id, tr.instrument_id, tr.valid_from) for tr in tax_ratings}
+    candidatas = TaxRating.objects.filter(
+        issuer_id__in={clave[0] for clave in claves},
+        instrument_id__in={clave[1] for clave in claves},
+        valid_from__in={clave[2] for clave in claves},
+    )
+    existentes = {}
+    for tax_rating in candidatas:
+        clave = (tax_rating.issuer_id, tax_rating.instrument_id, tax_rating.valid_from)
+        if clave in claves:
+            existentes[clave] = tax_rating
+    return existentes
+
+
+def _mensaje_duplicado(row_data):
+    return (
+        f"Ya existe una calificación para issuer '{row_data['issuer_codigo']}', "
+        f"instrument '{row_data['instrument_codigo']}' y valid_from '{row_data['valid_from']}'"
+    )
+
+
+def _mensaje_modificada(row_data):
+    return (
+        f"La calificación para issuer '{row_data['issuer_codigo']}', "
+        f"instrument '{row_data['instrument_codigo']}' y valid_from '{row_data['valid_from']}' "
+        f"ya existe con otros valores"
+    )
+
+
+def _mensaje_solapamiento(row_data):
+    return (
+        f"Ya existe una calificación vigente para issuer '{row_data['issuer_codigo']}' e "
+        f"instrument '{row_data['instrument_codigo']}' en el rango de fechas especificado"
+    )
+
+
+def _insert_tax_ratings(candidatas, errores_por_fila):
+    """
+    Inserta los TaxRatings de un lote con bulk_create, o con COPY en PostgreSQL
+    si BULK_UPLOAD_USE_COPY está activo (ver calificacionfiscal.pg_copy).
+
+    Si el INSERT masivo falla (p. ej. por una carga concurrente que insertó la misma
+    clave), se reintenta fila a fila para aislar el error en su propia fila.
+
+    Args:
+        candidatas: Lista de tuplas (numero_fila, datos, tax_rating)
+        errores_por_fila: Diccionario donde se registran los errores por numero_fila
+
+    Returns:
+        list: Las tuplas de `candidatas` que quedaron insertadas
+    """
+    from .models import TaxRating
+    from .pg_copy import copy_insert_tax_ratings, use_copy_backend
+
+    if not candidatas:
+        return []
+
     try:
-        datetime.strptime(str(row_data['valid_from']), '%Y-%m-%d')
-    except ValueError:
-        errores.append("Formato de 'valid_from' inválido. Use YYYY-MM-DD")
+        with transaction.atomic():
+            if use_copy_backend():
+                return copy_insert_tax_ratings(candidatas, errores_por_fila, _mensaje_duplicado)
+            TaxRating.objects.bulk_create([tax_rating for _, _, tax_rating in candidatas])
+        return candidatas
+    except DatabaseError as e:
+        logger.warning("Falló la inserción masiva del lote, reintentando fila a fila: %s", e)
 
-    if row_data.get('valid_to'):
+    creadas = []
+    for numero_fila, row_data, tax_rating in candidatas:
+        tax_rating.pk = None
         try:
-            # Permitir vacío como no definido
-            if str(row_data['valid_to']).strip():
-                valid_from_dt = datetime.strptime(str(row_data['valid_from']), '%Y-%m-%d')
-                valid_to_dt = datetime.strptime(str(row_data['valid_to']), '%Y-%m-%d')
-                if valid_to_dt <= valid_from_dt:
-                    errores.append("'valid_to' debe ser posterior a 'valid_from'")
-        except ValueError:
-            errores.append("Formato de 'valid_to' inválido. Use YYYY-MM-DD")
-
-    # Validar status (opcional)
-    if row_data.get('status'):
-        valid_status = ['VIGENTE', 'VENCIDO', 'SUSPENDIDO', 'CANCELADO']
-        if row_data['status'] not in valid_status:
-            errores.append(f"Status '{row_data['status']}' no es válido. Opciones: {', '.join(valid_status)}")
-
-    # Validar risk_level (opcional)
-    if row_data.get('risk_level'):
-        valid_levels = ['MUY_BAJO', 'BAJO', 'MODERADO', 'ALTO', 'MUY_ALTO']
-        if row_data['risk_level'] not in valid_levels:
-            errores.append(f"Risk level '{row_data['risk_level']}' no es válido. Opciones: {', '.join(valid_levels)}")
-    
-    return len(errores) == 0, errores
+            with transaction.atomic():
+                TaxRating.objects.bulk_create([tax_rating])
+            creadas.append((numero_fila, row_data, tax_rating))
+        except IntegrityError:
+            # Otra carga concurrente insertó la misma clave después de la verificación
+            errores_por_fila[numero_fila] = _mensaje_duplicado(row_data)
+        except DatabaseError as e:
+            logger.error("Error al procesar fila %d: %s", numero_fila, e)
+            errores_por_fila[numero_fila] = str(e)
+    return creadas
+
+
+def get_item_columns(bulk_upload, resultados):
+    """
+    Retorna las columnas con que se compactan los datos de los items de una carga.
+
+    Los headers se guardan una vez en BulkUpload.columnas con la primera fila
+    procesada. Retorna None si BULK_UPLOAD_COMPACT_ITEMS está desactivado.
+    """
+    from .models import BulkUpload
+
+    if not getattr(settings, 'BULK_UPLOAD_COMPACT_ITEMS', True):
+        return None
+    if not bulk_upload.columnas and resultados:
+        bulk_upload.columnas = list(resultados[0][1])
+        BulkUpload.objects.filter(pk=bulk_upload.pk).update(columnas=bulk_upload.columnas)
+    return bulk_upload.columnas
+
+
+def compact_row(row_data, columnas):
+    """Convierte una fila a lista de valores en el orden de `columnas` (si coinciden sus claves)."""
+    if columnas and list(row_data) == columnas:
+        return list(row_data.values())
+    return row_data
+
+
+def plan_tax_rating_batch(bulk_upload, resultados, issuers, instruments, ingest_log=None, indice=None):
+    """
+    Decide qué hacer con cada fila de un lote validado, sin escribir en la base de datos.
 
+    Verifica la unicidad (issuer, instrument, valid_from) con una consulta por lote.
+    Las claves repetidas en el archivo y los rangos que se solapan con una
+    calificación VIGENTE existente o con una fila VIGENTE anterior del archivo
+    son error (ver calificacionfiscal.intervals).
+    Las filas cuya clave ya existe se resuelven según bulk_upload.modo:
+    - INSERTAR: error de duplicado.
+    - UPSERT: sin cambios no hace nada; con cambios se actualiza.
+    - OMITIR_SIN_CAMBIOS: sin cambios no hace nada; con cambios es error.
 
-def process_bulk_upload_file(bulk_upload):
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        resultados: Lista de tuplas (numero_fila, datos, errores) de validate_tax_rating_batch
+        issuers: Diccionario {codigo: Issuer} del lote
+        instruments: Diccionario {codigo: Instrument} del lote
+        ingest_log: IngestLogger de la carga (se crea uno si no se entrega)
+        indice: ValidityIndex de la carga (si no se entrega, los duplicados y
+            solapamientos entre filas solo se buscan dentro del lote)
+
+    Returns:
+        tuple: (candidatas, actualizadas, sin_cambios, errores_por_fila) donde
+            candidatas y actualizadas son listas de (numero_fila, datos, tax_rating),
+            sin_cambios es un set de numero_fila y errores_por_fila es {numero_fila: mensaje}
+    """
+    ingest_log = ingest_log or IngestLogger(logger)
+    indice = indice or ValidityIndex()
+    errores_por_fila = {}
+    nuevas = []
+    for numero_fila, row_data, errores in resultados:
+        ingest_log.row(numero_fila, row_data)
+        if errores:
+            ingest_log.row_error(numero_fila, errores)
+            errores_por_fila[numero_fila] = '; '.join(errores)
+            continue
+        tax_rating = build_tax_rating(
+            row_data,
+            issuers[row_data['issuer_codigo']],
+            instruments[row_data['instrument_codigo']],
+            bulk_upload.usuario,
+        )
+        nuevas.append((numero_fila, row_data, tax_rating))
+
+    # Verificar unicidad contra la base de datos y dentro del mismo lote
+    modo = bulk_upload.modo
+    if modo == 'INSERTAR':
+        existentes = find_existing_keys([tax_rating for _, _, tax_rating in nuevas])
+    else:
+        existentes = find_existing_tax_ratings([tax_rating for _, _, tax_rating in nuevas])
+    indice.load((tax_rating.issuer_id, tax_rating.instrument_id) for _, _, tax_rating in nuevas)
+    candidatas = []
+    actualizadas = []
+    sin_cambios = set()
+    for numero_fila, row_data, tax_rating in nuevas:
+        clave = (tax_rating.issuer_id, tax_rating.instrument_id, tax_rating.valid_from)
+        if not indice.add_key(clave) or (modo == 'INSERTAR' and clave in existentes):
+            errores_por_fila[numero_fila] = _mensaje_duplicado(row_data)
+            continue
+        # Una fila que actualiza una calificación no se compara con su propio rango
+        if indice.overlaps(tax_rating, excluir_existente=clave in existentes):
+            errores_por_fila[numero_fila] = _mensaje_solapamiento(row_data)
+            continue
+        if clave not in existentes:
+            candidatas.append((numero_fila, row_data, tax_rating))
+            indice.accept(tax_rating)
+            continue
+
+        existente = existentes[clave]
+        if all(getattr(existente, campo) == getattr(tax_rating, campo) for campo in MERGE_FIELDS):
+            sin_cambios.add(numero_fila)
+        elif modo == 'UPSERT':
+            for campo in MERGE_FIELDS:
+                setattr(existente, campo, getattr(tax_rating, campo))
+            existente.issuer = tax_rating.issuer
+            existente.instrument = tax_rating.instrument
+            existente.analista = tax_rating.analista
+            existente.search_document = tax_rating.search_document
+            actualizadas.append((numero_fila, row_data, existente))
+            indice.accept(existente, reemplaza_existente=True)
+        else:
+            errores_por_fila[numero_fila] = _mensaje_modificada(row_data)
+
+    return candidatas, actualizadas, sin_cambios, errores_por_fila
+
+
+def ingest_tax_rating_batch(bulk_upload, resultados, issuers, instruments, ingest_log=None, indice=None):
+    """
+    Inserta un lote de filas ya validadas.
+
+    Decide qué hacer con cada fila con plan_tax_rating_batch y lo aplica con
+    apply_tax_rating_plan.
+
+    Se llama dentro de un transaction.atomic() por lote, de modo que el lote completo
+    se confirma con un solo COMMIT.
+
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        resultados: Lista de tuplas (numero_fila, datos, errores) de validate_tax_rating_batch
+        issuers: Diccionario {codigo: Issuer} del lote
+        instruments: Diccionario {codigo: Instrument} del lote
+        ingest_log: IngestLogger de la carga (opcional)
+        indice: ValidityIndex de la carga (opcional)
+
+    Returns:
+        tuple: (filas_ok, errores_por_fila, acciones) donde errores_por_fila es
+            {numero_fila: mensaje} y acciones es {'actualizadas': n, 'sin_cambios': n}
+    """
+    plan = plan_tax_rating_batch(bulk_upload, resultados, issuers, instruments, ingest_log, indice)
+    return apply_tax_rating_plan(bulk_upload, resultados, plan)
+
+
+def apply_tax_rating_plan(bulk_upload, resultados, plan):
+    """
+    Escribe un lote según el plan de plan_tax_rating_batch.
+
+    Inserta los TaxRatings nuevos y los BulkUploadItems con bulk_create, actualiza
+    los modificados con bulk_update y registra la auditoría y las estadísticas de
+    las calificaciones también en bloque. Las filas inválidas ya se descartaron en
+    el plan y, si aun así falla un INSERT, los savepoints de _insert_tax_ratings
+    aíslan la fila con error sin abortar el resto del lote.
+
+    Args:
+        bulk_upload: Instancia de BulkUpload
+        resultados: Lista de tuplas (numero_fila, datos, errores) del lote
+        plan: Tupla (candidatas, actualizadas, sin_cambios, errores_por_fila) de plan_tax_rating_batch
+
+    Returns:
+        tuple: (filas_ok, errores_por_fila, acciones), como ingest_tax_rating_batch
+    """
+    from django.utils import timezone
+    from .models import BulkUploadItem, TaxRating
+    from cuentas.signals import audit_taxrating_bulk_create, audit_taxrating_bulk_update
+    from .stats import record_created, record_updated
+
+    candidatas, actualizadas, sin_cambios, errores_por_fila = plan
+
+    creadas = _insert_tax_ratings(candidatas, errores_por_fila)
+    audit_taxrating_bulk_create([tax_rating for _, _, tax_rating in creadas])
+    record_created([tax_rating for _, _, tax_rating in creadas])
+
+    if actualizadas:
+        ahora = timezone.now()
+        instancias = [tax_rating for _, _, tax_rating in actualizadas]
+        for tax_rating in instancias:
+            tax_rating.actualizado_en = ahora
+        TaxRating.objects.bulk_update(instancias, MERGE_FIELDS + ('analista', 'search_document', 'actualizado_en'))
+        audit_taxrating_bulk_update(instancias)
+        record_updated(instancias)
+
+    filas_ok = {numero_fila for numero_fila, _, _ in creadas + actualizadas} | sin_cambios
+    columnas = get_item_columns(bulk_upload, resultados)
+    items = []
+    for numero_fila, row_data, _ in resultados:
+        if numero_fila in filas_ok:
+            items.append(BulkUploadItem(
+                bulk_upload=bulk_upload,
+                numero_fila=numero_fila,
+                estado='OK',
+                datos=compact_row(row_data, columnas)
+            ))
+        else:
+            items.append(BulkUploadItem(
+                bulk_upload=bulk_upload,
+                numero_fila=numero_fila,
+                estado='ERROR',
+                mensaje_error=errores_por_fila[numero_fila][:500],
+                datos=compact_row(row_data, columnas)
+            ))
+    BulkUploadItem.objects.bulk_create(items)
+
+    acciones = {'actualizadas': len(actualizadas), 'sin_cambios': len(sin_cambios)}
+    return len(filas_ok), errores_por_fila, acciones
+
+
+def iter_validated_batches(bulk_upload, chunk_size, desde_fila=0, tiempos=None):
+    """
+    Retorna los lotes validados de una carga, a partir de la fila siguiente a `desde_fila`.
+
+    El archivo se parsea y valida en hilos aparte mientras se escriben los lotes
+    anteriores (ver calificacionfiscal.pipeline).
+
+    Si hay un plan validado en caché para el archivo (ver calificacionfiscal.plans),
+    las filas se leen del archivo en este hilo y toman sus errores de la caché sin
+    validarse otra vez; solo se vuelven a resolver los Issuer/Instrument de cada
+    lote. Si alguno dejó de existir, ese lote se valida de nuevo.
+
+    Args:
+        tiempos: Diccionario opcional donde se acumulan los segundos por etapa
+
+    Yields:
+        tuple: (resultados, issuers, instruments) como validate_tax_rating_batch
+    """
+    from .pipeline import iter_pipelined_batches
+    from .plans import load_validation_errors
+
+    errores_validacion = load_validation_errors(bulk_upload)
+    if errores_validacion is None:
+        yield from iter_pipelined_batches(bulk_upload, chunk_size, desde_fila, tiempos)
+        return
+
+    logger.info(f"Usando plan validado en caché para BulkUpload {bulk_upload.id}")
+    tiempos = tiempos if tiempos is not None else {}
+    tiempos.setdefault('parseo', 0.0)
+    tiempos.setdefault('escritura', 0.0)
+    filas = (fila for fila in iter_utf8_file(bulk_upload.archivo) if fila[0] > desde_fila)
+    lotes = iter_batches(filas, chunk_size)
+    while True:
+        inicio = time.perf_counter()
+        batch = next(lotes, None)
+        tiempos['parseo'] += time.perf_counter() - inicio
+        if batch is None:
+            return
+
+        inicio = time.perf_counter()
+        lote = [(numero_fila, datos, errores_validacion.get(numero_fila, [])) for numero_fila, datos in batch]
+        issuers, instruments = resolve_row_references(datos for _, datos in batch)
+        vigente = all(
+            errores or (datos['issuer_codigo'] in issuers and datos['instrument_codigo'] in instruments)
+            for _, datos, errores in lote
+        )
+        if not vigente:
+            lote, issuers, instruments = validate_tax_rating_batch(batch)
+        tiempos['escritura'] += time.perf_counter() - inicio
+        yield lote, issuers, instruments
+
+
+def load_checkpoint_summary(bulk_upload):
+    """
+    Reconstruye el resumen de las filas que ya tienen item de una ejecución anterior.
+
+    Se usa al reanudar una carga interrumpida: los items de las filas hasta
+    `ultima_fila_confirmada` ya están en la base de datos y no se reprocesan.
+    El procesamiento paralelo confirma lotes en desorden, así que también puede
+    haber items de filas posteriores al checkpoint; esas filas tampoco se reprocesan.
+
+    Returns:
+        tuple: (total_filas, filas_ok, resumen_errores, confirmadas) donde
+            confirmadas es el set de numero_fila posteriores al checkpoint con item
+    """
+    previos = bulk_upload.items.all()
+    total_filas = previos.count()
+    if not total_filas:
+        return 0, 0, {}, set()
+    resumen_errores = dict(
+        previos.filter(estado='ERROR').order_by('numero_fila').values_list('numero_fila', 'mensaje_error')
+    )
+    confirmadas = set(
+        previos.filter(numero_fila__gt=bulk_upload.ultima_fila_confirmada).values_list('numero_fila', flat=True)
+    )
+    return total_filas, total_filas - len(resumen_errores), resumen_errores, confirmadas
+
+
+def confirm_batch_checkpoint(bulk_upload, **campos):
+    """
+    Guarda el checkpoint de un lote dentro de su transacción.
+
+    Si la carga fue tomada por un worker, el UPDATE solo se aplica mientras siga
+    en PROCESANDO con ese worker: una carga reencolada por heartbeat vencido
+    pertenece a otro worker y el lote no debe confirmarse.
+
+    Returns:
+        int: Filas actualizadas (0 si la carga ya no pertenece al worker)
+    """
+    from .models import BulkUpload
+
+    cargas = BulkUpload.objects.filter(pk=bulk_upload.pk)
+    if bulk_upload.worker:
+        cargas = cargas.filter(worker=bulk_upload.worker, estado='PROCESANDO')
+    return cargas.update(**campos)
+
+
+def process_bulk_upload_file(bulk_upload, chunk_size=None, on_progress=None):
     """
     Procesa un archivo UTF-8 de carga masiva y crea los items correspondientes.
 
+    Las filas se leen, validan e insertan por lotes de `chunk_size` filas
+    (por defecto settings.BULK_UPLOAD_CHUNK_SIZE): cada lote resuelve sus
+    Issuer/Instrument con una consulta por modelo e inserta con bulk_create.
+
+    Si la carga pasó por el endpoint `validar` y el archivo no cambió, las filas
+    toman sus errores de validación del plan en caché en lugar de validarse otra vez.
+
+    Cada lote se confirma en una transacción junto con el checkpoint
+    `ultima_fila_confirmada`; si el proceso se interrumpe, el siguiente intento
+    retoma desde la fila siguiente al checkpoint sin duplicar items. Si la carga
+    dejó de pertenecer al worker, el lote se revierte con BulkUploadJobLost.
+
     Args:
         bulk_upload: Instancia de BulkUpload
+        chunk_size: Cantidad de filas por lote
+        on_progress: Función opcional llamada después de cada lote con el
+            resumen parcial (total_filas, filas_ok, filas_error)
 
     Returns:
         dict: Resumen del procesamiento
     """
-    from .models import BulkUploadItem, TaxRating
-    from parametros.models import Issuer, Instrument
+    chunk_size = get_chunk_size(chunk_size)
+
+    from .jobs import BulkUploadJobLost
 
     logger.info(f"Iniciando procesamiento de BulkUpload {bulk_upload.id}: {bulk_upload.archivo.name}")
     
-    # Parsear archivo UTF-8 - pasar el FileField directamente
-    rows = parse_utf8_file(bulk_upload.archivo)
+    checkpoint = bulk_upload.ultima_fila_confirmada
+    total_filas, filas_ok, resumen_errores, confirmadas = load_checkpoint_summary(bulk_upload)
+    if total_filas:
+        # Los contadores por modo se confirman junto con cada lote
+        acciones = {
+            'actualizadas': bulk_upload.filas_actualizadas,
+            'sin_cambios': bulk_upload.filas_sin_cambios,
+        }
+        logger.info(f"Reanudando BulkUpload {bulk_upload.id} después de la fila {checkpoint}")
+    else:
+        acciones = {'actualizadas': 0, 'sin_cambios': 0}
+    filas_error = len(resumen_errores)
     
-    logger.info(f"Se parsearon {len(rows)} filas del archivo")
+    # Segundos de trabajo por etapa; 'espera_escritura' es lo que la escritura
+    # esperó lotes del parseo/validación
+    tiempos = {'parseo': 0.0, 'validacion': 0.0, 'escritura': 0.0, 'espera_escritura': 0.0}
+    inicio_total = time.perf_counter()
+    ingest_log = IngestLogger(logger)
+    # Claves y vigencias de toda la carga, para revisar cada lote antes de escribirlo
+    indice = ValidityIndex()
     
-    total_filas = len(rows)
-    filas_ok = 0
-    filas_error = 0
-    resumen_errores = {}
-    
-    # Procesar cada fila
-    for row in rows:
-        numero_fila = row['numero_fila']
-        row_data = row['datos']
-        
-        logger.info(f"Procesando fila {numero_fila}: {row_data}")
-        
-        # Validar fila
-        es_valido, errores = validate_tax_rating_row(row_data)
-        
-        if es_valido:
-            logger.info(f"Fila {numero_fila} válida, creando TaxRating")
-            try:
-                # Crear TaxRating
-                issuer = Issuer.objects.get(codigo=row_data['issuer_codigo'])
-                instrument = Instrument.objects.get(codigo=row_data['instrument_codigo'])
-                
-                # Normalizar opcionales
-                valid_to_value = row_data.get('valid_to')
-                if valid_to_value is not None and str(valid_to_value).strip() == '':
-                    valid_to_value = None
-
-                status_value = row_data.get('status') or 'VIGENTE'
-                risk_level_value = row_data.get('risk_level') or 'MODERADO'
-                comments_value = row_data.get('comments') or row_data.get('notas', '') or ''
-
-                TaxRating.objects.create(
-                    issuer=issuer,
-                    instrument=instrument,
-                    rating=row_data['rating'],
-                    valid_from=row_data['valid_from'],
-                    valid_to=valid_to_value,
-                    status=status_value,
-                    risk_level=risk_level_value,
-                    comments=comments_value,
-                    analista=bulk_upload.usuario,
-                )
-                
-                # Crear item exitoso
-                BulkUploadItem.objects.create(
-                    bulk_upload=bulk_upload,
-                    numero_fila=numero_fila,
-                    estado='OK',
-                    datos=row_data
+    # Parsear, validar e insertar el archivo por lotes a medida que se lee
+    lotes = iter_validated_batches(bulk_upload, chunk_size, checkpoint, tiempos)
+    try:
+        while True:
+            inicio = time.perf_counter()
+            referencias = tiempos['escritura']
+            lote = next(lotes, None)
+            # Dentro de next() también se resuelven las referencias, que ya suman en 'escritura'
+            tiempos['espera_escritura'] += time.perf_counter() - inicio - (tiempos['escritura'] - referencias)
+            if lote is None:
+                break
+            resultados, issuers, instruments = lote
+            if confirmadas:
+                # Filas de lotes que un procesamiento paralelo ya confirmó después del checkpoint
+                resultados = [fila for fila in resultados if fila[0] not in confirmadas]
+                if not resultados:
+                    continue
+            
+            inicio = time.perf_counter()
+            ultima_fila = resultados[-1][0]
+            with transaction.atomic():
+                ok, errores_por_fila, acciones_lote = ingest_tax_rating_batch(
+                    bulk_upload, resultados, issuers, instruments, ingest_log, indice
                 )
-                filas_ok += 1
-                logger.info(f"Fila {numero_fila} procesada exitosamente")
-                
-            except Exception as e:
-                logger.error(f"Error al procesar fila {numero_fila}: {str(e)}")
-                # Error al crear
-                BulkUploadItem.objects.create(
-                    bulk_upload=bulk_upload,
-                    numero_fila=numero_fila,
-                    estado='ERROR',
-                    mensaje_error=str(e),
-                    datos=row_data
+                for accion, cantidad in acciones_lote.items():
+                    acciones[accion] += cantidad
+                vigente = confirm_batch_checkpoint(
+                    bulk_upload,
+                    ultima_fila_confirmada=ultima_fila,
+                    filas_actualizadas=acciones['actualizadas'],
+                    filas_sin_cambios=acciones['sin_cambios'],
                 )
-                filas_error += 1
-                resumen_errores[numero_fila] = str(e)
-        else:
-            # Validación fallida
-            logger.warning(f"Fila {numero_fila} falló validación: {errores}")
-            mensaje_error = '; '.join(errores)
-            BulkUploadItem.objects.create(
-                bulk_upload=bulk_upload,
-                numero_fila=numero_fila,
-                estado='ERROR',
-                mensaje_error=mensaje_error,
-                datos=row_data
-            )
-            filas_error += 1
-            resumen_errores[numero_fila] = mensaje_error
+                if not vigente:
+                    raise BulkUploadJobLost(f'La carga #{bulk_upload.id} ya no pertenece a {bulk_upload.worker}')
+            bulk_upload.ultima_fila_confirmada = ultima_fila
+            tiempos['escritura'] += time.perf_counter() - inicio
+
+            total_filas += len(resultados)
+            filas_ok += ok
+            filas_error += len(errores_por_fila)
+            resumen_errores.update(errores_por_fila)
+            ingest_log.batch(total_filas, filas_ok, filas_error)
+
+            if on_progress is not None:
+                on_progress({
+                    'total_filas': total_filas,
+                    'filas_ok': filas_ok,
+                    'filas_error': filas_error,
+                })
+    finally:
+        # Detiene los hilos de parseo/validación si la escritura falló
+        lotes.close()
+    
+    # Segundos emitiendo logs dentro de las etapas; el resto de 'total' es trabajo
+    tiempos['logging'] = ingest_log.segundos
+    tiempos['total'] = time.perf_counter() - inicio_total
     
-    logger.info(f"Procesamiento completado: {filas_ok} OK, {filas_error} ERROR, Total: {total_filas}")
+    logger.info(
+        "Procesamiento completado: %d OK, %d ERROR, Total: %d (logging %.3fs de %.3fs)",
+        filas_ok, filas_error, total_filas, tiempos['logging'], tiempos['total'],
+    )
     
     return {
         'total_filas': total_filas,
         'filas_ok': filas_ok,
         'filas_error': filas_error,
-        'resumen_errores': resumen_errores
+        'filas_actualizadas': acciones['actualizadas'],
+        'filas_sin_cambios': acciones['sin_cambios'],
+        'resumen_errores': resumen_errores,
+        'tiempos': {etapa: round(segundos, 3) for etapa, segundos in tiempos.items()},
     }
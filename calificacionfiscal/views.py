@@ -1,19 +1,24 @@
+import io
 from django.shortcuts import render
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
 from django.core.exceptions import ValidationError
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, mixins, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser
 from cuentas.authentication import CsrfExemptSessionAuthentication
-from .models import CalificacionTributaria, TaxRating, BulkUpload, BulkUploadItem
+from .models import CalificacionTributaria, TaxRating, BulkUpload, BulkUploadItem, BulkUploadSession
 from .serializers import (
     CalificacionTributariaSerializer, TaxRatingSerializer, TaxRatingListSerializer,
-    TaxRatingDetailSerializer, BulkUploadSerializer, BulkUploadListSerializer, BulkUploadItemSerializer
+    TaxRatingDetailSerializer, BulkUploadSerializer, BulkUploadListSerializer, BulkUploadItemSerializer,
+    BulkUploadProgresoSerializer, BulkUploadSessionSerializer
 )
+from .conditional import conditional, tax_rating_stats_version, tax_rating_version, tax_ratings_version
+from .pagination import KeysetPagination, wants_keyset_pagination
 from .permissions import TaxRatingPermission, BulkUploadPermission, ReportPermission
+from .search import SEARCH_DOCUMENT_FIELDS, TaxRatingSearchFilter
 
 
 def inicio(request):
@@ -39,12 +44,33 @@ class TaxRatingViewSet(viewsets.ModelViewSet):
     queryset = TaxRating.objects.select_related('issuer', 'instrument', 'analista').all()
     authentication_classes = [CsrfExemptSessionAuthentication]
     permission_classes = [permissions.IsAuthenticated, TaxRatingPermission]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['issuer__nombre', 'issuer__rut', 'instrument__nombre', 'instrument__codigo', 'rating', 'status']
+    # La búsqueda ordena por relevancia sobre el orden que deja OrderingFilter
+    filter_backends = [filters.OrderingFilter, TaxRatingSearchFilter]
+    search_fields = SEARCH_DOCUMENT_FIELDS
     ordering_fields = ['valid_from', 'creado_en', 'issuer__nombre', 'rating']
     ordering = ['-valid_from']
     pagination_class = TaxRatingPagination
 
+    @property
+    def paginator(self):
+        """Paginación por número de página, o por cursor con ?paginacion=cursor (ver calificacionfiscal.pagination)."""
+        if not hasattr(self, '_paginator'):
+            if wants_keyset_pagination(self.request):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    @conditional(tax_ratings_version)
+    def list(self, request, *args, **kwargs):
+        """Listado de calificaciones; responde 304 si no cambiaron (ver calificacionfiscal.conditional)."""
+        return super().list(request, *args, **kwargs)
+
+    @conditional(tax_rating_version)
+    def retrieve(self, request, *args, **kwargs):
+        """Detalle de una calificación; responde 304 si no cambió ni su Issuer o Instrument."""
+        return super().retrieve(request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.action == 'list':
             return TaxRatingListSerializer
@@ -155,6 +181,7 @@ class TaxRatingViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @conditional(tax_ratings_version)
     def ultimas(self, request):
         """Retorna las últimas N calificaciones."""
         limit = int(request.query_params.get('limit', 10))
@@ -183,18 +210,15 @@ class TaxRatingViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @conditional(tax_rating_stats_version)
     def estadisticas(self, request):
-        """Retorna estadísticas de calificaciones."""
-        from django.db.models import Count
-        
-        queryset = self.get_queryset()
+        """Retorna estadísticas de calificaciones, leídas de los contadores materializados."""
+        from .stats import get_cached_stats
         
+        cached = get_cached_stats(incluir_rankings=False)
         stats = {
-            'total': queryset.count(),
-            'por_rating': list(queryset.values('rating').annotate(count=Count('id')).order_by('-count')),
-            'por_status': list(queryset.values('status').annotate(count=Count('id'))),
-            'por_risk_level': list(queryset.values('risk_level').annotate(count=Count('id'))),
-            'vigentes': queryset.filter(status='VIGENTE').count(),
+            clave: cached[clave]
+            for clave in ('total', 'por_rating', 'por_status', 'por_risk_level', 'vigentes')
         }
         
         return Response(stats)
@@ -220,6 +244,56 @@ class TaxRatingViewSet(viewsets.ModelViewSet):
         })
 
 
+def duplicate_upload_response(request, serializer):
+    """
+    Busca una carga previa con el mismo contenido y modo que la validada en `serializer`.
+
+    Returns:
+        Response con la carga existente y 'duplicado': true (auditada), o None si no hay
+    """
+    from cuentas.audit_models import AuditLog
+    from .utils import find_duplicate_upload
+    
+    existente = find_duplicate_upload(
+        serializer.validated_data.get('contenido_sha256'),
+        serializer.validated_data.get('modo', 'INSERTAR'),
+    )
+    if existente is None:
+        return None
+    
+    AuditLog.objects.create(
+        usuario=request.user,
+        accion='UPLOAD',
+        modelo='BulkUpload',
+        object_id=str(existente.id),
+        descripcion=f'Archivo duplicado de la carga #{existente.id}: {serializer.validated_data["archivo"].name}'
+    )
+    data = BulkUploadSerializer(existente, context={'request': request}).data
+    data['duplicado'] = True
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def save_bulk_upload(request, serializer):
+    """
+    Guarda la BulkUpload validada en `serializer` y registra la subida en auditoría.
+    El serializer ya validó el archivo en una sola lectura (UTF-8, delimitador,
+    header y tamaño) y dejó el SHA-256, las columnas y el total de filas en
+    validated_data; no se vuelve a parsear el archivo para el preview.
+    """
+    from cuentas.audit_models import AuditLog
+    
+    bulk_upload = serializer.save(usuario=request.user, tipo='UTF8')
+    
+    AuditLog.objects.create(
+        usuario=request.user,
+        accion='UPLOAD',
+        modelo='BulkUpload',
+        object_id=str(bulk_upload.id),
+        descripcion=f'Carga masiva iniciada: {serializer.validated_data["archivo"].name}'
+    )
+    return bulk_upload
+
+
 class BulkUploadViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestionar cargas masivas de TaxRatings.
@@ -238,15 +312,33 @@ class BulkUploadViewSet(viewsets.ModelViewSet):
             return BulkUploadListSerializer
         return BulkUploadSerializer
     
+    def create(self, request, *args, **kwargs):
+        """
+        Sube un archivo de carga masiva.
+        Si ya existe una carga con el mismo contenido (SHA-256) y modo que no fue
+        rechazada ni falló, se retorna esa carga con 'duplicado': true, sin guardar
+        el archivo de nuevo ni volver a procesarlo. Con forzar=true se crea igual.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        forzar = str(request.data.get('forzar', '')).lower() == 'true'
+        if not forzar:
+            respuesta = duplicate_upload_response(request, serializer)
+            if respuesta is not None:
+                return respuesta
+        
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
     def perform_create(self, serializer):
         """
         Crea el registro de BulkUpload validando que sea archivo UTF-8.
         Solo acepta archivos de texto plano en UTF-8, rechaza CSV, XLSX, XLS.
         El procesamiento se hace de forma asíncrona o con comando management.
         """
-        from cuentas.audit_models import AuditLog
-        
-        archivo = self.request.FILES.get('archivo')
+        archivo = serializer.validated_data['archivo']
         
         # Rechazar extensiones no permitidas
         archivo_name = archivo.name.lower()
@@ -258,40 +350,7 @@ class BulkUploadViewSet(viewsets.ModelViewSet):
                     f"Formato no soportado: {ext}. Solo se aceptan archivos de texto UTF-8 (.txt, .tsv, etc.)"
                 )
         
-        # Validar que sea un archivo UTF-8 válido
-        try:
-            contenido = archivo.read()
-            contenido.decode('utf-8')
-            archivo.seek(0)  # Resetear el puntero para que se guarde correctamente
-        except UnicodeDecodeError:
-            raise ValidationError(
-                "El archivo no está en formato UTF-8 válido. Asegúrese de guardar el archivo con codificación UTF-8."
-            )
-        
-        # Guardar como tipo UTF8
-        bulk_upload = serializer.save(usuario=self.request.user, tipo='UTF8')
-        
-        # Hacer un parsing preliminar para mostrar preview
-        try:
-            from .utils import parse_utf8_file
-            archivo.seek(0)
-            rows = parse_utf8_file(archivo)
-            # Actualizar con el conteo preliminar
-            bulk_upload.total_filas = len(rows)
-            bulk_upload.save()
-        except Exception as e:
-            # Si falla el parsing preliminar, no es un error fatal
-            # Se intentará de nuevo cuando se procese
-            pass
-        
-        # Registrar en auditoría
-        AuditLog.objects.create(
-            usuario=self.request.user,
-            accion='UPLOAD',
-            modelo='BulkUpload',
-            object_id=str(bulk_upload.id),
-            descripcion=f'Carga masiva iniciada: {archivo.name}'
-        )
+        save_bulk_upload(self.request, serializer)
     
     @action(detail=True, methods=['get'])
     def items(self, request, pk=None):
@@ -304,71 +363,91 @@ class BulkUploadViewSet(viewsets.ModelViewSet):
         if estado:
             items = items.filter(estado=estado)
         
+        # Columnas para reconstruir los datos de items compactos
+        contexto = {'columnas': bulk_upload.columnas}
         page = self.paginate_queryset(items)
         if page is not None:
-            serializer = BulkUploadItemSerializer(page, many=True)
+            serializer = BulkUploadItemSerializer(page, many=True, context=contexto)
             return self.get_paginated_response(serializer.data)
         
-        serializer = BulkUploadItemSerializer(items, many=True)
+        serializer = BulkUploadItemSerializer(items, many=True, context=contexto)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def progreso(self, request, pk=None):
+        """
+        Retorna el avance de una carga: filas procesadas, filas/s y tiempo estimado.
+        Pensado para consultarse seguido mientras la carga está en proceso, por lo que
+        solo lee las columnas de avance (no resumen_errores ni el archivo).
+        """
+        avance = self.get_queryset().filter(pk=pk).values(
+            'id', 'estado', 'total_filas', 'filas_ok', 'filas_error', 'filas_por_segundo',
+            'fecha_inicio', 'progreso_en', 'fecha_fin'
+        ).first()
+        if avance is None:
+            raise Http404
+        
+        serializer = BulkUploadProgresoSerializer(avance)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
-    def procesar(self, request, pk=None):
+    def validar(self, request, pk=None):
         """
-        Procesa una carga masiva de forma síncrona.
-        NOTA: Para grandes volúmenes usar Celery o comando management asíncrono.
+        Valida la carga completa sin escribir calificaciones (dry-run).
+        Retorna los conteos que tendría el procesamiento y los errores por fila.
+        El plan validado queda en caché; si el archivo no cambia, procesar lo reutiliza.
         """
-        from .utils import process_bulk_upload_file
-        from cuentas.audit_models import AuditLog
+        from .plans import dry_run_bulk_upload
         
         bulk_upload = self.get_object()
         
         if bulk_upload.estado != 'PENDIENTE':
             return Response(
-                {'error': 'Esta carga ya fue procesada o está en proceso'},
+                {'error': 'Solo se pueden validar cargas pendientes'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Actualizar estado
-        bulk_upload.estado = 'PROCESANDO'
-        bulk_upload.fecha_inicio = timezone.now()
-        bulk_upload.save()
-        
         try:
-            # Procesar archivo
-            resultado = process_bulk_upload_file(bulk_upload)
-            
-            # Actualizar con resultados
-            bulk_upload.estado = 'COMPLETADO'
-            bulk_upload.total_filas = resultado['total_filas']
-            bulk_upload.filas_ok = resultado['filas_ok']
-            bulk_upload.filas_error = resultado['filas_error']
-            bulk_upload.resumen_errores = resultado['resumen_errores']
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
-            # Auditoría
-            AuditLog.objects.create(
-                usuario=request.user,
-                accion='UPDATE',
-                modelo='BulkUpload',
-                object_id=str(bulk_upload.id),
-                descripcion=f'Carga masiva completada: {bulk_upload.filas_ok} OK, {bulk_upload.filas_error} errores'
+            resumen = dry_run_bulk_upload(bulk_upload)
+        except ValidationError as e:
+            return Response(
+                {'error': f'Error al validar archivo: {e.messages[0]}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            serializer = self.get_serializer(bulk_upload)
-            return Response(serializer.data)
-            
-        except Exception as e:
-            bulk_upload.estado = 'ERROR'
-            bulk_upload.resumen_errores = {'error_general': str(e)}
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
+        
+        return Response(resumen)
+    
+    @action(detail=True, methods=['post'])
+    def procesar(self, request, pk=None):
+        """
+        Encola una carga masiva para que la procese un worker en segundo plano.
+        Retorna 202 de inmediato; el avance se consulta en bulk-uploads/{id}/progreso.
+        Los workers se ejecutan con: python manage.py bulk_upload_worker
+        """
+        from .jobs import enqueue_bulk_upload
+        from cuentas.audit_models import AuditLog
+        
+        bulk_upload = self.get_object()
+        
+        if bulk_upload.estado != 'PENDIENTE':
             return Response(
-                {'error': f'Error al procesar archivo: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Esta carga ya fue procesada o está en proceso'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        
+        enqueue_bulk_upload(bulk_upload)
+        
+        # Auditoría
+        AuditLog.objects.create(
+            usuario=request.user,
+            accion='UPDATE',
+            modelo='BulkUpload',
+            object_id=str(bulk_upload.id),
+            descripcion='Carga masiva encolada para procesamiento'
+        )
+        
+        serializer = self.get_serializer(bulk_upload)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['post'])
     def rechazar(self, request, pk=None):
@@ -408,21 +487,127 @@ class BulkUploadViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def resumen(self, request):
-        """Retorna un resumen de todas las cargas del usuario."""
+        """Retorna un resumen de todas las cargas del usuario (una sola consulta)."""
+        from django.db.models import Count, Q
+        
         usuario = request.user
         cargas = BulkUpload.objects.filter(usuario=usuario)
         
-        resumen = {
-            'total_cargas': cargas.count(),
-            'pendientes': cargas.filter(estado='PENDIENTE').count(),
-            'procesando': cargas.filter(estado='PROCESANDO').count(),
-            'completadas': cargas.filter(estado='COMPLETADO').count(),
-            'con_error': cargas.filter(estado='ERROR').count(),
-        }
+        resumen = cargas.aggregate(
+            total_cargas=Count('id'),
+            pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+            en_cola=Count('id', filter=Q(estado='EN_COLA')),
+            procesando=Count('id', filter=Q(estado='PROCESANDO')),
+            completadas=Count('id', filter=Q(estado='COMPLETADO')),
+            con_error=Count('id', filter=Q(estado='ERROR')),
+        )
         
         return Response(resumen)
 
 
+class BulkUploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                               mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Subida por partes (reanudable) de archivos de carga masiva.
+    POST abre la sesión, PUT partes/{n}/ envía cada parte como cuerpo crudo
+    (con cabecera X-Content-SHA256 opcional), GET muestra las partes recibidas para
+    reanudar, finalizar/ crea la BulkUpload y DELETE cancela la sesión.
+    Ver calificacionfiscal.chunked. Permisos iguales a los de cargas masivas.
+    """
+    serializer_class = BulkUploadSessionSerializer
+    authentication_classes = [CsrfExemptSessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated, BulkUploadPermission]
+    
+    def get_queryset(self):
+        return BulkUploadSession.objects.filter(usuario=self.request.user)
+    
+    def perform_create(self, serializer):
+        from .chunked import create_partial_file
+        
+        sesion = serializer.save(usuario=self.request.user)
+        create_partial_file(sesion)
+    
+    def perform_destroy(self, instance):
+        from .chunked import remove_partial_file
+        
+        if instance.estado == 'ABIERTA':
+            instance.estado = 'CANCELADA'
+            instance.save(update_fields=['estado', 'actualizado_en'])
+        remove_partial_file(instance)
+    
+    def destroy(self, request, *args, **kwargs):
+        """Cancela la sesión y borra su archivo parcial (la sesión queda como registro)."""
+        self.perform_destroy(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['put'], url_path=r'partes/(?P<numero>\d+)')
+    def partes(self, request, pk=None, numero=None):
+        """
+        Recibe una parte del archivo como cuerpo crudo (application/octet-stream).
+        El cuerpo se lee por bloques directo desde el request, sin pasar por request.data.
+        """
+        from .chunked import write_session_part
+        
+        sesion = self.get_object()
+        if sesion.estado != 'ABIERTA':
+            return Response(
+                {'error': f'La sesión está {sesion.get_estado_display().lower()}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        stream = request.stream if request.stream is not None else io.BytesIO()
+        try:
+            write_session_part(sesion, int(numero), stream, request.headers.get('X-Content-SHA256', ''))
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(self.get_serializer(sesion).data)
+    
+    @action(detail=True, methods=['post'])
+    def finalizar(self, request, pk=None):
+        """
+        Verifica que estén todas las partes y crea la BulkUpload con el archivo completo.
+        Aplica las mismas validaciones y la misma detección de duplicados que la subida
+        en un solo request (forzar=true para crearla igual).
+        """
+        from .chunked import assemble_session_file, remove_partial_file
+        
+        sesion = self.get_object()
+        if sesion.estado != 'ABIERTA':
+            return Response(
+                {'error': f'La sesión está {sesion.get_estado_display().lower()}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            archivo = assemble_session_file(sesion)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            serializer = BulkUploadSerializer(
+                data={'archivo': archivo, 'modo': sesion.modo}, context=self.get_serializer_context()
+            )
+            serializer.is_valid(raise_exception=True)
+            
+            respuesta = None
+            if str(request.data.get('forzar', '')).lower() != 'true':
+                respuesta = duplicate_upload_response(request, serializer)
+            if respuesta is not None:
+                sesion.bulk_upload_id = respuesta.data['id']
+            else:
+                # El storage mueve el archivo parcial a su ubicación final en vez de copiarlo
+                sesion.bulk_upload = save_bulk_upload(request, serializer)
+                respuesta = Response(serializer.data, status=status.HTTP_201_CREATED)
+        finally:
+            archivo.close()
+        
+        remove_partial_file(sesion)
+        sesion.estado = 'FINALIZADA'
+        sesion.save(update_fields=['estado', 'bulk_upload', 'actualizado_en'])
+        return respuesta
+
+
 class ReportsViewSet(viewsets.ViewSet):
     """
     ViewSet para generar reportes y estadísticas de TaxRatings.
@@ -457,6 +642,9 @@ class ReportsViewSet(viewsets.ViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
+        # Sin filtros se leen los contadores materializados en vez de agregar la tabla
+        if not queryset.query.has_filters():
+            queryset = None
         estadisticas = obtener_estadisticas(queryset)
         return Response(estadisticas)
     
@@ -515,55 +703,6 @@ class ReportsViewSet(viewsets.ViewSet):
         
         return generar_reporte_pdf(queryset, incluir_estadisticas=incluir_stats)
 
-        
-        # Actualizar estado
-        bulk_upload.estado = 'PROCESANDO'
-        bulk_upload.fecha_inicio = timezone.now()
-        bulk_upload.save()
-        
-        try:
-            # Procesar archivo
-            resultado = process_bulk_upload_file(bulk_upload)
-            
-            # Actualizar con resultados
-            bulk_upload.estado = 'COMPLETADO'
-            bulk_upload.total_filas = resultado['total_filas']
-            bulk_upload.filas_ok = resultado['filas_ok']
-            bulk_upload.filas_error = resultado['filas_error']
-            bulk_upload.resumen_errores = resultado['resumen_errores']
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
-            serializer = self.get_serializer(bulk_upload)
-            return Response(serializer.data)
-            
-        except Exception as e:
-            bulk_upload.estado = 'ERROR'
-            bulk_upload.resumen_errores = {'error_general': str(e)}
-            bulk_upload.fecha_fin = timezone.now()
-            bulk_upload.save()
-            
-            return Response(
-                {'error': f'Error al procesar archivo: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-    
-    @action(detail=False, methods=['get'])
-    def resumen(self, request):
-        """Retorna un resumen de todas las cargas del usuario."""
-        usuario = request.user
-        cargas = BulkUpload.objects.filter(usuario=usuario)
-        
-        resumen = {
-            'total_cargas': cargas.count(),
-            'pendientes': cargas.filter(estado='PENDIENTE').count(),
-            'procesando': cargas.filter(estado='PROCESANDO').count(),
-            'completadas': cargas.filter(estado='COMPLETADO').count(),
-            'con_error': cargas.filter(estado='ERROR').count(),
-        }
-        
-        return Response(resumen)
-
 
 class ReportsViewSet(viewsets.ViewSet):
     """
@@ -595,6 +734,9 @@ class ReportsViewSet(viewsets.ViewSet):
         if instrument_id:
             queryset = queryset.filter(instrument_id=instrument_id)
         
+        # Sin filtros se leen los contadores materializados en vez de agregar la tabla
+        if not queryset.query.has_filters():
+            queryset = None
         estadisticas = obtener_estadisticas(queryset)
         return Response(estadisticas)
     
@@ -6,10 +6,15 @@ from parametros.models import Issuer, Instrument
 from calificacionfiscal.models import TaxRating
 import json
 
+# Campos derivados que no se registran en la auditoría
+CAMPOS_NO_AUDITADOS = ('search_document',)
+
 def get_model_data(instance):
     """Extrae los datos de una instancia como diccionario."""
     data = {}
     for field in instance._meta.fields:
+        if field.name in CAMPOS_NO_AUDITADOS:
+            continue
         value = getattr(instance, field.name)
         # Convierte valores no serializables a string
         if hasattr(value, 'isoformat'):
@@ -100,3 +105,37 @@ def audit_taxrating_delete(sender, instance, **kwargs):
         content_type=ContentType.objects.get_for_model(TaxRating),
         datos_anterior=get_model_data(instance),
     )
+
+
+def _audit_taxrating_bulk(instances, accion):
+    """Registra con un solo INSERT la misma entrada que audit_taxrating_change para cada instancia."""
+    if not instances:
+        return []
+    content_type = ContentType.objects.get_for_model(TaxRating)
+    return AuditLog.objects.bulk_create([
+        AuditLog(
+            usuario=instance.analista if instance.analista else None,
+            accion=accion,
+            modelo='TaxRating',
+            descripcion=f"{accion}: {instance.issuer.nombre} - {instance.instrument.nombre} ({instance.rating})",
+            object_id=str(instance.id),
+            content_type=content_type,
+            datos_nuevo=get_model_data(instance),
+        )
+        for instance in instances
+    ])
+
+
+def audit_taxrating_bulk_create(instances):
+    """
+    Registra en bloque la creación de TaxRatings insertados con bulk_create.
+
+    bulk_create no dispara post_save, por lo que las cargas masivas usan esta
+    función para dejar el mismo registro que audit_taxrating_change con un solo INSERT.
+    """
+    return _audit_taxrating_bulk(instances, 'CREATE')
+
+
+def audit_taxrating_bulk_update(instances):
+    """Registra en bloque la actualización de TaxRatings modificados con bulk_update."""
+    return _audit_taxrating_bulk(instances, 'UPDATE')
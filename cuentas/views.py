@@ -415,34 +415,22 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
         """Estadísticas de auditoría."""
-        from django.db.models import Count
+        from calificacionfiscal.aggregates import count_groups
         
-        queryset = self.get_queryset()
-        
-        # Contar por acción
-        por_accion = queryset.values('accion').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # Contar por modelo
-        por_modelo = queryset.values('modelo').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        # Contar por acción y por modelo
+        grupos = {'por_accion': 'accion', 'por_modelo': 'modelo'}
         
         # Contar por usuario (solo para ADMIN/AUDITOR)
-        por_usuario = None
         if request.user.rol in ['ADMIN', 'AUDITOR']:
-            por_usuario = queryset.values(
-                'usuario__username', 'usuario__rol'
-            ).annotate(
-                count=Count('id')
-            ).order_by('-count')[:10]
+            grupos['por_usuario'] = ('usuario__username', 'usuario__rol')
+        
+        conteos = count_groups(self.get_queryset(), grupos, limites={'por_usuario': 10})
         
         return Response({
-            'por_accion': list(por_accion),
-            'por_modelo': list(por_modelo),
-            'por_usuario': list(por_usuario) if por_usuario else None,
-            'total_registros': queryset.count()
+            'por_accion': conteos['por_accion'],
+            'por_modelo': conteos['por_modelo'],
+            'por_usuario': conteos.get('por_usuario') or None,
+            'total_registros': conteos['total']
         })
 
     @action(detail=False, methods=['get'])
@@ -465,18 +453,16 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def resumen(self, request):
         """Resumen de auditoría: conteos por acción y modelo."""
-        from django.db.models import Count
+        from calificacionfiscal.aggregates import count_groups
         
+        conteos = count_groups(
+            self.get_queryset(),
+            {'por_accion': 'accion', 'por_modelo': 'modelo', 'por_usuario': 'usuario__username'},
+        )
         resumen = {
-            'por_accion': list(
-                self.get_queryset().values('accion').annotate(count=Count('id'))
-            ),
-            'por_modelo': list(
-                self.get_queryset().values('modelo').annotate(count=Count('id'))
-            ),
-            'por_usuario': list(
-                self.get_queryset().values('usuario__username').annotate(count=Count('id'))
-            ),
-            'total': self.get_queryset().count(),
+            'por_accion': conteos['por_accion'],
+            'por_modelo': conteos['por_modelo'],
+            'por_usuario': conteos['por_usuario'],
+            'total': conteos['total'],
         }
         return Response(resumen)
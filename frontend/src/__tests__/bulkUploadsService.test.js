@@ -7,6 +7,8 @@ vi.mock('../services/httpClient', () => ({
   default: {
     get: vi.fn(),
     post: vi.fn(),
+    put: vi.fn(),
+    delete: vi.fn(),
   },
 }));
 
@@ -166,6 +168,40 @@ describe('bulkUploadsService', () => {
     });
   });
 
+  describe('validar', () => {
+    it('debería llamar POST /bulk-uploads/:id/validar/', async () => {
+      const mockResumen = {
+        data: { total_filas: 10, filas_ok: 8, filas_error: 2, resumen_errores: {} }
+      };
+      api.post.mockResolvedValue(mockResumen);
+
+      const result = await bulkUploadsService.validar(1);
+
+      expect(api.post).toHaveBeenCalledWith('/bulk-uploads/1/validar/');
+      expect(result.data.filas_error).toBe(2);
+    });
+  });
+
+  describe('progreso', () => {
+    it('debería llamar GET /bulk-uploads/:id/progreso/', async () => {
+      const mockProgreso = {
+        data: {
+          id: 1,
+          estado: 'PROCESANDO',
+          filas_procesadas: 500,
+          porcentaje: 50,
+          eta_segundos: 10
+        }
+      };
+      api.get.mockResolvedValue(mockProgreso);
+
+      const result = await bulkUploadsService.progreso(1);
+
+      expect(api.get).toHaveBeenCalledWith('/bulk-uploads/1/progreso/');
+      expect(result.data.porcentaje).toBe(50);
+    });
+  });
+
   describe('procesar', () => {
     it('debería llamar POST /bulk-uploads/:id/procesar/', async () => {
       const mockResponse = { 
@@ -234,4 +270,38 @@ describe('bulkUploadsService', () => {
       expect(result.data.pendientes + result.data.procesados + result.data.con_errores).toBe(15);
     });
   });
+
+  describe('subida por partes', () => {
+    it('debería abrir la sesión con POST /bulk-upload-sessions/', async () => {
+      const datos = { nombre_archivo: 'carga.txt', tamano_total: 2048, tamano_parte: 1024 };
+      api.post.mockResolvedValue({ data: { id: 7, partes_totales: 2 } });
+
+      const result = await bulkUploadsService.iniciarSesion(datos);
+
+      expect(api.post).toHaveBeenCalledWith('/bulk-upload-sessions/', datos);
+      expect(result.data.partes_totales).toBe(2);
+    });
+
+    it('debería enviar cada parte como cuerpo crudo con su SHA-256', async () => {
+      const blob = new Blob(['issuer_codigo|instrument_codigo\n']);
+      api.put.mockResolvedValue({ data: { partes_recibidas: [0] } });
+
+      await bulkUploadsService.subirParte(7, 0, blob, 'abc123');
+
+      expect(api.put).toHaveBeenCalledWith('/bulk-upload-sessions/7/partes/0/', blob, {
+        headers: { 'Content-Type': 'application/octet-stream', 'X-Content-SHA256': 'abc123' },
+      });
+    });
+
+    it('debería finalizar y cancelar la sesión', async () => {
+      api.post.mockResolvedValue({ data: { id: 15 } });
+      api.delete.mockResolvedValue({ status: 204 });
+
+      await bulkUploadsService.finalizarSesion(7);
+      await bulkUploadsService.cancelarSesion(7);
+
+      expect(api.post).toHaveBeenCalledWith('/bulk-upload-sessions/7/finalizar/', {});
+      expect(api.delete).toHaveBeenCalledWith('/bulk-upload-sessions/7/');
+    });
+  });
 });
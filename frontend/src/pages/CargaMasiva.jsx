@@ -8,6 +8,7 @@ const CargaMasiva = () => {
   const { user } = useAuth();
   const isAdmin = user?.rol === 'ADMIN';
   const [file, setFile] = useState(null);
+  const [modo, setModo] = useState('INSERTAR');
   const [uploading, setUploading] = useState(false);
   const [progress, setProgress] = useState(0);
   const [resultado, setResultado] = useState(null);
@@ -72,10 +73,10 @@ const CargaMasiva = () => {
   const handleFileSelection = (selectedFile) => {
     // Validar que sea archivo de texto UTF-8
     const validTypes = ['text/plain', 'text/tab-separated-values'];
-    const validExtensions = /\.(txt|tsv)$/i;
+    const validExtensions = /\.(txt|tsv)(\.(gz|zst))?$/i;
     
     if (!validTypes.includes(selectedFile.type) && !validExtensions.test(selectedFile.name)) {
-      setError('Formato no válido. Solo se aceptan archivos de texto UTF-8 (.txt, .tsv)');
+      setError('Formato no válido. Solo se aceptan archivos de texto UTF-8 (.txt, .tsv), opcionalmente .gz o .zst');
       return;
     }
     if (selectedFile.size > 10 * 1024 * 1024) {
@@ -98,6 +99,7 @@ const CargaMasiva = () => {
     setResultado(null);
     const formData = new FormData();
     formData.append('archivo', file);
+    formData.append('modo', modo);
     try {
       const response = await bulkUploadsService.upload(formData, (p) => setProgress(p));
       setProgress(100);
@@ -207,17 +209,23 @@ const CargaMasiva = () => {
               <input
                 id="file-upload"
                 type="file"
-                accept=".txt,.tsv"
+                accept=".txt,.tsv,.gz,.zst"
                 onChange={handleFileChange}
                 style={{ display: 'none' }}
               />
-              <p className="file-hint">Formatos: TXT, TSV • Máx 10MB</p>
+              <p className="file-hint">Formatos: TXT, TSV (también .gz, .zst) • Máx 10MB</p>
             </>
           ) : (
             <>
               <div className="file-icon">📄</div>
               <h3>{file.name}</h3>
               <p className="file-size">{(file.size / 1024).toFixed(2)} KB</p>
+              <label htmlFor="modo-carga">Calificaciones existentes:</label>
+              <select id="modo-carga" value={modo} onChange={(e) => setModo(e.target.value)}>
+                <option value="INSERTAR">Marcar como error</option>
+                <option value="UPSERT">Actualizar con los valores del archivo</option>
+                <option value="OMITIR_SIN_CAMBIOS">Omitir si no cambian</option>
+              </select>
               <button className="btn-remove" onClick={handleReset}>
                 🗑️ Cambiar archivo
               </button>
@@ -254,6 +262,9 @@ const CargaMasiva = () => {
           <div className="result-header">
             <h2>✅ Carga Registrada</h2>
             <p className="mini-text">Estado: {resultado.estado}</p>
+            {resultado.duplicado && (
+              <p className="mini-text">Este archivo ya se había subido: se muestra la carga #{resultado.id}</p>
+            )}
           </div>
           <div className="result-stats">
             <div className="stat-item total">
@@ -403,7 +414,7 @@ const CargaMasiva = () => {
         <h2>📋 Instrucciones</h2>
         <div className="instructions-content">
           <ul className="instructions-list">
-            <li>Formatos soportados: Texto UTF-8 (.txt, .tsv). Tamaño máx 10MB.</li>
+            <li>Formatos soportados: Texto UTF-8 (.txt, .tsv), opcionalmente comprimido con gzip (.gz) o zstd (.zst). Tamaño máx 10MB.</li>
             <li>Delimitador: Pipes <code>|</code> o tabulaciones. Primera línea debe ser headers.</li>
             <li>Encabezados requeridos: <code>issuer_codigo</code>, <code>instrument_codigo</code>, <code>rating</code>, <code>valid_from</code>.</li>
             <li>Campos opcionales: <code>valid_to</code>, <code>status</code>, <code>risk_level</code>, <code>comments</code>.</li>
@@ -13,9 +13,22 @@ export const bulkUploadsService = {
     }
   }),
   items: (id, estado) => api.get(`/bulk-uploads/${id}/items/`, { params: estado ? { estado } : {} }),
+  validar: (id) => api.post(`/bulk-uploads/${id}/validar/`),
+  progreso: (id) => api.get(`/bulk-uploads/${id}/progreso/`),
   procesar: (id) => api.post(`/bulk-uploads/${id}/procesar/`),
   rechazar: (id) => api.post(`/bulk-uploads/${id}/rechazar/`),
   resumenPropio: () => api.get('/bulk-uploads/resumen/'),
+  // Subida por partes (reanudable) para archivos grandes
+  iniciarSesion: (datos) => api.post('/bulk-upload-sessions/', datos),
+  estadoSesion: (id) => api.get(`/bulk-upload-sessions/${id}/`),
+  subirParte: (id, numero, blob, sha256) => api.put(`/bulk-upload-sessions/${id}/partes/${numero}/`, blob, {
+    headers: {
+      'Content-Type': 'application/octet-stream',
+      ...(sha256 ? { 'X-Content-SHA256': sha256 } : {}),
+    },
+  }),
+  finalizarSesion: (id, forzar = false) => api.post(`/bulk-upload-sessions/${id}/finalizar/`, forzar ? { forzar: 'true' } : {}),
+  cancelarSesion: (id) => api.delete(`/bulk-upload-sessions/${id}/`),
 };
 
 export default bulkUploadsService;
\ No newline at end of file
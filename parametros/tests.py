@@ -114,6 +114,22 @@ class IssuerCRUDTests(TestCase):
         for issuer in response.data['results']:
             self.assertTrue(issuer.get('activo', True))
     
+    def test_activos_responde_304_si_no_cambiaron(self):
+        """Debería responder 304 con el ETag vigente y 200 tras desactivar un emisor"""
+        issuer = Issuer.objects.create(codigo='ACTIVE', nombre='Active Corp', rut='11111111-1')
+        
+        response = self.client.get('/api/v1/issuers/activos/')
+        etag = response['ETag']
+        
+        response = self.client.get('/api/v1/issuers/activos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        issuer.activo = False
+        issuer.save()
+        response = self.client.get('/api/v1/issuers/activos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+    
     def test_get_issuer_detail(self):
         """Debería obtener el detalle de un emisor específico"""
         issuer = Issuer.objects.create(
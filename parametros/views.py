@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from cuentas.authentication import CsrfExemptSessionAuthentication
+from calificacionfiscal.conditional import active_rows_version, conditional
 from .models import Issuer, Instrument
 from .serializers import IssuerSerializer, InstrumentSerializer
 
@@ -21,6 +22,7 @@ class IssuersViewSet(viewsets.ModelViewSet):
     ordering = ['nombre']
 
     @action(detail=False, methods=['get'])
+    @conditional(active_rows_version)
     def activos(self, request):
         """Retorna solo los emisores activos."""
         queryset = self.get_queryset().filter(activo=True)
@@ -43,6 +45,7 @@ class InstrumentsViewSet(viewsets.ModelViewSet):
     ordering = ['nombre']
 
     @action(detail=False, methods=['get'])
+    @conditional(active_rows_version)
     def activos(self, request):
         """Retorna solo los instrumentos activos."""
         queryset = self.get_queryset().filter(activo=True)